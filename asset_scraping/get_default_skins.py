@@ -2,92 +2,16 @@ import requests
 from bs4 import BeautifulSoup
 import os
 import shutil
+import sys
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "cronjobs_and_ml")
+)
+from shared.brawler_registry import REGISTRY
 
-# List of brawler names to search for
-brawler_names = [
-    "Berry",
-    "Meg",
-    "Frank",
-    "Draco",
-    "Sandy",
-    "Buster",
-    "Chester",
-    "Lily",
-    "Jacky",
-    "Jessie",
-    "Gale",
-    "Surge",
-    "Bibi",
-    "Mico",
-    "Crow",
-    "Melodie",
-    "Fang",
-    "Doug",
-    "Nita",
-    "Chuck",
-    "Leon",
-    "Eve",
-    "Cordelius",
-    "Larry & Lawrie",
-    "Colette",
-    "Buzz",
-    "Edgar",
-    "Angelo",
-    "R-T",
-    "Bo",
-    "Rico",
-    "Kit",
-    "Emz",
-    "Belle",
-    "Mandy",
-    "Amber",
-    "Tick",
-    "Lou",
-    "Spike",
-    "Dynamike",
-    "Piper",
-    "Pearl",
-    "Charlie",
-    "Tara",
-    "Gray",
-    "Mortis",
-    "Byron",
-    "Mr. P",
-    "Colt",
-    "Max",
-    "Maisie",
-    "Brock",
-    "Otis",
-    "Griff",
-    "Gene",
-    "El Primo",
-    "Squeak",
-    "Nani",
-    "Poco",
-    "Grom",
-    "Shelly",
-    "Janet",
-    "Sprout",
-    "Ruffs",
-    "8-Bit",
-    "Bea",
-    "Sam",
-    "Stu",
-    "Darryl",
-    "Willow",
-    "Bonnie",
-    "Lola",
-    "Carl",
-    "Penny",
-    "Ash",
-    "Bull",
-    "Gus",
-    "Barley",
-    "Rosa",
-    "Hank",
-    "Pam",
-]
+
+# Brawlers to search for, by their display name
+brawler_names = REGISTRY.display_names
 
 # Starting URL
 base_url = "https://brawlstars.fandom.com"
@@ -1,68 +1,157 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-import pandas as pd
-import requests
 from dotenv import load_dotenv
 import os
+from data_store import brawler_data_store, parse_window, window_name
+from query_index import DEFAULT_TOP_K
+from http_cache import respond_versioned
+from recommender import draft_from_params, recommender_from_env
+from player_lookup import (
+    DEFAULT_API_URL, PlayerLookup, UpstreamError, filter_player_data, player_cache_from_env, player_tag_key
+)
 
 app = Flask(__name__)
 CORS(app)  # This will enable CORS for all routes
 load_dotenv()
 
+# Pipeline outputs are loaded once and swapped in when a new version is published
+store = brawler_data_store().start()
+
 @app.route('/api/hello', methods=['GET'])
 def hello():
     return jsonify(message="Hello, World!")
 
+def requested_window():
+    # ?window=7d serves the stats of the last 7 days, see TIME_WINDOWS
+    return parse_window(request.args.get('window'))
+
+
 @app.route('/api/brawler_data', methods=['GET'])
 def get_brawler_data():
     try:
-        # Read the CSV file
-        df = pd.read_csv('brawler_data.csv')
-        # Extract the desired columns
-        result = df[['brawler_id', 'win_rate', 'usage_rate', 'rank']].to_dict(orient='records')
-        return jsonify(result), 200
-    except Exception as e:
+        dataset = store.dataset(window_name('brawler_data', requested_window()))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if dataset is None:
+        return jsonify(error='Brawler data is not loaded'), 400
+    status, headers, body = dataset.body.respond(
+        request.headers.get('Accept-Encoding'), request.headers.get('If-None-Match')
+    )
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def query_response(query, index_name='queries'):
+    # The index and its version come from the same snapshot
+    snapshot = store.snapshot
+    try:
+        index = snapshot.indexes.get(window_name(index_name, requested_window()))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    if index is None:
+        return jsonify(error='Query data is not loaded'), 400
+    try:
+        status, headers, body = respond_versioned(
+            snapshot.version, request.headers.get('If-None-Match'), lambda: query(index)
+        )
+    except KeyError as e:
+        return jsonify(error=f'Unknown brawler or map {e}'), 404
+    return Response(body, status=status, headers=headers, mimetype='application/json')
+
+
+def top_k():
+    return request.args.get('k', DEFAULT_TOP_K, type=int)
+
+
+def min_games():
+    return request.args.get('min_games', 1, type=int)
+
+
+@app.route('/api/synergy/<brawler>', methods=['GET'])
+def get_best_teammates(brawler):
+    return query_response(lambda index: index.teammates(brawler, top_k()))
+
+
+@app.route('/api/counters/<brawler>', methods=['GET'])
+def get_counters(brawler):
+    return query_response(lambda index: index.counters(brawler, top_k()))
+
+
+@app.route('/api/maps/<map_name>', methods=['GET'])
+def get_map_brawlers(map_name):
+    return query_response(lambda index: index.map_brawlers(map_name, top_k()))
+
+
+@app.route('/api/pair/<brawler>/<teammate>', methods=['GET'])
+def get_pair_score(brawler, teammate):
+    return query_response(lambda index: index.pair(brawler, teammate))
+
+
+@app.route('/api/maps/<map_name>/trios', methods=['GET'])
+def get_map_trios(map_name):
+    return query_response(lambda index: index.map_trios(map_name, top_k()), 'team_trios')
+
+
+# Per-map and per-mode pairs, e.g. /api/maps/Hard Rock Mine/synergy/SHELLY
+@app.route('/api/<any(maps, modes):kind>/<group>/synergy/<brawler>', methods=['GET'])
+def get_group_teammates(kind, group, brawler):
+    return query_response(
+        lambda index: index.teammates(kind[:-1], group, brawler, top_k(), min_games()), 'pair_cubes'
+    )
+
+
+@app.route('/api/<any(maps, modes):kind>/<group>/counters/<brawler>', methods=['GET'])
+def get_group_counters(kind, group, brawler):
+    return query_response(
+        lambda index: index.counters(kind[:-1], group, brawler, top_k(), min_games()), 'pair_cubes'
+    )
+
+
+player_cache = player_cache_from_env()
+player_lookup = PlayerLookup(
+    os.getenv('BRAWL_STARS_API_KEY'),
+    os.getenv('BRAWL_STARS_API_URL', DEFAULT_API_URL),
+    player_cache,
+    transform=filter_player_data,
+    timeout=float(os.getenv('PLAYER_UPSTREAM_TIMEOUT_SECONDS', '5')),
+)
+
+
+# The model is loaded once, requests are batched into shared predict_proba calls
+recommender = recommender_from_env()
+
+
+@app.route('/api/recommend', methods=['GET'])
+def get_recommendations():
+    if recommender is None:
+        return jsonify(error='Model is not loaded'), 400
+    try:
+        draft, k = draft_from_params(request.args)
+    except ValueError as e:
         return jsonify(error=str(e)), 400
+    return Response(recommender.submit(draft, k).result(), status=200, mimetype='application/json')
+
+
+@app.route('/api/stats/recommend', methods=['GET'])
+def get_recommend_stats():
+    if recommender is None:
+        return jsonify(error='Model is not loaded'), 400
+    return jsonify(recommender.stats()), 200
 
 
 @app.route('/api/player/<player_tag>', methods=['GET'])
 def get_player_data(player_tag):
     try:
-        api_key = os.getenv('BRAWL_STARS_API_KEY')
-        headers = {
-            'Authorization': f'Bearer {api_key}'
-        }
-        url = f'https://api.brawlstars.com/v1/players/%23{player_tag}'
-        print("Request received", url)
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            return jsonify(error='Failed to retrieve player data'), response.status_code
-
-        player_data = response.json()
-
-        # Extract the required fields
-        filtered_data = {
-            "tag": player_data.get("tag"),
-            "name": player_data.get("name"),
-            "trophies": player_data.get("trophies"),
-            "highestTrophies": player_data.get("highestTrophies"),
-            "3vs3Victories": player_data.get("3vs3Victories"),
-            "soloVictories": player_data.get("soloVictories"),
-            "duoVictories": player_data.get("duoVictories"),
-            "club": player_data.get("club")
-        }
-
-        # Get the top 5 brawlers by trophies
-        brawlers = player_data.get("brawlers", [])
-        top_brawlers = sorted(brawlers, key=lambda x: x.get("trophies", 0), reverse=True)[:5]
-        filtered_data["topBrawlers"] = top_brawlers
-
-        return jsonify(filtered_data), 200
+        return jsonify(player_lookup.get(player_tag_key(player_tag))), 200
+    except UpstreamError as e:
+        return jsonify(error='Failed to retrieve player data'), e.status_code
     except Exception as e:
         return jsonify(error=str(e)), 500
 
 
+@app.route('/api/stats/player_lookup', methods=['GET'])
+def get_player_lookup_stats():
+    return jsonify(player_cache.stats()), 200
+
 
 if __name__ == '__main__':
     app.run(debug=True)
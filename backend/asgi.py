@@ -0,0 +1,223 @@
+from dotenv import load_dotenv
+import os
+import asyncio
+from urllib.parse import parse_qs
+from data_store import brawler_data_store, parse_window, to_json_bytes, window_name
+from query_index import DEFAULT_TOP_K
+from http_cache import respond_versioned
+from recommender import draft_from_params, recommender_from_env
+from player_lookup import (
+    DEFAULT_API_URL, AsyncPlayerLookup, UpstreamError, filter_player_data, player_cache_from_env, player_tag_key
+)
+
+"""
+ASGI app - the Flask app's routes served from an event loop
+    Player lookups wait on the upstream API without holding a thread, so one worker
+    process keeps thousands of lookups in flight. Run it with several worker processes
+    through gunicorn.conf.py:
+        gunicorn -c gunicorn.conf.py asgi:app
+    or as a single process for development with `python asgi.py`.
+"""
+
+load_dotenv()
+
+store = brawler_data_store()
+player_cache = player_cache_from_env()
+player_lookup = AsyncPlayerLookup(
+    os.getenv('BRAWL_STARS_API_KEY'),
+    os.getenv('BRAWL_STARS_API_URL', DEFAULT_API_URL),
+    player_cache,
+    transform=filter_player_data,
+    timeout=float(os.getenv('PLAYER_UPSTREAM_TIMEOUT_SECONDS', '5')),
+    pool_size=int(os.getenv('PLAYER_UPSTREAM_CONNECTIONS', '512')),
+)
+recommender = recommender_from_env()
+
+
+async def send_response(send, status, body, headers=(), content_type=b'application/json'):
+    response_headers = [
+        # Same as CORS(app) in the Flask app
+        (b'access-control-allow-origin', b'*'),
+        *((name.lower().encode(), value.encode()) for name, value in headers),
+    ]
+    if status != 304:
+        response_headers += [(b'content-type', content_type), (b'content-length', str(len(body)).encode())]
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def request_header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+def error_body(message):
+    return to_json_bytes({'error': message})
+
+
+async def hello(send):
+    await send_response(send, 200, to_json_bytes({'message': 'Hello, World!'}))
+
+
+def requested_window(scope):
+    return parse_window(query_params(scope).get('window'))
+
+
+async def get_brawler_data(scope, send):
+    try:
+        dataset = store.dataset(window_name('brawler_data', requested_window(scope)))
+    except ValueError as e:
+        await send_response(send, 400, error_body(str(e)))
+        return
+    if dataset is None:
+        await send_response(send, 400, error_body('Brawler data is not loaded'))
+        return
+    status, headers, body = dataset.body.respond(
+        request_header(scope, b'accept-encoding'), request_header(scope, b'if-none-match')
+    )
+    await send_response(send, status, body, headers)
+
+
+async def query_response(scope, send, query, index_name='queries'):
+    # The index and its version come from the same snapshot
+    snapshot = store.snapshot
+    try:
+        index = snapshot.indexes.get(window_name(index_name, requested_window(scope)))
+    except ValueError as e:
+        await send_response(send, 400, error_body(str(e)))
+        return
+    if index is None:
+        await send_response(send, 400, error_body('Query data is not loaded'))
+        return
+    try:
+        status, headers, body = respond_versioned(
+            snapshot.version, request_header(scope, b'if-none-match'), lambda: query(index)
+        )
+    except KeyError as e:
+        await send_response(send, 404, error_body(f'Unknown brawler or map {e}'))
+        return
+    await send_response(send, status, body, headers)
+
+
+def query_params(scope):
+    return {name: values[0] for name, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+
+
+def top_k(scope):
+    try:
+        return int(query_params(scope).get('k', DEFAULT_TOP_K))
+    except ValueError:
+        return DEFAULT_TOP_K
+
+
+def min_games(scope):
+    try:
+        return int(query_params(scope).get('min_games', 1))
+    except ValueError:
+        return 1
+
+
+async def get_recommendations(scope, send):
+    if recommender is None:
+        await send_response(send, 400, error_body('Model is not loaded'))
+        return
+    try:
+        draft, k = draft_from_params(query_params(scope))
+    except ValueError as e:
+        await send_response(send, 400, error_body(str(e)))
+        return
+    # Waits for the batching thread without blocking the event loop
+    await send_response(send, 200, await asyncio.wrap_future(recommender.submit(draft, k)))
+
+
+async def get_recommend_stats(send):
+    if recommender is None:
+        await send_response(send, 400, error_body('Model is not loaded'))
+        return
+    await send_response(send, 200, to_json_bytes(recommender.stats()))
+
+
+async def get_player_data(send, player_tag):
+    try:
+        profile = await player_lookup.get(player_tag_key(player_tag))
+        await send_response(send, 200, to_json_bytes(profile))
+    except UpstreamError as e:
+        await send_response(send, e.status_code, error_body('Failed to retrieve player data'))
+    except Exception as e:
+        await send_response(send, 500, error_body(str(e)))
+
+
+async def get_player_lookup_stats(send):
+    await send_response(send, 200, to_json_bytes(player_cache.stats()))
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            store.start()
+            await player_lookup.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await player_lookup.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    # ASGI servers pass the path already percent-decoded
+    route = scope['path'].strip('/').split('/')
+    if scope['method'] != 'GET':
+        await send_response(send, 405, error_body('Method not allowed'))
+    elif route == ['api', 'hello']:
+        await hello(send)
+    elif route == ['api', 'brawler_data']:
+        await get_brawler_data(scope, send)
+    elif route == ['api', 'stats', 'player_lookup']:
+        await get_player_lookup_stats(send)
+    elif route == ['api', 'recommend']:
+        await get_recommendations(scope, send)
+    elif route == ['api', 'stats', 'recommend']:
+        await get_recommend_stats(send)
+    elif route[:2] == ['api', 'player'] and len(route) == 3:
+        await get_player_data(send, route[2])
+    elif route[:2] == ['api', 'synergy'] and len(route) == 3:
+        await query_response(scope, send, lambda index: index.teammates(route[2], top_k(scope)))
+    elif route[:2] == ['api', 'counters'] and len(route) == 3:
+        await query_response(scope, send, lambda index: index.counters(route[2], top_k(scope)))
+    elif route[:2] == ['api', 'maps'] and len(route) == 3:
+        await query_response(scope, send, lambda index: index.map_brawlers(route[2], top_k(scope)))
+    elif route[:2] == ['api', 'pair'] and len(route) == 4:
+        await query_response(scope, send, lambda index: index.pair(route[2], route[3]))
+    elif route[:2] == ['api', 'maps'] and len(route) == 4 and route[3] == 'trios':
+        await query_response(scope, send, lambda index: index.map_trios(route[2], top_k(scope)), 'team_trios')
+    elif route[:2] in (['api', 'maps'], ['api', 'modes']) and len(route) == 5 and route[3] == 'synergy':
+        await query_response(
+            scope,
+            send,
+            lambda index: index.teammates(route[1][:-1], route[2], route[4], top_k(scope), min_games(scope)),
+            'pair_cubes',
+        )
+    elif route[:2] in (['api', 'maps'], ['api', 'modes']) and len(route) == 5 and route[3] == 'counters':
+        await query_response(
+            scope,
+            send,
+            lambda index: index.counters(route[1][:-1], route[2], route[4], top_k(scope), min_games(scope)),
+            'pair_cubes',
+        )
+    else:
+        await send_response(send, 404, error_body('Not found'))
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run('asgi:app', host='127.0.0.1', port=int(os.getenv('PORT', '8000')))
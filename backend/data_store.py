@@ -0,0 +1,254 @@
+import os
+import io
+import csv
+import json
+import time
+import hashlib
+import logging
+import threading
+from http_cache import CachedBody
+
+"""
+Data Store - pipeline outputs preloaded into memory for the API
+    Every published file is parsed once into an immutable dataset holding its records
+    and, for files served as they are, the serialized and compressed JSON response
+    bodies, so requests only pick the current snapshot and write out bytes. Count cubes
+    are memory-mapped instead, their pages are read when a query slices them and shared
+    between worker processes. A watcher thread polls the manifest.json written by the
+    pipeline's publish_outputs.py and swaps in a new snapshot once every file matches
+    the manifest's hashes, so a request never sees a half-written file or a mix of two
+    pipeline runs.
+"""
+
+MANIFEST_FILE = 'manifest.json'
+# Time windows the pipeline publishes its outputs for, the `window` request parameter
+TIME_WINDOWS = ['1d', '7d', '14d', '30d']
+
+logger = logging.getLogger(__name__)
+
+
+def to_json_bytes(payload):
+    # Same key order as jsonify, without the whitespace
+    return json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+def window_name(name, window=None):
+    """Name of a dataset or index for a time window, the name itself for all battles."""
+    return f'{name}_{window}' if window else name
+
+
+def parse_window(value):
+    """
+    Returns:
+    str: time window of a request parameter, None for all battles
+
+    Raises:
+    ValueError: the window is not one of TIME_WINDOWS
+    """
+    if value in (None, '', 'all'):
+        return None
+    if value not in TIME_WINDOWS:
+        raise ValueError(f'Unknown window {value}, expected all or one of {", ".join(TIME_WINDOWS)}')
+    return value
+
+
+def load_brawler_data(data):
+    reader = csv.DictReader(io.StringIO(data.decode('utf-8')))
+    return tuple(
+        {
+            'brawler_id': row['brawler_id'],
+            'win_rate': float(row['win_rate']),
+            'usage_rate': float(row['usage_rate']),
+            'rank': float(row['rank']),
+        }
+        for row in reader
+    )
+
+
+def load_json(data):
+    return json.loads(data)
+
+
+class Dataset:
+    """
+    One loaded file. Neither the records nor the bodies are modified after loading.
+
+    Args:
+    records: parsed content of the file
+    version (str): data version of the snapshot
+    serve (bool): precompute the response bodies of the records
+    """
+
+    def __init__(self, records, version, serve=True):
+        self.records = records
+        self.body = CachedBody(to_json_bytes(records), version) if serve else None
+
+
+class Snapshot:
+    def __init__(self, version, datasets, indexes=None):
+        self.version = version
+        self.datasets = datasets
+        self.indexes = indexes or {}
+
+
+class StaleDataError(Exception):
+    """A published file does not match the manifest, the publish is still running."""
+
+
+class DataStore:
+    """
+    Current snapshot of the published pipeline outputs.
+
+    Args:
+    data_dir (str): directory the pipeline publishes to
+    poll_interval (float): seconds between checks for a new version
+    """
+
+    def __init__(self, data_dir, poll_interval=5.0):
+        self.data_dir = data_dir
+        self.poll_interval = poll_interval
+        self.sources = {}
+        self.index_builders = {}
+        self.snapshot = Snapshot(None, {})
+        self.reload_lock = threading.Lock()
+        self.watcher = None
+
+    def register(self, name, filename, loader, serve=True, mapped=False):
+        """
+        Args:
+        name (str): dataset name the API looks it up by
+        filename (str): file in data_dir
+        loader (callable): file bytes -> records, or the open binary file -> records
+            for mapped files
+        serve (bool): the records are served as they are, not only through indexes
+        mapped (bool): the loader memory-maps the file instead of getting a copy of it
+        """
+        self.sources[name] = (filename, loader, serve, mapped)
+
+    def register_index(self, name, build):
+        """
+        Args:
+        name (str): index name the API looks it up by
+        build (callable): datasets of a snapshot -> index, rebuilt for every version
+        """
+        self.index_builders[name] = build
+
+    def dataset(self, name):
+        # Reading the attribute once gives a consistent snapshot for the whole request
+        return self.snapshot.datasets.get(name)
+
+    def index(self, name):
+        return self.snapshot.indexes.get(name)
+
+    def read_manifest(self):
+        try:
+            with open(os.path.join(self.data_dir, MANIFEST_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def file_version(self):
+        # Without a manifest the files are only reloaded when their size or mtime changes
+        stamps = []
+        for filename, _, _, _ in self.sources.values():
+            try:
+                stat = os.stat(os.path.join(self.data_dir, filename))
+                stamps.append((filename, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamps.append((filename, None, None))
+        return 'files-' + hashlib.sha256(repr(stamps).encode()).hexdigest()[:12]
+
+    def load_snapshot(self, manifest, version):
+        datasets = {}
+        for name, (filename, loader, serve, mapped) in self.sources.items():
+            try:
+                f = open(os.path.join(self.data_dir, filename), 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                if mapped:
+                    # Hashed block by block and mapped from the same open file, a
+                    # publish renaming a new file into place doesn't change the mapping
+                    digest = hashlib.sha256()
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(block)
+                    f.seek(0)
+                    data = f
+                else:
+                    data = f.read()
+                    digest = hashlib.sha256(data)
+                expected = manifest['files'].get(filename) if manifest else None
+                if expected and digest.hexdigest() != expected:
+                    raise StaleDataError(f'{filename} does not match manifest {version}')
+                datasets[name] = Dataset(loader(data), version, serve)
+        indexes = {name: build(datasets) for name, build in self.index_builders.items()}
+        return Snapshot(version, datasets, indexes)
+
+    def reload(self):
+        """
+        Loads the published files if their version changed.
+
+        Returns:
+        bool: True if a new snapshot was swapped in
+        """
+        with self.reload_lock:
+            manifest = self.read_manifest()
+            version = manifest['version'] if manifest else self.file_version()
+            if version == self.snapshot.version:
+                return False
+            # Built completely before the swap, a single attribute assignment
+            self.snapshot = self.load_snapshot(manifest, version)
+            logger.info('Loaded data version %s', version)
+            return True
+
+    def try_reload(self):
+        try:
+            return self.reload()
+        except StaleDataError as e:
+            logger.info('Waiting for publish to finish: %s', e)
+        except Exception:
+            logger.exception('Failed to load data from %s', self.data_dir)
+        return False
+
+    def watch(self):
+        while True:
+            time.sleep(self.poll_interval)
+            self.try_reload()
+
+    def start(self):
+        """Loads the current data and starts the watcher thread."""
+        self.try_reload()
+        if self.watcher is None and self.poll_interval:
+            self.watcher = threading.Thread(target=self.watch, name='data-store-watcher', daemon=True)
+            self.watcher.start()
+        return self
+
+
+def brawler_data_store():
+    """Data store of the published pipeline outputs, configured from the environment."""
+    from query_index import build_pair_cube_index, build_query_index, build_trio_index, map_npy
+
+    store = DataStore(
+        os.getenv('BRAWLER_DATA_DIR', '.'),
+        poll_interval=float(os.getenv('BRAWLER_DATA_POLL_SECONDS', '5')),
+    )
+    # Files of a time window are published as e.g. brawler_synergy_7d.json
+    for window in [None] + TIME_WINDOWS:
+        suffix = f'_{window}' if window else ''
+        store.register(window_name('brawler_data', window), f'brawler_data{suffix}.csv', load_brawler_data)
+        store.register(window_name('synergy', window), f'brawler_synergy{suffix}.json', load_json, serve=False)
+        store.register(window_name('counters', window), f'brawler_counters{suffix}.json', load_json, serve=False)
+        store.register(
+            window_name('map_winrates', window), f'brawler_map_winrates{suffix}.json', load_json, serve=False
+        )
+        store.register_index(
+            window_name('queries', window), lambda datasets, window=window: build_query_index(datasets, window)
+        )
+    # Per-map and per-mode pair counts, sliced from the mapped cubes and not served whole
+    store.register('pair_cubes', 'pair_cubes.json', load_json, serve=False)
+    store.register('map_pair_cubes', 'map_pair_cubes.npy', map_npy, serve=False, mapped=True)
+    store.register('mode_pair_cubes', 'mode_pair_cubes.npy', map_npy, serve=False, mapped=True)
+    store.register_index('pair_cubes', build_pair_cube_index)
+    store.register('team_trios', 'team_trios.json', load_json, serve=False)
+    store.register_index('team_trios', build_trio_index)
+    return store
@@ -0,0 +1,21 @@
+import os
+import multiprocessing
+
+"""
+Production launcher config for the ASGI app:
+    gunicorn -c gunicorn.conf.py asgi:app
+Each worker is a separate process with its own event loop, data store and player cache.
+"""
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn.workers.UvicornWorker'
+# Slow upstream lookups don't block the event loop, so only a hung worker hits this
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+backlog = 4096
+# Recycles workers now and then, jittered so they don't restart together
+max_requests = 100000
+max_requests_jitter = 10000
+accesslog = os.getenv('ACCESS_LOG')
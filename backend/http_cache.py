@@ -0,0 +1,133 @@
+import os
+import gzip
+
+try:
+    import brotli
+except ImportError:  # Responses are only offered in gzip without it
+    brotli = None
+
+"""
+HTTP Cache - precompressed response bodies with ETags and conditional GET
+    Served datasets are compressed once per data version, in every encoding the client
+    may accept. Strong ETags are derived from the published data version and the
+    encoding, so a client whose cached copy is still current gets an empty 304.
+"""
+
+# Below this size compression isn't worth the Content-Encoding header
+MIN_COMPRESS_BYTES = 1024
+# Server preference when the client accepts several encodings equally
+ENCODING_PREFERENCE = ('br', 'gzip', 'identity')
+CACHE_CONTROL = f"public, max-age={int(os.getenv('BRAWLER_DATA_MAX_AGE_SECONDS', '300'))}"
+
+
+def compress(body):
+    encodings = {'identity': body}
+    if len(body) >= MIN_COMPRESS_BYTES:
+        # mtime=0 keeps the gzip bytes identical for identical data
+        encodings['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            encodings['br'] = brotli.compress(body, quality=11)
+    return encodings
+
+
+def make_etag(version, encoding='identity'):
+    # Each encoding is a different representation, so it needs its own strong ETag
+    if encoding == 'identity':
+        return f'"{version}"'
+    return f'"{version}-{encoding}"'
+
+
+def parse_accept_encoding(header):
+    """
+    Returns:
+    dict: content coding -> q value
+    """
+    weights = {}
+    for part in (header or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding] = q
+    return weights
+
+
+def select_encoding(available, accept_encoding):
+    weights = parse_accept_encoding(accept_encoding)
+    default = weights.get('*', 0.0)
+
+    def weight(encoding):
+        if encoding == 'identity':
+            # Acceptable unless refused explicitly or through *;q=0
+            return weights.get('identity', default if '*' in weights else 1.0)
+        return weights.get(encoding, default)
+
+    candidates = [encoding for encoding in ENCODING_PREFERENCE if encoding in available and weight(encoding) > 0]
+    if not candidates:
+        return 'identity'
+    return max(candidates, key=lambda encoding: (weight(encoding), -ENCODING_PREFERENCE.index(encoding)))
+
+
+def etag_matches(if_none_match, etags):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match uses the weak comparison
+    tags = {tag.strip().removeprefix('W/') for tag in if_none_match.split(',')}
+    return not tags.isdisjoint(etags)
+
+
+class CachedBody:
+    """
+    Every encoding and ETag of one response body.
+
+    Args:
+    body (bytes): uncompressed JSON
+    version (str): data version the body was built from
+    """
+
+    def __init__(self, body, version):
+        self.version = version
+        self.encodings = compress(body)
+        self.etags = {encoding: make_etag(version, encoding) for encoding in self.encodings}
+
+    def respond(self, accept_encoding, if_none_match):
+        """
+        Returns:
+        tuple: (status, headers, body)
+        """
+        encoding = select_encoding(self.encodings, accept_encoding)
+        headers = [('ETag', self.etags[encoding]), ('Cache-Control', CACHE_CONTROL)]
+        if len(self.encodings) > 1:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if etag_matches(if_none_match, self.etags.values()):
+            return 304, headers, b''
+        if encoding != 'identity':
+            headers.append(('Content-Encoding', encoding))
+        return 200, headers, self.encodings[encoding]
+
+
+def respond_versioned(version, if_none_match, build):
+    """
+    Conditional GET for small responses built per request, which are not compressed.
+    The body at a URL only depends on the data version, so the version is the ETag.
+
+    Args:
+    build (callable): () -> body, only called when the client's copy is out of date
+
+    Returns:
+    tuple: (status, headers, body)
+    """
+    etag = make_etag(version)
+    headers = [('ETag', etag), ('Cache-Control', CACHE_CONTROL)]
+    if etag_matches(if_none_match, (etag,)):
+        return 304, headers, b''
+    return 200, headers, build()
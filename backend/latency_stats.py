@@ -0,0 +1,43 @@
+import threading
+from collections import deque
+
+"""
+Latency Stats - percentiles over the most recent samples of a latency
+"""
+
+# Samples kept for the percentiles
+LATENCY_SAMPLES = 1000
+
+
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class LatencyStats:
+    def __init__(self, samples=LATENCY_SAMPLES):
+        self.samples = deque(maxlen=samples)
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def summary(self, scale=1000):
+        """
+        Args:
+        scale (float): factor applied to the samples, 1000 turns seconds into milliseconds
+
+        Returns:
+        dict: p50 and p99 of the scaled samples, None without samples
+        """
+        with self.lock:
+            samples = list(self.samples)
+        p50, p99 = percentile(samples, 0.5), percentile(samples, 0.99)
+        return {
+            'p50': p50 * scale if p50 is not None else None,
+            'p99': p99 * scale if p99 is not None else None,
+            'samples': len(samples),
+        }
@@ -0,0 +1,317 @@
+import os
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import quote
+
+import requests
+from requests.adapters import HTTPAdapter
+from latency_stats import LatencyStats
+
+try:
+    import aiohttp
+except ImportError:  # Only needed by the ASGI app
+    aiohttp = None
+
+"""
+Player Lookup - cached, coalesced player profile requests to the Brawl Stars API
+    Profiles are kept in a TTL + LRU cache keyed by tag. Concurrent lookups of the same
+    tag share one upstream call, and a profile past its TTL but within its stale window
+    is served right away while a background refresh fetches a new one. Upstream calls
+    reuse keep-alive connections from a pooled session and have a timeout.
+    PlayerLookup serves the Flask app from threads, AsyncPlayerLookup serves the ASGI
+    app from an event loop with the same cache.
+"""
+
+DEFAULT_API_URL = 'https://api.brawlstars.com/v1'
+
+
+def filter_player_data(player_data):
+    # Extract the required fields
+    filtered_data = {
+        "tag": player_data.get("tag"),
+        "name": player_data.get("name"),
+        "trophies": player_data.get("trophies"),
+        "highestTrophies": player_data.get("highestTrophies"),
+        "3vs3Victories": player_data.get("3vs3Victories"),
+        "soloVictories": player_data.get("soloVictories"),
+        "duoVictories": player_data.get("duoVictories"),
+        "club": player_data.get("club")
+    }
+
+    # Get the top 5 brawlers by trophies
+    brawlers = player_data.get("brawlers", [])
+    top_brawlers = sorted(brawlers, key=lambda x: x.get("trophies", 0), reverse=True)[:5]
+    filtered_data["topBrawlers"] = top_brawlers
+    return filtered_data
+
+
+def player_tag_key(player_tag):
+    return '#' + player_tag.lstrip('#').upper()
+
+
+class UpstreamError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f'Upstream returned {status_code}')
+        self.status_code = status_code
+
+
+class PlayerCache:
+    """
+    TTL + LRU cache of player profiles with lookup statistics.
+
+    Args:
+    ttl (float): seconds a profile is served as fresh
+    stale_ttl (float): further seconds a profile is served while it is refreshed
+    max_entries (int): profiles kept, the least recently used are evicted
+    """
+
+    FRESH, STALE, MISSING = 'fresh', 'stale', 'missing'
+
+    def __init__(self, ttl=60.0, stale_ttl=300.0, max_entries=10000):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'coalesced': 0,
+                       'upstream_calls': 0, 'upstream_errors': 0}
+        self.latencies = LatencyStats()
+
+    def lookup(self, tag):
+        """
+        Returns:
+        tuple: (state, profile), profile is None when missing
+        """
+        with self.lock:
+            entry = self.entries.get(tag)
+            if entry is None:
+                self.counts['misses'] += 1
+                return self.MISSING, None
+            profile, fetched_at = entry
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl:
+                self.entries.move_to_end(tag)
+                self.counts['hits'] += 1
+                return self.FRESH, profile
+            if age <= self.ttl + self.stale_ttl:
+                self.entries.move_to_end(tag)
+                self.counts['stale_hits'] += 1
+                return self.STALE, profile
+            del self.entries[tag]
+            self.counts['misses'] += 1
+            return self.MISSING, None
+
+    def store(self, tag, profile):
+        with self.lock:
+            self.entries[tag] = (profile, time.monotonic())
+            self.entries.move_to_end(tag)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def record_upstream(self, seconds, ok):
+        with self.lock:
+            self.counts['upstream_calls'] += 1
+            if not ok:
+                self.counts['upstream_errors'] += 1
+        self.latencies.add(seconds)
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+            entries = len(self.entries)
+        lookups = counts['hits'] + counts['stale_hits'] + counts['misses']
+        served = counts['hits'] + counts['stale_hits'] + counts['coalesced']
+        return {
+            **counts,
+            'entries': entries,
+            'hit_rate': served / lookups if lookups else None,
+            'upstream_latency_ms': self.latencies.summary(),
+        }
+
+
+def player_cache_from_env():
+    return PlayerCache(
+        ttl=float(os.getenv('PLAYER_CACHE_TTL_SECONDS', '60')),
+        stale_ttl=float(os.getenv('PLAYER_CACHE_STALE_SECONDS', '300')),
+        max_entries=int(os.getenv('PLAYER_CACHE_MAX_ENTRIES', '10000')),
+    )
+
+
+class PlayerLookup:
+    """
+    Thread-safe player profile lookups for the WSGI app.
+
+    Args:
+    api_key (str): Brawl Stars API key
+    api_url (str): API base URL
+    cache (PlayerCache): profile cache
+    transform (callable): raw API profile -> cached profile
+    timeout (float): seconds before an upstream call fails
+    pool_size (int): keep-alive connections kept to the API
+    """
+
+    def __init__(self, api_key, api_url, cache, transform=lambda profile: profile,
+                 timeout=5.0, pool_size=32):
+        self.api_url = api_url.rstrip('/')
+        self.cache = cache
+        self.transform = transform
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Authorization'] = f'Bearer {api_key}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.in_flight = {}
+        self.in_flight_lock = threading.Lock()
+        self.refresher = ThreadPoolExecutor(max_workers=4, thread_name_prefix='player-refresh')
+
+    def fetch(self, tag):
+        start = time.perf_counter()
+        ok = False
+        try:
+            response = self.session.get(
+                f'{self.api_url}/players/{quote(tag)}', timeout=self.timeout
+            )
+            if response.status_code != 200:
+                raise UpstreamError(response.status_code)
+            ok = True
+            return self.transform(response.json())
+        finally:
+            self.cache.record_upstream(time.perf_counter() - start, ok)
+
+    def fetch_once(self, tag, coalesce=True):
+        """
+        Fetches a profile, joining the call already in flight for the tag if any.
+        """
+        with self.in_flight_lock:
+            future = self.in_flight.get(tag)
+            leader = future is None
+            if leader:
+                future = self.in_flight[tag] = Future()
+        if not leader:
+            if coalesce:
+                self.cache.count('coalesced')
+            return future.result()
+        try:
+            profile = self.fetch(tag)
+            self.cache.store(tag, profile)
+            future.set_result(profile)
+            return profile
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.in_flight_lock:
+                del self.in_flight[tag]
+
+    def refresh(self, tag):
+        try:
+            self.fetch_once(tag, coalesce=False)
+        except Exception:
+            # The stale profile keeps being served until a refresh succeeds
+            pass
+
+    def get(self, tag):
+        """
+        Args:
+        tag (str): player tag with its leading #
+
+        Returns:
+        profile, raises UpstreamError for non-200 responses
+        """
+        state, profile = self.cache.lookup(tag)
+        if state == PlayerCache.FRESH:
+            return profile
+        if state == PlayerCache.STALE:
+            with self.in_flight_lock:
+                refreshing = tag in self.in_flight
+            if not refreshing:
+                self.refresher.submit(self.refresh, tag)
+            return profile
+        return self.fetch_once(tag)
+
+
+class AsyncPlayerLookup:
+    """
+    Player profile lookups for the ASGI app, without blocking the event loop.
+
+    Same arguments as PlayerLookup, start() has to be awaited in the loop that serves
+    the lookups before the first one.
+    """
+
+    def __init__(self, api_key, api_url, cache, transform=lambda profile: profile,
+                 timeout=5.0, pool_size=512):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for async player lookups')
+        self.api_key = api_key
+        self.api_url = api_url.rstrip('/')
+        self.cache = cache
+        self.transform = transform
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.session = None
+        self.in_flight = {}
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(
+            headers={'Authorization': f'Bearer {self.api_key}'},
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    async def fetch(self, tag):
+        start = time.perf_counter()
+        ok = False
+        try:
+            async with self.session.get(f'{self.api_url}/players/{quote(tag)}') as response:
+                if response.status != 200:
+                    raise UpstreamError(response.status)
+                profile = self.transform(await response.json(content_type=None))
+            self.cache.store(tag, profile)
+            ok = True
+            return profile
+        finally:
+            self.cache.record_upstream(time.perf_counter() - start, ok)
+
+    def fetch_task(self, tag):
+        """
+        Returns:
+        tuple: (task fetching the tag, True if it was already in flight)
+        """
+        task = self.in_flight.get(tag)
+        if task is not None:
+            return task, True
+        task = self.in_flight[tag] = asyncio.ensure_future(self.fetch(tag))
+
+        def done(task):
+            del self.in_flight[tag]
+            # Marks the exception as retrieved for refreshes nobody awaits
+            if not task.cancelled():
+                task.exception()
+
+        task.add_done_callback(done)
+        return task, False
+
+    async def get(self, tag):
+        state, profile = self.cache.lookup(tag)
+        if state == PlayerCache.FRESH:
+            return profile
+        if state == PlayerCache.STALE:
+            self.fetch_task(tag)
+            return profile
+        task, joined = self.fetch_task(tag)
+        if joined:
+            self.cache.count('coalesced')
+        # A client disconnecting cancels its wait, not the call the others share
+        return await asyncio.shield(task)
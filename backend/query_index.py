@@ -0,0 +1,308 @@
+import numpy as np
+from data_store import to_json_bytes, window_name
+
+"""
+Query Index - synergy, counter and map winrate lookups from dense arrays
+    The pipeline's nested JSON files are turned into matrices indexed by integer brawler
+    and map ids once per data version. Each brawler's best teammates and counters and
+    each map's best brawlers are sorted and serialized entry by entry at load time, so a
+    top-k query is a dictionary lookup and a join of k byte strings. Per-map and
+    per-mode pair queries have too many combinations to serialize ahead, they slice
+    the memory-mapped pair cubes and rank one brawler's row instead.
+"""
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 50
+
+
+def name_key(name):
+    # The pipeline files spell brawler names in different cases
+    return name.upper()
+
+
+class QueryIndex:
+    """
+    Args:
+    synergy (dict): brawler_synergy.json, {A: {B: {wins, losses, winrate, synergy}}}
+    counters (dict): brawler_counters.json, {A: [{brawler: B, percentage}]} with A's
+        win percentage against B
+    map_winrates (dict): brawler_map_winrates.json, {map: [{brawler, winrate, ranking}]}
+    """
+
+    def __init__(self, synergy, counters, map_winrates):
+        names = {}
+        for brawler, teammates in synergy.items():
+            names.setdefault(name_key(brawler), brawler)
+            for teammate in teammates:
+                names.setdefault(name_key(teammate), teammate)
+        for brawler, opponents in counters.items():
+            names.setdefault(name_key(brawler), brawler)
+            for opponent in opponents:
+                names.setdefault(name_key(opponent['brawler']), opponent['brawler'])
+        for brawlers in map_winrates.values():
+            for entry in brawlers:
+                names.setdefault(name_key(entry['brawler']), entry['brawler'])
+
+        self.brawler_keys = sorted(names)
+        self.brawler_names = [names[key] for key in self.brawler_keys]
+        self.brawler_ids = {key: i for i, key in enumerate(self.brawler_keys)}
+        self.map_names = sorted(map_winrates)
+        self.map_ids = {name_key(map_name): i for i, map_name in enumerate(self.map_names)}
+        n, m = len(self.brawler_keys), len(self.map_names)
+
+        self.pair_wins = np.zeros((n, n), dtype=np.int64)
+        self.pair_losses = np.zeros((n, n), dtype=np.int64)
+        self.pair_winrate = np.zeros((n, n), dtype=np.float64)
+        self.pair_synergy = np.full((n, n), np.nan)
+        for brawler, teammates in synergy.items():
+            a = self.brawler_ids[name_key(brawler)]
+            for teammate, stats in teammates.items():
+                b = self.brawler_ids[name_key(teammate)]
+                self.pair_wins[a, b] = stats['wins']
+                self.pair_losses[a, b] = stats['losses']
+                self.pair_winrate[a, b] = stats['winrate']
+                self.pair_synergy[a, b] = stats['synergy']
+
+        # matchup[a, b]: a's win percentage against b, NaN without games
+        self.matchup = np.full((n, n), np.nan)
+        for brawler, opponents in counters.items():
+            a = self.brawler_ids[name_key(brawler)]
+            for opponent in opponents:
+                self.matchup[a, self.brawler_ids[name_key(opponent['brawler'])]] = opponent['percentage']
+
+        self.map_winrate = np.full((m, n), np.nan)
+        for map_name, brawlers in map_winrates.items():
+            map_id = self.map_ids[name_key(map_name)]
+            for entry in brawlers:
+                self.map_winrate[map_id, self.brawler_ids[name_key(entry['brawler'])]] = entry['winrate']
+
+        games = self.pair_wins + self.pair_losses
+        self.top_teammates = [
+            self.top_entries(
+                self.pair_synergy[a],
+                lambda b, a=a: {
+                    'brawler': self.brawler_names[b],
+                    'synergy': float(self.pair_synergy[a, b]),
+                    'winrate': float(self.pair_winrate[a, b]),
+                    'games': int(games[a, b]),
+                },
+                valid=(games[a] > 0),
+            )
+            for a in range(n)
+        ]
+        self.top_counters = [
+            self.top_entries(
+                self.matchup[:, b],
+                lambda a, b=b: {'brawler': self.brawler_names[a], 'percentage': float(self.matchup[a, b])},
+            )
+            for b in range(n)
+        ]
+        self.top_map_brawlers = [
+            self.top_entries(
+                self.map_winrate[map_id],
+                lambda b, map_id=map_id: {
+                    'brawler': self.brawler_names[b],
+                    'winrate': float(self.map_winrate[map_id, b]),
+                },
+            )
+            for map_id in range(m)
+        ]
+
+    @staticmethod
+    def top_entries(scores, entry, valid=None):
+        """
+        Returns:
+        tuple: JSON bytes of each of the best MAX_TOP_K entries
+        """
+        valid = ~np.isnan(scores) if valid is None else valid & ~np.isnan(scores)
+        candidates = np.flatnonzero(valid)
+        # Stable sort keeps ties in id order
+        order = candidates[np.argsort(-scores[candidates], kind='stable')][:MAX_TOP_K]
+        return tuple(to_json_bytes(entry(int(i))) for i in order)
+
+    def brawler_id(self, brawler):
+        """Raises KeyError for unknown brawlers."""
+        return self.brawler_ids[name_key(brawler)]
+
+    def top(self, lists, i, k):
+        return b'[' + b','.join(lists[i][:max(0, min(k, MAX_TOP_K))]) + b']'
+
+    def teammates(self, brawler, k=DEFAULT_TOP_K):
+        return self.top(self.top_teammates, self.brawler_id(brawler), k)
+
+    def counters(self, brawler, k=DEFAULT_TOP_K):
+        return self.top(self.top_counters, self.brawler_id(brawler), k)
+
+    def map_brawlers(self, map_name, k=DEFAULT_TOP_K):
+        return self.top(self.top_map_brawlers, self.map_ids[name_key(map_name)], k)
+
+    def pair(self, brawler, teammate):
+        a, b = self.brawler_id(brawler), self.brawler_id(teammate)
+        games = int(self.pair_wins[a, b] + self.pair_losses[a, b])
+        synergy = self.pair_synergy[a, b]
+        return to_json_bytes({
+            'brawlers': [self.brawler_names[a], self.brawler_names[b]],
+            'wins': int(self.pair_wins[a, b]),
+            'losses': int(self.pair_losses[a, b]),
+            'games': games,
+            'winrate': float(self.pair_winrate[a, b]) if games else None,
+            'synergy': float(synergy) if games and not np.isnan(synergy) else None,
+        })
+
+
+def map_npy(f):
+    """
+    Memory-maps the array of an open .npy file, read-only.
+
+    Returns:
+    ndarray: the array, its pages are only read when it is sliced
+    """
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    if not np.prod(shape):
+        # An empty file region can't be mapped
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(f, dtype=dtype, mode='r', shape=shape, offset=f.tell(), order='F' if fortran_order else 'C')
+
+
+class PairCubeIndex:
+    """
+    Teammate and counter lookups on one map or in one mode, sliced from the pair cubes
+    written by cronjobs_and_ml/data_processing/pair_cubes.py, where the layout is
+    described. Nothing is precomputed, a query reads the brawler x brawler tables of
+    its map or mode from the memory-mapped cube.
+
+    Args:
+    meta (dict): pair_cubes.json
+    map_cubes, mode_cubes (ndarray[group, table, brawler, brawler]): pair counts of
+        each map and mode
+    """
+
+    def __init__(self, meta, map_cubes, mode_cubes):
+        self.brawler_names = meta['brawlers']
+        self.brawler_ids = {name_key(brawler): i for i, brawler in enumerate(self.brawler_names)}
+        self.tables = {table: i for i, table in enumerate(meta['tables'])}
+        self.groups = {
+            'map': (map_cubes, {name_key(name): i for i, name in enumerate(meta['maps'])}),
+            'mode': (mode_cubes, {name_key(name): i for i, name in enumerate(meta['modes'])}),
+        }
+        n = len(self.brawler_names)
+        for key, group in (('maps', map_cubes), ('modes', mode_cubes)):
+            if group.shape != (len(meta[key]), len(self.tables), n, n):
+                raise ValueError(f'Pair cubes of {key} do not match pair_cubes.json')
+
+    def table(self, kind, group, name):
+        """
+        Raises KeyError for unknown maps and modes.
+
+        Returns:
+        ndarray: brawler x brawler counts of one table in the map or mode
+        """
+        cubes, group_ids = self.groups[kind]
+        return np.asarray(cubes[group_ids[name_key(group)], self.tables[name]], dtype=np.int64)
+
+    def brawler_id(self, brawler):
+        """Raises KeyError for unknown brawlers."""
+        return self.brawler_ids[name_key(brawler)]
+
+    @staticmethod
+    def top(scores, valid, entry, k):
+        candidates = np.flatnonzero(valid)
+        # Stable sort keeps ties in id order, only the k entries asked for are serialized
+        order = candidates[np.argsort(-scores[candidates], kind='stable')][:max(0, min(k, MAX_TOP_K))]
+        return to_json_bytes([entry(int(i)) for i in order])
+
+    def teammates(self, kind, group, brawler, k=DEFAULT_TOP_K, min_games=1):
+        """
+        Best teammates of a brawler on a map or in a mode, by synergy: the pair's win
+        rate over the average of both brawlers' win rates there, as in brawler_synergy.json.
+        """
+        a = self.brawler_id(brawler)
+        pair_wins = self.table(kind, group, 'teammate_wins')
+        pair_losses = self.table(kind, group, 'teammate_losses')
+        # Every full-team game of a brawler is in its row once per teammate, the row
+        # sums have the brawler's win rate on full teams
+        team_wins, team_games = pair_wins.sum(axis=1), (pair_wins + pair_losses).sum(axis=1)
+        brawler_winrates = np.divide(team_wins, team_games, out=np.zeros(len(team_wins)), where=team_games > 0)
+        games = pair_wins[a] + pair_losses[a]
+        winrates = np.divide(pair_wins[a], games, out=np.zeros(len(games)), where=games > 0)
+        synergy = 0.50 + winrates - (brawler_winrates[a] + brawler_winrates) / 2
+        valid = games >= max(1, min_games)
+        valid[a] = False
+        return self.top(
+            synergy,
+            valid,
+            lambda b: {
+                'brawler': self.brawler_names[b],
+                'synergy': float(synergy[b]),
+                'winrate': float(winrates[b]),
+                'games': int(games[b]),
+            },
+            k,
+        )
+
+    def counters(self, kind, group, brawler, k=DEFAULT_TOP_K, min_games=1):
+        """Brawlers that beat a brawler most often on a map or in a mode."""
+        b = self.brawler_id(brawler)
+        opponent_wins = self.table(kind, group, 'opponent_wins')
+        # Wins of every brawler against b, and b's wins against them
+        wins, losses = opponent_wins[:, b], opponent_wins[b]
+        games = wins + losses
+        percentages = 100 * np.divide(wins, games, out=np.zeros(len(games)), where=games > 0)
+        valid = games >= max(1, min_games)
+        valid[b] = False
+        return self.top(
+            percentages,
+            valid,
+            lambda a: {
+                'brawler': self.brawler_names[a],
+                'percentage': float(percentages[a]),
+                'games': int(games[a]),
+            },
+            k,
+        )
+
+
+class TrioIndex:
+    """
+    Args:
+    team_trios (dict): team_trios.json, {map: [{brawlers, wins, losses, games, winrate}]}
+        with each map's best trios first
+    """
+
+    def __init__(self, team_trios):
+        self.top_trios = {
+            name_key(map_name): tuple(to_json_bytes(trio) for trio in trios[:MAX_TOP_K])
+            for map_name, trios in team_trios.items()
+        }
+
+    def map_trios(self, map_name, k=DEFAULT_TOP_K):
+        return b'[' + b','.join(self.top_trios[name_key(map_name)][:max(0, min(k, MAX_TOP_K))]) + b']'
+
+
+def build_trio_index(datasets):
+    dataset = datasets.get('team_trios')
+    return TrioIndex(dataset.records) if dataset is not None else None
+
+
+def build_pair_cube_index(datasets):
+    names = ['pair_cubes', 'map_pair_cubes', 'mode_pair_cubes']
+    if not all(name in datasets for name in names):
+        return None
+    return PairCubeIndex(*(datasets[name].records for name in names))
+
+
+def build_query_index(datasets, window=None):
+    def records(name):
+        dataset = datasets.get(window_name(name, window))
+        return dataset.records if dataset is not None else {}
+
+    names = ['synergy', 'counters', 'map_winrates']
+    if window and not any(window_name(name, window) in datasets for name in names):
+        # The window isn't published
+        return None
+
+    return QueryIndex(records('synergy'), records('counters'), records('map_winrates'))
@@ -0,0 +1,429 @@
+import os
+import json
+import time
+import hashlib
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+from data_store import to_json_bytes
+from latency_stats import LatencyStats
+
+try:
+    import joblib
+    import scipy.sparse as sp
+except ImportError:  # Only needed for /api/recommend
+    joblib = sp = None
+
+"""
+Recommender - draft recommendations from the random forest trained by models/random_forest.py
+    The model is loaded once. Draft states are encoded straight into the model's sparse
+    feature columns, the multi-hot teams of models/team_encoding.py or the one-hot
+    columns of an older pipeline's fitted OneHotEncoder, without building a DataFrame,
+    and concurrent requests are answered by one predict_proba call per batch on a single
+    batching thread. Common draft states are answered from the table precomputed by
+    models/precompute_recommendations.py, which is memory-mapped, without running the
+    model.
+"""
+
+DRAFT_COLUMNS = ['battle_mode', 'map_name', 'winner_1', 'winner_2', 'winner_3', 'loser_1', 'loser_2', 'loser_3']
+DEFAULT_RECOMMENDATIONS = 10
+# Model dict saved by models/random_forest.py, older models are sklearn Pipelines
+TEAM_MODEL_FORMAT = 'team_multi_hot'
+
+logger = logging.getLogger(__name__)
+
+
+def name_key(name):
+    return name.strip().upper()
+
+
+def brawler_display_name(brawler):
+    # The battle log spells names in capitals, e.g. EL PRIMO -> El Primo, 8-BIT -> 8-Bit
+    return brawler.title()
+
+
+class DraftEncoder:
+    """
+    The model's ColumnTransformer for single draft states, writing sparse rows directly.
+
+    Args:
+    pipeline (Pipeline): model saved by random_forest.py, a 'preprocessor'
+        ColumnTransformer with one OneHotEncoder(handle_unknown='ignore') step
+    """
+
+    def __init__(self, pipeline):
+        preprocessor = pipeline.named_steps['preprocessor']
+        transformers = [t for t in preprocessor.transformers_ if t[0] != 'remainder']
+        if len(transformers) != 1:
+            raise ValueError('Expected a single one-hot encoding step')
+        _, encoder, columns = transformers[0]
+        if getattr(encoder, 'drop_idx_', None) is not None or getattr(encoder, 'infrequent_categories_', None):
+            raise ValueError('Dropped or infrequent categories are not supported')
+        self.columns = list(columns)
+        # Column -> category -> feature index, unknown categories encode to nothing
+        self.codes = []
+        offset = 0
+        for categories in encoder.categories_:
+            self.codes.append({
+                name_key(category): offset + i
+                for i, category in enumerate(categories)
+                if isinstance(category, str)
+            })
+            offset += len(categories)
+        self.n_features = offset
+
+    def encode(self, drafts):
+        """
+        Args:
+        drafts (list): dicts of column -> value
+
+        Returns:
+        csr_matrix: one row per draft
+        """
+        indices = []
+        indptr = [0]
+        for draft in drafts:
+            for column, codes in zip(self.columns, self.codes):
+                code = codes.get(name_key(draft.get(column) or ''))
+                if code is not None:
+                    indices.append(code)
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (np.ones(len(indices)), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(drafts), self.n_features),
+        )
+
+
+class TeamDraftEncoder:
+    """
+    The multi-hot team encoding of models/team_encoding.py for draft states: battle
+    mode, map, the draft's teammates and its opponents.
+
+    Args:
+    model (dict): model saved by random_forest.py
+    """
+
+    def __init__(self, model):
+        modes, maps, brawlers = model['modes'], model['maps'], model['brawlers']
+        self.mode_codes = {name_key(mode): i for i, mode in enumerate(modes)}
+        self.map_codes = {name_key(map_name): len(modes) + i for i, map_name in enumerate(maps)}
+        teammate_offset = len(modes) + len(maps)
+        opponent_offset = teammate_offset + len(brawlers)
+        self.team_codes = [
+            (DRAFT_COLUMNS[2:5], {name_key(brawler): teammate_offset + i for i, brawler in enumerate(brawlers)}),
+            (DRAFT_COLUMNS[5:], {name_key(brawler): opponent_offset + i for i, brawler in enumerate(brawlers)}),
+        ]
+        self.n_features = opponent_offset + len(brawlers)
+
+    def encode(self, drafts):
+        """
+        Args:
+        drafts (list): dicts of column -> value
+
+        Returns:
+        csr_matrix: one row per draft
+        """
+        indices = []
+        indptr = [0]
+        for draft in drafts:
+            codes = [
+                self.mode_codes.get(name_key(draft.get('battle_mode') or '')),
+                self.map_codes.get(name_key(draft.get('map_name') or '')),
+            ]
+            for columns, team_codes in self.team_codes:
+                # A brawler picked twice on a team is one feature
+                codes.extend({team_codes.get(name_key(draft.get(column) or '')) for column in columns})
+            indices.extend(sorted(code for code in codes if code is not None))
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int32)),
+            shape=(len(drafts), self.n_features),
+        )
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RecommendationTable:
+    """
+    Top picks for (mode, map) with up to 2 teammates and no opponents, as written by
+    models/precompute_recommendations.py, where the layout is described.
+
+    Args:
+    table_dir (str): directory of meta.json and the .npy arrays
+    """
+
+    def __init__(self, table_dir):
+        with open(os.path.join(table_dir, 'meta.json')) as f:
+            meta = json.load(f)
+        self.model_sha256 = meta['model_sha256']
+        self.top_n = meta['top_n']
+        self.states_per_map = meta['states_per_map']
+        self.brawler_ids = {name_key(brawler): i for i, brawler in enumerate(meta['brawlers'])}
+        self.mode_map_ids = {
+            (name_key(mode), name_key(map_name)): i for i, (mode, map_name) in enumerate(meta['mode_maps'])
+        }
+        # Pages are only read when a state is looked up and are shared between workers
+        self.picks = np.load(os.path.join(table_dir, 'brawlers.npy'), mmap_mode='r')
+        self.probabilities = np.load(os.path.join(table_dir, 'probabilities.npy'), mmap_mode='r')
+        expected_shape = (len(self.mode_map_ids) * self.states_per_map, self.top_n)
+        if self.picks.shape != expected_shape or self.probabilities.shape != expected_shape:
+            raise ValueError(f'Table arrays do not match {table_dir}/meta.json')
+
+    def state(self, draft):
+        """
+        Returns:
+        int: row of the draft state, None if the table doesn't cover it
+        """
+        if any(draft.get(column) for column in DRAFT_COLUMNS[4:]):
+            return None
+        mode_map = self.mode_map_ids.get((name_key(draft.get('battle_mode') or ''), name_key(draft.get('map_name') or '')))
+        if mode_map is None:
+            return None
+        teammates = []
+        for column in DRAFT_COLUMNS[2:4]:
+            if draft.get(column):
+                brawler = self.brawler_ids.get(name_key(draft[column]))
+                if brawler is None:
+                    return None
+                teammates.append(brawler)
+        n = len(self.brawler_ids)
+        if not teammates:
+            teammate_state = 0
+        elif len(teammates) == 1:
+            teammate_state = 1 + teammates[0]
+        else:
+            i, j = sorted(teammates)
+            if i == j:
+                return None
+            teammate_state = 1 + n + i * (2 * n - i - 1) // 2 + (j - i - 1)
+        return mode_map * self.states_per_map + teammate_state
+
+    def lookup(self, draft, k):
+        """
+        Returns:
+        list: (model class index, probability) of the top k picks, None if the table
+            doesn't cover the draft
+        """
+        if k > self.top_n:
+            return None
+        row = self.state(draft)
+        if row is None:
+            return None
+        return list(zip(self.picks[row, :k].tolist(), self.probabilities[row, :k].tolist()))
+
+
+class MicroBatcher:
+    """
+    Runs the items submitted from any thread in batches on one worker thread.
+
+    The worker takes every item queued while the previous batch ran, so batches grow
+    with the load without delaying requests when the server is idle. max_wait adds a
+    wait for more items after the first one.
+
+    Args:
+    run_batch (callable): list of items -> list of results
+    max_batch_size (int): items per batch
+    max_wait (float): seconds to wait for a batch to fill
+    """
+
+    def __init__(self, run_batch, max_batch_size=64, max_wait=0.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.batch_sizes = LatencyStats()
+        self.worker = threading.Thread(target=self.work, name='micro-batcher', daemon=True)
+        self.worker.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def next_batch(self):
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                timeout = deadline - time.monotonic()
+                batch.append(self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def work(self):
+        while True:
+            batch = self.next_batch()
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+class Recommender:
+    """
+    Args:
+    model_path (str): model saved by random_forest.py
+    max_batch_size (int): drafts per predict_proba call
+    max_wait (float): seconds a batch waits to fill
+    table_dir (str): precomputed recommendation table, ignored if it was computed for
+        another model
+    """
+
+    def __init__(self, model_path, max_batch_size=64, max_wait=0.0, table_dir=None):
+        if joblib is None:
+            raise ImportError('joblib and scipy are required for recommendations')
+        model = joblib.load(model_path)
+        self.model_path = model_path
+        if isinstance(model, dict):
+            if model.get('format') != TEAM_MODEL_FORMAT:
+                raise ValueError(f'Unknown model format {model.get("format")!r}')
+            self.classifier = model['classifier']
+            self.encoder = TeamDraftEncoder(model)
+            class_names = [model['brawlers'][brawler] for brawler in self.classifier.classes_]
+        else:
+            self.classifier = model.named_steps['classifier']
+            self.encoder = DraftEncoder(model)
+            class_names = list(self.classifier.classes_)
+        # Only brawlers are recommended, not missing values the model learned as classes
+        self.classes = [
+            (i, name_key(brawler), brawler_display_name(brawler))
+            for i, brawler in enumerate(class_names)
+            if isinstance(brawler, str) and brawler.strip()
+        ]
+        self.class_indices = np.array([i for i, _, _ in self.classes], dtype=np.intp)
+        self.display_names = {i: display_name for i, _, display_name in self.classes}
+        self.table = self.load_table(table_dir) if table_dir else None
+        self.table_hits = 0
+        self.live_requests = 0
+        self.latencies = LatencyStats()
+        self.predict_latencies = LatencyStats()
+        self.batcher = MicroBatcher(self.recommend_batch, max_batch_size, max_wait)
+
+    def load_table(self, table_dir):
+        try:
+            table = RecommendationTable(table_dir)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.exception('Failed to load recommendation table %s', table_dir)
+            return None
+        if table.model_sha256 != file_sha256(self.model_path):
+            logger.warning('Recommendation table %s is for another model, using live inference only', table_dir)
+            return None
+        return table
+
+    def rank(self, probabilities, draft, k):
+        picked = {name_key(draft.get(column) or '') for column in DRAFT_COLUMNS[2:]}
+        order = np.argsort(-probabilities[self.class_indices], kind='stable')
+        recommendations = []
+        for position in order:
+            i, key, display_name = self.classes[position]
+            if key in picked:
+                continue
+            recommendations.append({'brawler': display_name, 'probability': float(probabilities[i])})
+            if len(recommendations) == k:
+                break
+        return to_json_bytes(recommendations)
+
+    def recommend_batch(self, requests):
+        start = time.perf_counter()
+        probabilities = self.classifier.predict_proba(self.encoder.encode([draft for draft, _ in requests]))
+        self.predict_latencies.add(time.perf_counter() - start)
+        self.batcher.batch_sizes.add(len(requests))
+        return [self.rank(row, draft, k) for row, (draft, k) in zip(probabilities, requests)]
+
+    def submit(self, draft, k=DEFAULT_RECOMMENDATIONS):
+        """
+        Args:
+        draft (dict): DRAFT_COLUMNS -> value, missing picks can be left out
+
+        Returns:
+        Future: JSON bytes of the top k recommendations
+        """
+        start = time.perf_counter()
+        picks = self.table.lookup(draft, k) if self.table is not None else None
+        if picks is not None:
+            self.table_hits += 1
+            future = Future()
+            future.set_result(to_json_bytes([
+                {'brawler': self.display_names[i], 'probability': probability} for i, probability in picks
+            ]))
+            self.latencies.add(time.perf_counter() - start)
+            return future
+        self.live_requests += 1
+        future = self.batcher.submit((draft, k))
+        future.add_done_callback(lambda _: self.latencies.add(time.perf_counter() - start))
+        return future
+
+    def stats(self):
+        return {
+            'model': self.model_path,
+            'table': self.table is not None,
+            'table_hits': self.table_hits,
+            'live_requests': self.live_requests,
+            'latency_ms': self.latencies.summary(),
+            'predict_latency_ms': self.predict_latencies.summary(),
+            'batch_size': self.batcher.batch_sizes.summary(scale=1),
+        }
+
+
+def draft_from_params(params):
+    """
+    Reads a draft from the query parameters of /api/recommend:
+        mode, map, teammates and opponents as comma-separated brawlers, k
+
+    Args:
+    params (dict): query parameter -> value
+
+    Returns:
+    tuple: (draft for Recommender.submit, k), raises ValueError for invalid drafts
+    """
+    # Teams are sets, sorted so every order of the same picks gets the same answer
+    teammates = sorted((brawler for brawler in (params.get('teammates') or '').split(',') if brawler.strip()), key=name_key)
+    opponents = sorted((brawler for brawler in (params.get('opponents') or '').split(',') if brawler.strip()), key=name_key)
+    if len(teammates) > 3 or len(opponents) > 3:
+        raise ValueError('A team has at most 3 brawlers')
+    draft = {'battle_mode': params.get('mode') or '', 'map_name': params.get('map') or ''}
+    for i, brawler in enumerate(teammates, start=1):
+        draft[f'winner_{i}'] = brawler
+    for i, brawler in enumerate(opponents, start=1):
+        draft[f'loser_{i}'] = brawler
+    try:
+        k = int(params.get('k') or DEFAULT_RECOMMENDATIONS)
+    except ValueError:
+        raise ValueError('k must be an integer')
+    return draft, k
+
+
+def recommender_from_env():
+    """
+    Returns:
+    Recommender: model at BRAWLER_MODEL_PATH, None if it can't be loaded
+    """
+    data_dir = os.getenv('BRAWLER_DATA_DIR', '.')
+    model_path = os.getenv('BRAWLER_MODEL_PATH', os.path.join(data_dir, 'random_forest.pkl'))
+    try:
+        return Recommender(
+            model_path,
+            max_batch_size=int(os.getenv('RECOMMEND_MAX_BATCH', '64')),
+            max_wait=float(os.getenv('RECOMMEND_BATCH_WAIT_MS', '0')) / 1000,
+            table_dir=os.getenv('RECOMMENDATION_TABLE_DIR', os.path.join(data_dir, 'recommendation_table')),
+        )
+    except Exception:
+        logger.exception('Failed to load model %s', model_path)
+        return None
@@ -0,0 +1,224 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+
+"""
+Crawler Benchmark - runs each crawler variant against the local mock API
+    Reports battles/sec, requests/sec, peak RSS and duplicate ratio per variant, so crawler
+    changes can be measured without touching the live API or its rate limits.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Variant name -> (script relative to cronjobs_and_ml, arguments). Variants without
+# arguments crawl from their hardcoded seed tag and battle count.
+CRAWLER_VARIANTS = {
+    "get_battle_logs": (
+        "data_fetching/get_battle_logs.py",
+        ["{seed_tag}", "{battles}", "--requests-per-second", "{requests_per_second}"],
+    ),
+    "get_battle_logs_windows": ("data_fetching/get_battle_logs_windows.py", []),
+    "get_winrates_csv": ("data_fetching/unused/get_winrates_csv.py", []),
+    "get_winrates_csv_fast": ("data_fetching/unused/get_winrates_csv_fast.py", []),
+    "get_winrates_csv_async_slow": (
+        "data_fetching/unused/get_winrates_csv_async_slow.py",
+        [],
+    ),
+    "get_winrates_json": ("data_fetching/unused/get_winrates_json.py", []),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark battle log crawlers against the local mock Brawl Stars API."
+    )
+    parser.add_argument(
+        "variants",
+        type=str,
+        nargs="*",
+        default=["get_battle_logs"],
+        help=f"Crawler variants to run, any of: {', '.join(CRAWLER_VARIANTS)}. Defaults to get_battle_logs.",
+    )
+    parser.add_argument("--battles", type=int, default=20000)
+    parser.add_argument("--seed-tag", type=str, default="#PLYYP2RRQ")
+    parser.add_argument("--requests-per-second", type=float, default=1000)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--players", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--latency-jitter-ms", type=float, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument(
+        "--timeout", type=float, default=600, help="Seconds before a variant is killed."
+    )
+    return parser.parse_args()
+
+
+def start_mock_api(args):
+    process = subprocess.Popen(
+        [
+            sys.executable,
+            os.path.join(ROOT_DIR, "benchmarks", "mock_brawl_api.py"),
+            "--port",
+            str(args.port),
+            "--players",
+            str(args.players),
+            "--seed",
+            str(args.seed),
+            "--latency-ms",
+            str(args.latency_ms),
+            "--latency-jitter-ms",
+            str(args.latency_jitter_ms),
+            "--throttle-rate",
+            str(args.throttle_rate),
+            "--error-rate",
+            str(args.error_rate),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    # Wait for the listening message so the graph is built before timing starts, then
+    # for the socket to accept connections
+    for line in process.stdout:
+        if "listening on" in line:
+            print(line.strip())
+            break
+    else:
+        raise RuntimeError("Mock API exited before it started listening")
+    for _ in range(100):
+        try:
+            mock_api_request(args.port, "/mock/stats")
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Mock API did not accept connections")
+
+
+def mock_api_request(port, path, method="GET"):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{port}{path}",
+        method=method,
+        data=b"" if method == "POST" else None,
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.loads(response.read())
+
+
+def run_variant(name, args):
+    script, script_args = CRAWLER_VARIANTS[name]
+    format_values = {
+        "seed_tag": args.seed_tag,
+        "battles": args.battles,
+        "requests_per_second": args.requests_per_second,
+    }
+    command = [sys.executable, os.path.join(ROOT_DIR, script)] + [
+        argument.format(**format_values) for argument in script_args
+    ]
+    env = dict(
+        os.environ,
+        BRAWL_STARS_API_KEY="benchmark",
+        BRAWL_STARS_API_URL=f"http://127.0.0.1:{args.port}/v1",
+        BRAWL_STARS_PLAYER_TAG=args.seed_tag,
+        PYTHONPATH=ROOT_DIR,
+    )
+    env.pop("BRAWL_STARS_API_KEYS", None)
+
+    # Each variant runs in a scratch directory with the output folders it expects
+    work_dir = tempfile.mkdtemp(prefix=f"benchmark_{name}_")
+    for directory in ["raw_data", "data", "output"]:
+        os.makedirs(os.path.join(work_dir, directory))
+    mock_api_request(args.port, "/mock/reset", "POST")
+    output_file = os.path.join(work_dir, "crawler_output.txt")
+    with open(output_file, "w") as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command, cwd=work_dir, env=env, stdout=output, stderr=subprocess.STDOUT
+        )
+        exit_code, rusage = wait_with_rusage(process, args.timeout)
+        elapsed = time.perf_counter() - start
+    with open(output_file) as output:
+        output = output.read()
+    server_stats = mock_api_request(args.port, "/mock/stats")
+    shutil.rmtree(work_dir, ignore_errors=True)
+
+    battles = last_int(r"Evaluated (\d+) unique battles", output)
+    duplicates = last_int(r"Ignored (\d+) duplicate battles", output)
+    seen = battles + duplicates
+    return {
+        "variant": name,
+        "exit_code": exit_code,
+        "battles": battles,
+        "seconds": elapsed,
+        "battles_per_second": battles / elapsed,
+        "requests": server_stats["requests"],
+        "requests_per_second": server_stats["requests"] / elapsed,
+        "status_counts": server_stats["status_counts"],
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": rusage.ru_maxrss / 1024,
+        "duplicate_ratio": duplicates / seen if seen else 0,
+    }
+
+
+def wait_with_rusage(process, timeout):
+    """
+    Waits for a child process and returns its own resource usage, which Popen.wait
+    does not expose.
+
+    Returns:
+    tuple: (exit code or "timeout", resource usage of the child)
+    """
+    deadline = time.monotonic() + timeout
+    exit_code = None
+    while True:
+        pid, status, rusage = os.wait4(process.pid, os.WNOHANG)
+        if pid:
+            break
+        if exit_code is None and time.monotonic() > deadline:
+            process.kill()
+            exit_code = "timeout"
+        time.sleep(0.05)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return exit_code or process.returncode, rusage
+
+
+def last_int(pattern, text):
+    matches = re.findall(pattern, text)
+    return int(matches[-1]) if matches else 0
+
+
+def print_results(results):
+    print(
+        f"{'variant':<30}{'exit':>8}{'battles':>10}{'seconds':>10}{'battles/s':>12}"
+        f"{'requests':>10}{'req/s':>10}{'peak RSS MB':>13}{'dup ratio':>11}"
+    )
+    for result in results:
+        print(
+            f"{result['variant']:<30}{str(result['exit_code']):>8}{result['battles']:>10}"
+            f"{result['seconds']:>10.2f}{result['battles_per_second']:>12.1f}"
+            f"{result['requests']:>10}{result['requests_per_second']:>10.1f}"
+            f"{result['peak_rss_mb']:>13.1f}{result['duplicate_ratio']:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    unknown = [variant for variant in args.variants if variant not in CRAWLER_VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown crawler variants: {unknown}")
+    mock_api = start_mock_api(args)
+    try:
+        results = [run_variant(variant, args) for variant in args.variants]
+    finally:
+        mock_api.terminate()
+        mock_api.wait()
+    print_results(results)
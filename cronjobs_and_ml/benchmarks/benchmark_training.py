@@ -0,0 +1,229 @@
+import os
+import re
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+import numpy as np
+import pandas as pd
+from benchmark_crawlers import wait_with_rusage
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.brawler_registry import REGISTRY
+
+"""
+Training Benchmark - wall time and peak memory of models/random_forest.py by battle count
+    Synthetic battle logs of each size are written as CSVs with the columns and value
+    formats of the crawled ones, then each training variant runs on them in its own
+    process, so its peak RSS is its own. The old_pipeline variant trains the one-hot
+    pipeline random_forest.py replaced (old_random_forest.py) for comparison.
+"""
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ["gemGrab", "brawlBall", "heist", "bounty", "hotZone", "knockout", "wipeout"]
+MAPS_PER_MODE = 8
+# The registry's brawlers, like the crawled battle logs, so every brawler of the
+# encoding is played
+BRAWLERS = REGISTRY.names
+GENERATE_ROWS = 200000
+
+MODEL_SCRIPT = os.path.join("models", "random_forest.py")
+# The one-hot pipeline random_forest.py replaced, the baseline of the other variants
+OLD_MODEL_SCRIPT = os.path.join("benchmarks", "old_random_forest.py")
+MODEL_ARGUMENTS = ["--versions-dir", "{versions_dir}"]
+
+# Variant name -> (training script, its arguments), run in this order for every size so
+# "cached" reads the matrix "in_memory" encoded
+TRAINING_VARIANTS = {
+    "old_pipeline": (OLD_MODEL_SCRIPT, []),
+    "in_memory": (MODEL_SCRIPT, MODEL_ARGUMENTS + ["--cache-dir", "{cache_dir}"]),
+    "cached": (MODEL_SCRIPT, MODEL_ARGUMENTS + ["--cache-dir", "{cache_dir}"]),
+    "stream": (
+        MODEL_SCRIPT,
+        MODEL_ARGUMENTS + ["--stream", "{chunk_rows}", "--cache-dir", ""],
+    ),
+    "sample": (
+        MODEL_SCRIPT,
+        MODEL_ARGUMENTS + ["--sample", "{sample}", "--cache-dir", ""],
+    ),
+}
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Benchmark random forest training time and peak memory on synthetic battle logs."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=str,
+        default="1M,5M,20M",
+        help="Comma-separated battle counts, with K/M suffixes.",
+    )
+    parser.add_argument(
+        "--variants",
+        type=str,
+        default="old_pipeline,in_memory,cached,stream",
+        help=f"Comma-separated training variants, any of: {', '.join(TRAINING_VARIANTS)}.",
+    )
+    parser.add_argument("--chunk-rows", type=int, default=1000000)
+    parser.add_argument("--sample", type=int, default=1000000)
+    parser.add_argument("--n-estimators", type=int, default=50)
+    parser.add_argument("--max-depth", type=int, default=10)
+    parser.add_argument(
+        "--data-dir",
+        type=str,
+        default=None,
+        help="Keeps the generated battle logs here for later runs instead of a scratch directory.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=7200,
+        help="Seconds before a variant is killed.",
+    )
+    return parser.parse_args()
+
+
+def parse_size(size):
+    size = size.strip().upper()
+    scale = {"K": 1000, "M": 1000000}.get(size[-1], 1)
+    return int(float(size.rstrip("KM")) * scale)
+
+
+def write_battle_log(path, rows, seed):
+    """
+    Writes battles with a random mode and map and 6 different brawlers, each team sorted
+    like the crawler writes them.
+    """
+    rng = np.random.default_rng(seed)
+    brawlers = np.array(BRAWLERS)
+    maps = np.array([f"{mode} map {i}" for mode in MODES for i in range(MAPS_PER_MODE)])
+    temp_path = f"{path}.tmp"
+    for start in range(0, rows, GENERATE_ROWS):
+        n = min(GENERATE_ROWS, rows - start)
+        map_ids = rng.integers(0, len(maps), n)
+        picks = np.argsort(rng.random((n, len(BRAWLERS))), axis=1)[:, :6]
+        picks = np.concatenate(
+            [np.sort(picks[:, :3], axis=1), np.sort(picks[:, 3:], axis=1)], axis=1
+        )
+        battles = pd.DataFrame(
+            {
+                "battle_mode": np.array(MODES)[map_ids // MAPS_PER_MODE],
+                "map_name": maps[map_ids],
+                **{
+                    column: brawlers[picks[:, i]]
+                    for i, column in enumerate(
+                        [
+                            "winner_1",
+                            "winner_2",
+                            "winner_3",
+                            "loser_1",
+                            "loser_2",
+                            "loser_3",
+                        ]
+                    )
+                },
+            }
+        )
+        battles.to_csv(temp_path, mode="a", header=start == 0, index=False)
+    os.replace(temp_path, path)
+
+
+def run_variant(name, battle_log, work_dir, args):
+    format_values = {
+        "cache_dir": os.path.join(work_dir, "encoded_cache"),
+        "versions_dir": os.path.join(work_dir, "versions"),
+        "chunk_rows": args.chunk_rows,
+        "sample": args.sample,
+    }
+    script, arguments = TRAINING_VARIANTS[name]
+    command = [
+        sys.executable,
+        os.path.join(ROOT_DIR, script),
+        battle_log,
+        "--output",
+        os.path.join(work_dir, f"random_forest_{name}.pkl"),
+        "--n-estimators",
+        str(args.n_estimators),
+        "--max-depth",
+        str(args.max_depth),
+    ] + [argument.format(**format_values) for argument in arguments]
+    output_file = os.path.join(work_dir, f"training_{name}.txt")
+    with open(output_file, "w") as output:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdout=output, stderr=subprocess.STDOUT)
+        exit_code, rusage = wait_with_rusage(process, args.timeout)
+        elapsed = time.perf_counter() - start
+    with open(output_file) as output:
+        output = output.read()
+    if exit_code != 0:
+        print(output[-2000:])
+    fit = re.findall(r"Training time for (\d+) rows: ([\d.]+) seconds", output)
+    accuracy = re.findall(r"Top-3 accuracy: ([\d.]+)", output)
+    return {
+        "variant": name,
+        "exit_code": exit_code,
+        "rows": int(fit[-1][0]) if fit else 0,
+        "seconds": elapsed,
+        "fit_seconds": float(fit[-1][1]) if fit else 0,
+        # ru_maxrss is in kilobytes on Linux
+        "peak_rss_mb": rusage.ru_maxrss / 1024,
+        "top_3_accuracy": float(accuracy[-1]) if accuracy else 0,
+    }
+
+
+def print_results(results):
+    print(
+        f"{'battles':>10}{'variant':>14}{'exit':>8}{'trained rows':>14}{'seconds':>10}"
+        f"{'fit s':>10}{'peak RSS MB':>13}{'top-3 acc':>11}"
+    )
+    for size, result in results:
+        print(
+            f"{size:>10}{result['variant']:>14}{str(result['exit_code']):>8}"
+            f"{result['rows']:>14}{result['seconds']:>10.2f}{result['fit_seconds']:>10.2f}"
+            f"{result['peak_rss_mb']:>13.1f}{result['top_3_accuracy']:>11.3f}"
+        )
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    variants = args.variants.split(",")
+    unknown = [variant for variant in variants if variant not in TRAINING_VARIANTS]
+    if unknown:
+        raise ValueError(f"Unknown training variants: {unknown}")
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="benchmark_training_")
+    os.makedirs(data_dir, exist_ok=True)
+    results = []
+    try:
+        for size in args.sizes.split(","):
+            rows = parse_size(size)
+            battle_log = os.path.join(data_dir, f"battle_logs_{size.strip()}.csv")
+            if not os.path.exists(battle_log):
+                start = time.perf_counter()
+                # In a child process, the training processes would inherit the peak
+                # RSS of generating the battles from this one
+                generator = multiprocessing.Process(
+                    target=write_battle_log, args=(battle_log, rows, args.seed)
+                )
+                generator.start()
+                generator.join()
+                if generator.exitcode != 0:
+                    raise RuntimeError(f"Generating {size} battles failed")
+                print(
+                    f"Generated {rows} battles in {time.perf_counter() - start:.2f} seconds"
+                )
+            work_dir = tempfile.mkdtemp(prefix=f"training_{size.strip()}_")
+            for variant in variants:
+                result = run_variant(variant, battle_log, work_dir, args)
+                print(f"{size}: {result}")
+                results.append((size.strip(), result))
+            shutil.rmtree(work_dir, ignore_errors=True)
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    print_results(results)
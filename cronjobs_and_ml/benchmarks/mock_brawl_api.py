@@ -0,0 +1,339 @@
+import os
+import sys
+import random
+import asyncio
+import hashlib
+import itertools
+import argparse
+from datetime import datetime, timedelta
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.brawler_registry import REGISTRY
+
+"""
+Mock Brawl Stars API - local stand-in for the player and battle log endpoints
+    Serves a seeded synthetic player graph so crawlers can be benchmarked and
+    regression-tested without the live API. Point a crawler at it with
+    BRAWL_STARS_API_URL=http://127.0.0.1:<port>/v1.
+"""
+
+TAG_CHARACTERS = "0289PYLQGRJCUV"
+
+MODE_MAPS = {
+    "bounty": ["Shooting Star", "Canal Grande", "Hideout"],
+    "heist": ["Kaboom Canyon", "Hot Potato", "Safe Zone"],
+    "hotZone": ["Dueling Beetles", "Open Business", "Parallel Plays"],
+    "brawlBall": ["Center Stage", "Pinball Dreams", "Penalty Kick"],
+    "gemGrab": ["Hard Rock Mine", "Double Swoosh", "Undermine"],
+    "knockout": ["Belle's Rock", "Out in the Open", "Flaring Phoenix"],
+}
+
+# Battle log names of the brawlers
+BRAWLERS = REGISTRY.names
+
+BATTLE_LOG_SIZE = 25
+
+
+def player_tag(player_id):
+    digits = []
+    value = player_id + len(TAG_CHARACTERS) ** 5
+    while value:
+        value, digit = divmod(value, len(TAG_CHARACTERS))
+        digits.append(TAG_CHARACTERS[digit])
+    return "#" + "".join(reversed(digits))
+
+
+class SyntheticPlayerGraph:
+    """
+    Seeded set of players and 3v3 battles between them.
+
+    Players are picked for battles with a skewed activity distribution, so a few players
+    play a lot and most play rarely, and every battle appears in the battle log of all
+    six participants (capped at the most recent 25), like the live API.
+
+    Args:
+    num_players (int): number of players in the graph
+    battles_per_player (int): average number of battles each player takes part in
+    activity_skew (float): exponent of the player activity power law, 0 for uniform
+    seed (int): random seed
+    """
+
+    def __init__(
+        self, num_players=20000, battles_per_player=25, activity_skew=0.5, seed=0
+    ):
+        rng = random.Random(seed)
+        self.num_players = num_players
+        self.tags = [player_tag(player_id) for player_id in range(num_players)]
+        self.player_ids = {tag: player_id for player_id, tag in enumerate(self.tags)}
+        self.names = [f"Player{player_id}" for player_id in range(num_players)]
+        weights = [1 / (rank + 1) ** activity_skew for rank in range(num_players)]
+        rng.shuffle(weights)
+        cum_weights = list(itertools.accumulate(weights))
+        player_ids = range(num_players)
+        modes = list(MODE_MAPS)
+
+        start_time = datetime(2024, 7, 1)
+        num_battles = num_players * battles_per_player // 6
+        self.battles = []
+        self.player_battles = [[] for _ in range(num_players)]
+        for battle_id in range(num_battles):
+            players = set()
+            while len(players) < 6:
+                players.update(
+                    rng.choices(player_ids, cum_weights=cum_weights, k=6 - len(players))
+                )
+            players = list(players)
+            mode = rng.choice(modes)
+            teams = [
+                list(zip(players[:3], rng.sample(BRAWLERS, 3))),
+                list(zip(players[3:], rng.sample(BRAWLERS, 3))),
+            ]
+            battle_time = start_time + timedelta(seconds=battle_id * 10)
+            self.battles.append(
+                (
+                    battle_time.strftime("%Y%m%dT%H%M%S.000Z"),
+                    mode,
+                    rng.choice(MODE_MAPS[mode]),
+                    teams,
+                    rng.randrange(2),
+                )
+            )
+            for player_id in players:
+                self.player_battles[player_id].append(battle_id)
+
+    def resolve(self, tag):
+        # Unknown tags (e.g. hardcoded seed tags) map onto a stable synthetic player
+        if tag in self.player_ids:
+            return self.player_ids[tag]
+        digest = hashlib.blake2b(tag.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.num_players
+
+    def battle_log(self, tag):
+        player_id = self.resolve(tag)
+        # Report the requested tag for the player so crawlers find themselves in teams
+        tags = {player_id: tag}
+        items = []
+        for battle_id in reversed(self.player_battles[player_id][-BATTLE_LOG_SIZE:]):
+            battle_time, mode, map_name, teams, winning_team = self.battles[battle_id]
+            player_team = 0 if any(p == player_id for p, _ in teams[0]) else 1
+            items.append(
+                {
+                    "battleTime": battle_time,
+                    "event": {
+                        "id": 15000000 + battle_id % 1000,
+                        "mode": mode,
+                        "map": map_name,
+                    },
+                    "battle": {
+                        "mode": mode,
+                        "type": "ranked",
+                        "result": (
+                            "victory" if player_team == winning_team else "defeat"
+                        ),
+                        "duration": 120,
+                        "teams": [
+                            [
+                                {
+                                    "tag": tags.get(member, self.tags[member]),
+                                    "name": self.names[member],
+                                    "brawler": {
+                                        "id": 16000000 + BRAWLERS.index(brawler),
+                                        "name": brawler,
+                                        "power": 11,
+                                        "trophies": 500,
+                                    },
+                                }
+                                for member, brawler in team
+                            ]
+                            for team in teams
+                        ],
+                    },
+                }
+            )
+        return {"items": items, "paging": {"cursors": {}}}
+
+    def player(self, tag):
+        player_id = self.resolve(tag)
+        rng = random.Random(player_id)
+        brawlers = [
+            {
+                "id": 16000000 + brawler_id,
+                "name": brawler,
+                "power": rng.randint(1, 11),
+                "rank": rng.randint(1, 35),
+                "trophies": rng.randint(0, 1000),
+                "highestTrophies": rng.randint(0, 1250),
+            }
+            for brawler_id, brawler in enumerate(BRAWLERS)
+        ]
+        trophies = sum(brawler["trophies"] for brawler in brawlers)
+        return {
+            "tag": tag,
+            "name": self.names[player_id],
+            "trophies": trophies,
+            "highestTrophies": trophies + rng.randint(0, 5000),
+            "3vs3Victories": rng.randint(0, 20000),
+            "soloVictories": rng.randint(0, 2000),
+            "duoVictories": rng.randint(0, 2000),
+            "club": {},
+            "brawlers": brawlers,
+        }
+
+
+class MockBrawlApi:
+    """
+    aiohttp application serving a SyntheticPlayerGraph with injected latency and faults.
+
+    Args:
+    graph (SyntheticPlayerGraph): players and battles to serve
+    latency_ms (float): mean response latency
+    latency_jitter_ms (float): standard deviation of the response latency
+    throttle_rate (float): fraction of requests answered with 429 and Retry-After
+    error_rate (float): fraction of requests answered with 503
+    retry_after (float): Retry-After seconds sent with 429s
+    seed (int): random seed for latency and fault injection
+    """
+
+    def __init__(
+        self,
+        graph,
+        latency_ms=0,
+        latency_jitter_ms=0,
+        throttle_rate=0,
+        error_rate=0,
+        retry_after=1,
+        seed=0,
+    ):
+        self.graph = graph
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.reset()
+
+    def reset(self):
+        self.requests = 0
+        self.status_counts = {}
+
+    def respond(self, data, status=200, headers=None):
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        return web.json_response(data, status=status, headers=headers)
+
+    async def serve(self, request, handler):
+        self.requests += 1
+        if not request.headers.get("Authorization", "").startswith("Bearer "):
+            return self.respond({"reason": "accessDenied"}, 403)
+        latency = self.rng.gauss(self.latency_ms, self.latency_jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+        fault = self.rng.random()
+        if fault < self.throttle_rate:
+            return self.respond(
+                {"reason": "requestThrottled"},
+                429,
+                {"Retry-After": str(self.retry_after)},
+            )
+        if fault < self.throttle_rate + self.error_rate:
+            return self.respond({"reason": "inMaintenance"}, 503)
+        return self.respond(handler(request.match_info["tag"]))
+
+    async def battle_log(self, request):
+        return await self.serve(request, self.graph.battle_log)
+
+    async def player(self, request):
+        return await self.serve(request, self.graph.player)
+
+    async def stats(self, request):
+        return web.json_response(
+            {
+                "requests": self.requests,
+                "status_counts": {
+                    str(status): count for status, count in self.status_counts.items()
+                },
+            }
+        )
+
+    async def reset_stats(self, request):
+        self.reset()
+        return web.json_response({})
+
+    def application(self):
+        app = web.Application()
+        app.router.add_get("/v1/players/{tag}/battlelog", self.battle_log)
+        app.router.add_get("/v1/players/{tag}", self.player)
+        app.router.add_get("/mock/stats", self.stats)
+        app.router.add_post("/mock/reset", self.reset_stats)
+        return app
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Serve a synthetic Brawl Stars API for crawler testing and benchmarks."
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--players", type=int, default=20000, help="Number of synthetic players."
+    )
+    parser.add_argument("--battles-per-player", type=int, default=25)
+    parser.add_argument(
+        "--activity-skew",
+        type=float,
+        default=0.5,
+        help="Power law exponent of player activity, 0 for uniform.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--latency-ms", type=float, default=0, help="Mean response latency."
+    )
+    parser.add_argument(
+        "--latency-jitter-ms",
+        type=float,
+        default=0,
+        help="Standard deviation of the response latency.",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests answered with 429.",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        help="Fraction of requests answered with 503.",
+    )
+    parser.add_argument(
+        "--retry-after",
+        type=float,
+        default=1,
+        help="Retry-After seconds sent with 429s.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    graph = SyntheticPlayerGraph(
+        args.players, args.battles_per_player, args.activity_skew, args.seed
+    )
+    api = MockBrawlApi(
+        graph,
+        args.latency_ms,
+        args.latency_jitter_ms,
+        args.throttle_rate,
+        args.error_rate,
+        args.retry_after,
+        args.seed,
+    )
+    print(
+        f"Mock Brawl Stars API with {len(graph.tags)} players and {len(graph.battles)} battles "
+        f"listening on http://{args.host}:{args.port}/v1",
+        flush=True,
+    )
+    web.run_app(api.application(), host=args.host, port=args.port, print=None)
@@ -0,0 +1,93 @@
+import os
+import sys
+import time
+import argparse
+import joblib
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import OneHotEncoder
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.battle_logs import read_battles
+
+"""
+Old Random Forest - the one-hot encoded pipeline models/random_forest.py replaced, as the
+    baseline of benchmark_training.py
+    All eight columns are one-hot encoded by a ColumnTransformer and fitted by a single
+    core RandomForestClassifier, like the old models/random_forest.py, including
+    winner_1 as both a feature and the target. Only the battle log, the output and the
+    forest size are arguments, so it runs with the same sizes as the other variants.
+"""
+
+CATEGORICAL_FEATURES = [
+    "battle_mode",
+    "map_name",
+    "winner_1",
+    "winner_2",
+    "winner_3",
+    "loser_1",
+    "loser_2",
+    "loser_3",
+]
+TARGET = "winner_1"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Train the old one-hot random forest pipeline, for benchmarks."
+    )
+    parser.add_argument(
+        "battle_log", type=str, help="Battle log CSV or Parquet/Arrow directory."
+    )
+    parser.add_argument("--output", type=str, default="models/old_random_forest.pkl")
+    parser.add_argument("--n-estimators", type=int, default=50)
+    parser.add_argument("--max-depth", type=int, default=10)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    print(f'Input: "{args.battle_log}"')
+    data = read_battles(args.battle_log, CATEGORICAL_FEATURES)
+    X_train, X_test, y_train, y_test = train_test_split(
+        data[CATEGORICAL_FEATURES], data[TARGET], test_size=0.2, random_state=42
+    )
+    pipeline = Pipeline(
+        steps=[
+            (
+                "preprocessor",
+                ColumnTransformer(
+                    transformers=[
+                        (
+                            "cat",
+                            OneHotEncoder(handle_unknown="ignore"),
+                            CATEGORICAL_FEATURES,
+                        )
+                    ]
+                ),
+            ),
+            (
+                "classifier",
+                RandomForestClassifier(
+                    random_state=42,
+                    n_estimators=args.n_estimators,
+                    max_depth=args.max_depth,
+                ),
+            ),
+        ]
+    )
+
+    start_time = time.time()
+    pipeline.fit(X_train, y_train)
+    print(
+        f"Training time for {len(y_train)} rows: {time.time() - start_time:.2f} seconds"
+    )
+    print(f"Accuracy: {accuracy_score(y_test, pipeline.predict(X_test))}")
+
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    joblib.dump(pipeline, args.output)
+    print(f'Output: "{args.output}"')
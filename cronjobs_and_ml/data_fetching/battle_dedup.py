@@ -0,0 +1,200 @@
+import math
+import hashlib
+from array import array
+
+"""
+Battle Dedup - compact indexes of battles already seen by the crawler
+    Battles are identified by a 64-bit digest of their battle time and sorted player tags
+    instead of the full concatenated string, so each battle costs 8 bytes in the exact
+    hash set or a few bits in the Bloom filter.
+"""
+
+EMPTY_SLOT = 0
+
+
+def battle_digest(battle_time, player_tags):
+    """
+    Creates a 64-bit digest identifying a battle.
+
+    Args:
+    battle_time (str): battleTime of the battle
+    player_tags (list): sorted tags of every player in the battle
+
+    Returns:
+    int: unsigned 64-bit digest, never 0
+    """
+    key = (battle_time or "") + "".join(player_tags)
+    digest = int.from_bytes(
+        hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+    )
+    # 0 marks an empty slot in BattleHashSet
+    return digest or 1
+
+
+class BattleHashSet:
+    """
+    Exact set of battle digests stored in an array-backed open-addressing table.
+
+    Uses linear probing over a power-of-two array of unsigned 64-bit slots and doubles
+    the table once it is more than max_load full.
+
+    Args:
+    capacity (int): number of battles to size the table for up front
+    max_load (float): fraction of slots that may be filled before growing
+    """
+
+    def __init__(self, capacity=1 << 16, max_load=0.7):
+        self.max_load = max_load
+        size = 1
+        while size * max_load < capacity:
+            size <<= 1
+        self.slots = array("Q", bytes(8 * size))
+        self.mask = size - 1
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, digest):
+        slots, mask = self.slots, self.mask
+        index = digest & mask
+        while True:
+            slot = slots[index]
+            if slot == digest:
+                return True
+            if slot == EMPTY_SLOT:
+                return False
+            index = (index + 1) & mask
+
+    def add(self, digest):
+        """
+        Returns:
+        bool: True if the digest was not in the set before
+        """
+        if (self.count + 1) > self.max_load * len(self.slots):
+            self._grow()
+        slots, mask = self.slots, self.mask
+        index = digest & mask
+        while True:
+            slot = slots[index]
+            if slot == digest:
+                return False
+            if slot == EMPTY_SLOT:
+                slots[index] = digest
+                self.count += 1
+                return True
+            index = (index + 1) & mask
+
+    def _grow(self):
+        old_slots = self.slots
+        self.slots = array("Q", bytes(16 * len(old_slots)))
+        self.mask = len(self.slots) - 1
+        self.count = 0
+        for digest in old_slots:
+            if digest != EMPTY_SLOT:
+                self.add(digest)
+
+    def memory_bytes(self):
+        return self.slots.itemsize * len(self.slots)
+
+    def false_positive_rate(self):
+        # Only two different battles with the same 64-bit digest can collide
+        return self.count / 2**64
+
+    def stats(self):
+        return {
+            "mode": "exact",
+            "battles": self.count,
+            "slots": len(self.slots),
+            "memory_bytes": self.memory_bytes(),
+            "false_positive_rate": self.false_positive_rate(),
+        }
+
+
+class BattleBloomFilter:
+    """
+    Bloom filter of battle digests with a fixed memory budget.
+
+    Never misses a battle it has seen, but may report an unseen battle as a duplicate
+    with probability false_positive_rate(), which grows as more battles are added.
+
+    Args:
+    capacity (int): number of battles expected
+    error_rate (float): false positive rate to size the filter for at capacity
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(1, capacity)
+        self.num_bits = max(
+            8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def _positions(self, digest):
+        # Double hashing: derive every bit position from the two halves of the digest
+        first = digest & 0xFFFFFFFF
+        second = (digest >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def __contains__(self, digest):
+        bits = self.bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(digest)
+        )
+
+    def add(self, digest):
+        """
+        Returns:
+        bool: True if the digest was (probably) not in the filter before
+        """
+        bits = self.bits
+        new = False
+        for position in self._positions(digest):
+            byte, bit = position >> 3, 1 << (position & 7)
+            if not bits[byte] & bit:
+                bits[byte] |= bit
+                new = True
+        if new:
+            self.count += 1
+        return new
+
+    def memory_bytes(self):
+        return len(self.bits)
+
+    def false_positive_rate(self):
+        return (
+            1 - math.exp(-self.num_hashes * self.count / self.num_bits)
+        ) ** self.num_hashes
+
+    def stats(self):
+        return {
+            "mode": "bloom",
+            "battles": self.count,
+            "bits": self.num_bits,
+            "hashes": self.num_hashes,
+            "memory_bytes": self.memory_bytes(),
+            "false_positive_rate": self.false_positive_rate(),
+        }
+
+
+def create_dedup_index(mode="exact", capacity=1 << 16, error_rate=0.001):
+    if mode == "exact":
+        return BattleHashSet(capacity)
+    elif mode == "bloom":
+        return BattleBloomFilter(capacity, error_rate)
+    raise ValueError(f"Unknown dedup mode: {mode}")
+
+
+def format_dedup_stats(stats):
+    return (
+        f"Dedup index ({stats['mode']}): {stats['battles']} battles in "
+        f"{stats['memory_bytes'] / 1_000_000:.1f} MB, "
+        f"estimated false positive rate {stats['false_positive_rate']:.2e}"
+    )
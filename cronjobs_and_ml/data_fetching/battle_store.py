@@ -0,0 +1,229 @@
+import os
+import csv
+import glob
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Only needed for the parquet and arrow formats
+    pa = pq = None
+
+"""
+Battle Store - writers for the battle log in CSV, Parquet or Arrow IPC format
+    The columnar formats store a directory of part files, one per crawl checkpoint, each
+    holding row groups of dictionary-encoded name columns. Readers load only the columns
+    they need from memory-mapped files and get pandas categoricals without parsing or
+    allocating a string per cell. Battle times are stored as UTC timestamps.
+"""
+
+STORE_FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+DIGEST_COLUMN = "battle_digest"
+TIME_COLUMN = "battle_time"
+# battleTime of the Brawl Stars API, e.g. 20241018T101500.000Z
+BATTLE_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+
+
+def parse_battle_time(value):
+    if not value:
+        return None
+    return datetime.strptime(value, BATTLE_TIME_FORMAT).replace(tzinfo=timezone.utc)
+
+
+def battle_log_format(path):
+    for file_format, extension in STORE_FORMATS.items():
+        if path.rstrip("/").endswith(extension):
+            return file_format
+    return "csv"
+
+
+def part_file_name(path, part_index, file_format):
+    return os.path.join(path, f"part-{part_index:05d}{STORE_FORMATS[file_format]}")
+
+
+def list_part_files(path):
+    extension = STORE_FORMATS[battle_log_format(path)]
+    return sorted(glob.glob(os.path.join(path, f"part-*{extension}")))
+
+
+class CsvBattleWriter:
+    """
+    Battle log CSV with the header as the first row.
+
+    Args:
+    path (str): CSV file to write
+    columns (list): header row, written when the file is created
+    offset (int): byte offset of the last checkpoint when resuming, rows after it are
+        dropped. None starts a new file.
+    """
+
+    file_format = "csv"
+
+    def __init__(self, path, columns, offset=None):
+        self.name = path
+        if offset is None:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(columns)
+        else:
+            with open(path, "r+b") as csvfile:
+                csvfile.truncate(offset)
+            self.file = open(path, "a", newline="")
+            self.writer = csv.writer(self.file)
+
+    def writerow(self, row):
+        self.writer.writerow(row)
+
+    def sync(self):
+        """
+        Returns:
+        int: byte offset up to which the file is durable
+        """
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return self.file.tell()
+
+    def close(self):
+        self.file.close()
+
+
+class ColumnarBattleWriter:
+    """
+    Battle log stored as a directory of Parquet or Arrow IPC part files.
+
+    Rows are buffered and written as one row group per row_group_size rows. sync()
+    closes the current part file, so every part on disk is complete and a resumed crawl
+    only has to delete parts newer than its checkpoint. Name columns are dictionary
+    encoded against one dictionary per column that only ever grows, so Arrow IPC files
+    can carry it as dictionary deltas.
+
+    Args:
+    path (str): directory of the part files, ending in .parquet or .arrow
+    columns (list): column names, battle_digest is stored as uint64 and battle_time as
+        a timestamp
+    offset (int): number of parts of the last checkpoint when resuming, newer parts
+        are deleted. None starts a new directory.
+    row_group_size (int): rows per row group
+    """
+
+    def __init__(self, path, columns, offset=None, row_group_size=65536):
+        if pa is None:
+            raise ImportError(
+                f"pyarrow is required to write {battle_log_format(path)} battle logs"
+            )
+        self.name = path
+        self.file_format = battle_log_format(path)
+        self.columns = list(columns)
+        self.row_group_size = row_group_size
+        self.schema = pa.schema(
+            [(column, self._column_type(column)) for column in self.columns]
+        )
+        self.dictionaries = {column: [] for column in self.columns}
+        self.dictionary_codes = {column: {} for column in self.columns}
+        self.rows = []
+        self.part_file = None
+        self.part_writer = None
+
+        os.makedirs(path, exist_ok=True)
+        part_files = list_part_files(path)
+        if offset is None:
+            for part_file in part_files:
+                os.remove(part_file)
+            self.parts = 0
+        else:
+            for part_file in part_files[offset:]:
+                os.remove(part_file)
+            self.parts = offset
+
+    @staticmethod
+    def _column_type(column):
+        if column == DIGEST_COLUMN:
+            return pa.uint64()
+        if column == TIME_COLUMN:
+            return pa.timestamp("s", tz="UTC")
+        return pa.dictionary(pa.int16(), pa.string())
+
+    def writerow(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.row_group_size:
+            self._write_row_group()
+
+    def _encode(self, index, column):
+        values = [row[index] for row in self.rows]
+        if column == DIGEST_COLUMN:
+            return pa.array([int(value) for value in values], pa.uint64())
+        if column == TIME_COLUMN:
+            return pa.array(
+                [parse_battle_time(value) for value in values],
+                pa.timestamp("s", tz="UTC"),
+            )
+        dictionary = self.dictionaries[column]
+        codes = self.dictionary_codes[column]
+        indices = []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(dictionary)
+                dictionary.append(value)
+            indices.append(code)
+        return pa.DictionaryArray.from_arrays(
+            pa.array(indices, pa.int16()),
+            pa.array(dictionary, pa.string()),
+        )
+
+    def _write_row_group(self):
+        if not self.rows:
+            return
+        batch = pa.record_batch(
+            [self._encode(index, column) for index, column in enumerate(self.columns)],
+            schema=self.schema,
+        )
+        self.rows = []
+        if self.part_writer is None:
+            self._open_part()
+        self.part_writer.write_batch(batch)
+
+    def _open_part(self):
+        self.part_file = open(
+            part_file_name(self.name, self.parts, self.file_format), "wb"
+        )
+        if self.file_format == "parquet":
+            self.part_writer = pq.ParquetWriter(self.part_file, self.schema)
+        else:
+            self.part_writer = pa.ipc.new_file(
+                self.part_file,
+                self.schema,
+                options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True),
+            )
+
+    def sync(self):
+        """
+        Returns:
+        int: number of complete part files
+        """
+        self._write_row_group()
+        if self.part_writer is not None:
+            self.part_writer.close()
+            self.part_file.flush()
+            os.fsync(self.part_file.fileno())
+            self.part_file.close()
+            self.part_writer = self.part_file = None
+            self.parts += 1
+        return self.parts
+
+    def close(self):
+        self.sync()
+
+
+def open_battle_writer(path, columns, offset=None):
+    """
+    Opens a battle log writer for the format given by the path's extension.
+
+    Args:
+    path (str): CSV file, or .parquet/.arrow directory
+    columns (list): column names
+    offset (int): checkpointed position to resume from, None for a new battle log
+    """
+    if battle_log_format(path) == "csv":
+        return CsvBattleWriter(path, columns, offset)
+    return ColumnarBattleWriter(path, columns, offset)
@@ -0,0 +1,95 @@
+import time
+import asyncio
+
+
+class CrawlFrontier:
+    """
+    Bounded queue of player tags waiting to be crawled.
+
+    Discovered players that do not fit are dropped from the queue (they stay in the
+    crawl state as uncrawled), which holds frontier memory at max_size tags.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.queue = asyncio.Queue(max_size)
+        self.queued_players = set()
+        self.dropped_players = 0
+        self.in_progress = 0
+
+    def __len__(self):
+        return self.queue.qsize()
+
+    def add(self, player_tag):
+        if player_tag in self.queued_players:
+            return True
+        try:
+            self.queue.put_nowait(player_tag)
+        except asyncio.QueueFull:
+            self.dropped_players += 1
+            return False
+        self.queued_players.add(player_tag)
+        return True
+
+    async def get(self):
+        player_tag = await self.queue.get()
+        self.queued_players.discard(player_tag)
+        self.in_progress += 1
+        return player_tag
+
+    def task_done(self):
+        self.in_progress -= 1
+        self.queue.task_done()
+
+    async def wait_exhausted(self):
+        await self.queue.join()
+
+
+class ShardedFrontier(CrawlFrontier):
+    """
+    Frontier of one crawler process in a sharded crawl.
+
+    Players owned by this shard are queued locally, everything else (and own players
+    that did not fit) is published to the shared ShardBroker. When the local queue runs
+    low it claims more of its own players from the broker. The frontier is exhausted
+    once this shard has been idle with nothing to claim for idle_timeout seconds.
+    """
+
+    def __init__(self, max_size, broker, idle_timeout=30, sync_interval=0.5):
+        super().__init__(max_size)
+        self.broker = broker
+        self.idle_timeout = idle_timeout
+        self.sync_interval = sync_interval
+        self.outbox = []
+
+    def add(self, player_tag):
+        if self.broker.owns(player_tag) and super().add(player_tag):
+            return True
+        self.outbox.append(player_tag)
+        return False
+
+    def sync(self):
+        """
+        Returns:
+        int: number of players claimed from the broker
+        """
+        if self.outbox:
+            self.broker.publish(self.outbox)
+            self.outbox = []
+        free = self.max_size - self.queue.qsize()
+        if free < self.max_size // 2:
+            return 0
+        claimed = self.broker.claim(free)
+        for player_tag in claimed:
+            super().add(player_tag)
+        return len(claimed)
+
+    async def wait_exhausted(self):
+        idle_since = time.monotonic()
+        while True:
+            claimed = self.sync()
+            if claimed or self.queue.qsize() or self.in_progress:
+                idle_since = time.monotonic()
+            elif time.monotonic() - idle_since >= self.idle_timeout:
+                return
+            await asyncio.sleep(self.sync_interval)
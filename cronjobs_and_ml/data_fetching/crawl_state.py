@@ -0,0 +1,155 @@
+import os
+import glob
+import sqlite3
+
+UINT64_MASK = (1 << 64) - 1
+
+
+def to_signed_digest(digest):
+    # SQLite integers are signed 64-bit
+    return digest - (1 << 64) if digest >= 1 << 63 else digest
+
+
+class CrawlState:
+    """
+    Durable crawl frontier and dedup store backed by a SQLite file.
+
+    Players and battle hashes are buffered in memory and written in one transaction
+    per checkpoint, together with the synced position of the battle log (a byte offset
+    for CSVs, a number of part files for Parquet/Arrow). After a crash the battle log is
+    cut back to that position on resume, so the battle log and the state always
+    describe the same set of battles.
+
+    Args:
+    state_file (str): path to the SQLite file
+    checkpoint_interval (int): number of new unique battles between checkpoints
+    new (bool): start a new crawl, an existing state file is cleared instead of resumed
+    """
+
+    def __init__(self, state_file, checkpoint_interval=10000, new=False):
+        self.state_file = state_file
+        self.checkpoint_interval = checkpoint_interval
+        self.connection = sqlite3.connect(state_file)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS players (tag TEXT PRIMARY KEY, crawled INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS battles (digest INTEGER PRIMARY KEY)"
+        )
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)"
+        )
+        if new:
+            # A new crawl rewrites its battle log, the players, battles and offsets of
+            # an earlier crawl to the same file don't describe it
+            for table in ("players", "battles", "meta"):
+                self.connection.execute(f"DELETE FROM {table}")
+        self.connection.commit()
+        self.pending_discovered = set()
+        self.pending_crawled = set()
+        self.pending_battles = []
+        self.last_checkpoint_battles = int(self.get_meta("unique_battles", 0))
+
+    def get_meta(self, key, default=None):
+        row = self.connection.execute(
+            "SELECT value FROM meta WHERE key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        self.connection.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+        )
+
+    def load_players(self):
+        """
+        Returns:
+        tuple: (set of crawled player tags, set of discovered but uncrawled tags)
+        """
+        seen_players, to_traverse = set(), set()
+        for tag, crawled in self.connection.execute("SELECT tag, crawled FROM players"):
+            if crawled:
+                seen_players.add(tag)
+            else:
+                to_traverse.add(tag)
+        return seen_players, to_traverse
+
+    def load_battles(self):
+        for (digest,) in self.connection.execute("SELECT digest FROM battles"):
+            yield digest & UINT64_MASK
+
+    def mark_discovered(self, player_tag):
+        self.pending_discovered.add(player_tag)
+
+    def mark_crawled(self, player_tag):
+        self.pending_crawled.add(player_tag)
+
+    def add_battle(self, battle_hash):
+        self.pending_battles.append(battle_hash)
+
+    def should_checkpoint(self, unique_battles):
+        return unique_battles - self.last_checkpoint_battles >= self.checkpoint_interval
+
+    def checkpoint(self, battle_writer, counters):
+        """
+        Syncs the battle log to disk and commits all pending state in one transaction.
+
+        Args:
+        battle_writer (CsvBattleWriter or ColumnarBattleWriter): the open battle log
+        counters (dict): crawl counters to store, e.g. unique_battles and failures
+        """
+        output_offset = battle_writer.sync()
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO players (tag, crawled) VALUES (?, 0)",
+                ((tag,) for tag in self.pending_discovered),
+            )
+            self.connection.executemany(
+                "INSERT INTO players (tag, crawled) VALUES (?, 1) "
+                "ON CONFLICT(tag) DO UPDATE SET crawled = 1",
+                ((tag,) for tag in self.pending_crawled),
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO battles (digest) VALUES (?)",
+                (
+                    (to_signed_digest(battle_hash),)
+                    for battle_hash in self.pending_battles
+                ),
+            )
+            self.set_meta("output_file", battle_writer.name)
+            self.set_meta("output_offset", output_offset)
+            for key, value in counters.items():
+                self.set_meta(key, value)
+        self.pending_discovered.clear()
+        self.pending_crawled.clear()
+        self.pending_battles.clear()
+        self.last_checkpoint_battles = counters.get(
+            "unique_battles", self.last_checkpoint_battles
+        )
+
+    def output_checkpoint(self):
+        """
+        Returns:
+        tuple: (battle log path, position synced at the last checkpoint)
+        """
+        # State files of older crawls only know their CSV
+        output_file = self.get_meta("output_file") or self.get_meta("csv_file")
+        output_offset = self.get_meta("output_offset") or self.get_meta("csv_offset", 0)
+        return output_file, int(output_offset)
+
+    def close(self):
+        self.connection.close()
+
+
+def state_file_for(output_file, state_dir="crawl_state"):
+    os.makedirs(state_dir, exist_ok=True)
+    # The extension is kept, battle logs of different formats get their own state
+    base_name = os.path.basename(output_file.rstrip("/"))
+    return os.path.join(state_dir, f"{base_name}.db")
+
+
+def find_most_recent_state(state_dir="crawl_state"):
+    files = glob.glob(os.path.join(state_dir, "*.db"))
+    if not files:
+        return None
+    return max(files, key=os.path.getmtime)
@@ -1,13 +1,23 @@
 import os
 import time
-import hashlib
-import csv
 import asyncio
 import aiohttp
 from dotenv import load_dotenv
 from datetime import datetime
 import argparse
-
+import multiprocessing
+from battle_dedup import battle_digest, create_dedup_index, format_dedup_stats
+from rate_limiter import RateLimitedClient
+from crawl_frontier import CrawlFrontier, ShardedFrontier
+from shard_broker import (
+    ShardBroker,
+    broker_file_for,
+    shard_csv_file_for,
+    merge_shard_csvs,
+)
+from crawl_state import CrawlState, state_file_for, find_most_recent_state
+from player_watermarks import PlayerWatermarks
+from battle_store import STORE_FORMATS, DIGEST_COLUMN, open_battle_writer
 
 # Load environment variables from .env file
 start_time = time.time()
@@ -15,19 +25,45 @@ load_dotenv()
 
 # Fetch API key from environment variables
 API_KEY = os.getenv("BRAWL_STARS_API_KEY")
-
-if not API_KEY:
+# Optional comma separated keys, one crawler process is started per key
+API_KEYS = [
+    key.strip()
+    for key in os.getenv("BRAWL_STARS_API_KEYS", "").split(",")
+    if key.strip()
+]
+
+if not API_KEY and not API_KEYS:
     raise ValueError("Please set the BRAWL_STARS_API_KEY in the .env file.")
+API_KEY = API_KEY or API_KEYS[0]
 
 # Headers for the API request
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
 
+API_URL = os.getenv("BRAWL_STARS_API_URL", "https://api.brawlstars.com/v1")
+
+# Watermarks persist across crawls, unlike the per-crawl state files
+DEFAULT_WATERMARK_FILE = "crawl_state/player_watermarks.db"
+
+BATTLE_LOG_COLUMNS = [
+    "battle_mode",
+    "map_name",
+    "winner_1",
+    "winner_2",
+    "winner_3",
+    "loser_1",
+    "loser_2",
+    "loser_3",
+    "battle_time",
+]
+
 
 class BattleLogTracker:
-    def __init__(self):
+    def __init__(self, dedup_index=None):
         self.duplicate_battles = 0
         self.unique_battles = 0
-        self.processed_battles = set()
+        self.processed_battles = (
+            dedup_index if dedup_index is not None else create_dedup_index()
+        )
         self.lock = asyncio.Lock()
 
     def update_unique_battles(self):
@@ -76,6 +112,82 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Fetch Brawl Stars battle logs.")
     parser.add_argument("initial_player_tag", type=str, help="Starting player tag")
     parser.add_argument("battle_quantity", type=int, help="Maximum number of battles")
+    parser.add_argument(
+        "--resume",
+        type=str,
+        nargs="?",
+        const="latest",
+        default=None,
+        help="Resume a crawl from its state file. Without a path, the most recent state file in crawl_state is used.",
+    )
+    parser.add_argument(
+        "--checkpoint-interval",
+        type=int,
+        default=10000,
+        help="Number of new unique battles between checkpoints of the CSV and crawl state.",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["exact", "bloom"],
+        default="exact",
+        help="Battle dedup index: an exact 64-bit digest hash set, or a Bloom filter with bounded memory.",
+    )
+    parser.add_argument(
+        "--bloom-error-rate",
+        type=float,
+        default=0.001,
+        help="Target false positive rate of the Bloom filter at battle_quantity battles.",
+    )
+    parser.add_argument(
+        "--requests-per-second",
+        type=float,
+        default=20,
+        help="Request rate allowed by the API key.",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=64,
+        help="Upper bound for in-flight requests. Concurrency starts at 5 and adapts to throttling.",
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="Retries per player for 429s, 5xx responses and connection errors.",
+    )
+    parser.add_argument(
+        "--max-frontier",
+        type=int,
+        default=100000,
+        help="Maximum number of queued players. Players discovered beyond it are kept in the crawl state only.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of crawl worker tasks. Defaults to --max-concurrency.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=list(STORE_FORMATS),
+        default="csv",
+        help="Battle log format. parquet and arrow write a directory of part files with dictionary-encoded columns, one part per checkpoint.",
+    )
+    parser.add_argument(
+        "--incremental",
+        type=str,
+        nargs="?",
+        const=DEFAULT_WATERMARK_FILE,
+        default=None,
+        help=f"Only emit battles newer than each player's watermark from previous crawls and revisit the most active players first. Watermarks are kept in {DEFAULT_WATERMARK_FILE} unless a path is given.",
+    )
+    parser.add_argument(
+        "--min-expected-battles",
+        type=float,
+        default=1.0,
+        help="With --incremental, skip known players expected to have fewer new battles than this.",
+    )
     return parser.parse_args()
 
 
@@ -88,8 +200,7 @@ def get_player_team_index(player_tag, teams):
 
 
 def create_battle_hash(battle_time, player_tags):
-    unique_string = battle_time + "".join(player_tags)
-    return unique_string
+    return battle_digest(battle_time, player_tags)
 
 
 def valid_battle(battle, event, only_ranked):
@@ -156,102 +267,194 @@ def valid_battle(battle, event, only_ranked):
 
 
 async def fetch_battle_log(
-    session,
+    client,
     current_player_tag,
     seen_players,
     to_traverse,
     battle_tracker,
-    csv_writer,
-    semaphore,
+    battle_writer,
     num_battles,
+    crawl_state,
+    watermarks=None,
 ):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{current_player_tag.replace("#", "%23")}/battlelog'
-    async with semaphore:  # Acquire semaphore before making the request
-        if battle_tracker.unique_battles > num_battles:
-            return
-        response = await session.get(BASE_URL, headers=HEADERS)
-        if response.status == 200:
-            battle_log = await response.json()
-            if current_player_tag not in seen_players:  # Avoid seen players
-                for item in battle_log.get("items", []):  # In a Battle
-                    battle, event = item.get("battle"), item.get("event")
-                    if not valid_battle(battle, event, False):
-                        continue
-
-                    teams = battle.get("teams", [])
-                    player_tags = []
-                    for team in teams:
-                        for player in team:
-                            player_tags.append(player["tag"])
-                    player_tags.sort()
-
-                    # Avoid duplicate battles
-                    battle_hash = create_battle_hash(
-                        item.get("battleTime"), player_tags
+    global count  # Declare that we are using the global variable
+    BASE_URL = f'{API_URL}/players/{current_player_tag.replace("#", "%23")}/battlelog'
+    if count >= num_battles:
+        return
+    status, battle_log = await client.get_json(BASE_URL)
+    if status == 200:
+        if current_player_tag not in seen_players:  # Avoid seen players
+            for item in battle_log.get("items", []):  # In a Battle
+                if count >= num_battles:
+                    # Stop exactly at the limit, leaving the player uncrawled for a resume
+                    return
+                battle, event = item.get("battle"), item.get("event")
+                if not valid_battle(battle, event, False):
+                    continue
+
+                teams = battle.get("teams", [])
+                player_tags = []
+                for team in teams:
+                    for player in team:
+                        player_tags.append(player["tag"])
+                player_tags.sort()
+
+                # Avoid battles ingested by a previous crawl
+                if watermarks is not None and not watermarks.is_new(
+                    item.get("battleTime") or "", player_tags
+                ):
+                    watermarks.skipped_battles += 1
+                    continue
+
+                # Avoid duplicate battles
+                battle_hash = create_battle_hash(item.get("battleTime"), player_tags)
+                if battle_tracker.is_battle_processed(battle_hash):
+                    battle_tracker.update_duplicate_battles()
+                    continue
+                battle_tracker.add_processed_battle(battle_hash)
+                battle_tracker.update_unique_battles()
+                crawl_state.add_battle(battle_hash)
+
+                if len(teams) == 2:
+                    primary_team_index = get_player_team_index(
+                        current_player_tag, teams
+                    )
+                    primary_team_victory = (
+                        True
+                        if (battle.get("result") and battle.get("result") == "victory")
+                        else False
+                    )
+                    primary_team = sorted(
+                        p["brawler"]["name"] for p in teams[primary_team_index]
                     )
-                    if battle_tracker.is_battle_processed(battle_hash):
-                        battle_tracker.update_duplicate_battles()
-                        continue
-                    battle_tracker.add_processed_battle(battle_hash)
-                    battle_tracker.update_unique_battles()
-
-                    if len(teams) == 2:
-                        primary_team_index = get_player_team_index(
-                            current_player_tag, teams
-                        )
-                        primary_team_victory = (
-                            True
-                            if (
-                                battle.get("result")
-                                and battle.get("result") == "victory"
-                            )
-                            else False
-                        )
-                        primary_team = sorted(
-                            p["brawler"]["name"] for p in teams[primary_team_index]
-                        )
-                        opposing_team = sorted(
-                            p["brawler"]["name"] for p in teams[1 - primary_team_index]
-                        )
-                        winnners, losers = [], []
-                        if primary_team_victory:
-                            winners = primary_team
-                            losers = opposing_team
-                        else:
-                            winners = opposing_team
-                            losers = primary_team
-
-                        while len(primary_team) < 3:
-                            primary_team.append("N/A")
-                        while len(opposing_team) < 3:
-                            opposing_team.append("N/A")
-                        global count  # Declare that we are using the global variable
-                        count += 1
-                        # print(count)
-                        csv_writer.writerow(
-                            [
-                                item.get("event").get("mode"),
-                                item.get("event").get("map"),
-                                winners[0],
-                                winners[1],
-                                winners[2],
-                                losers[0],
-                                losers[1],
-                                losers[2],
-                            ]
-                        )
-                        for player in player_tags:
+                    opposing_team = sorted(
+                        p["brawler"]["name"] for p in teams[1 - primary_team_index]
+                    )
+                    winnners, losers = [], []
+                    if primary_team_victory:
+                        winners = primary_team
+                        losers = opposing_team
+                    else:
+                        winners = opposing_team
+                        losers = primary_team
+
+                    while len(primary_team) < 3:
+                        primary_team.append("N/A")
+                    while len(opposing_team) < 3:
+                        opposing_team.append("N/A")
+                    count += 1
+                    # print(count)
+                    row = [
+                        item.get("event").get("mode"),
+                        item.get("event").get("map"),
+                        winners[0],
+                        winners[1],
+                        winners[2],
+                        losers[0],
+                        losers[1],
+                        losers[2],
+                        item.get("battleTime") or "",
+                    ]
+                    if write_battle_digests:
+                        row.append(battle_hash)
+                    battle_writer.writerow(row)
+                    for player in player_tags:
+                        if player not in seen_players and (
+                            watermarks is None or watermarks.is_due(player)
+                        ):
                             to_traverse.add(player)
-
-            seen_players.add(current_player_tag)
-        else:
-            print(f"Failed to fetch battle log: RESPONSE {response.status}")
-            global failures
-            failures += 1
+                            crawl_state.mark_discovered(player)
+
+            if watermarks is not None:
+                watermarks.update(
+                    current_player_tag,
+                    [
+                        item["battleTime"]
+                        for item in battle_log.get("items", [])
+                        if item.get("battleTime")
+                    ],
+                )
+
+        seen_players.add(current_player_tag)
+        crawl_state.mark_crawled(current_player_tag)
+        if crawl_state.should_checkpoint(battle_tracker.unique_battles):
+            print(f"Backing up data at {battle_tracker.unique_battles} battles")
+            checkpoint(crawl_state, battle_writer, battle_tracker, watermarks)
+    else:
+        print(f"Failed to fetch battle log: RESPONSE {status}")
+        global failures
+        failures += 1
 
 
 count = 0
 failures = 0
+# Shard CSVs carry each battle's digest so battles seen by several shards can be merged
+write_battle_digests = False
+
+
+async def crawl_worker(
+    client,
+    frontier,
+    seen_players,
+    battle_tracker,
+    battle_writer,
+    battle_quantity,
+    crawl_state,
+    limit_reached,
+    watermarks=None,
+):
+    while True:
+        player_tag = await frontier.get()
+        try:
+            if player_tag not in seen_players and count < battle_quantity:
+                await fetch_battle_log(
+                    client,
+                    player_tag,
+                    seen_players,
+                    frontier,
+                    battle_tracker,
+                    battle_writer,
+                    battle_quantity,
+                    crawl_state,
+                    watermarks,
+                )
+            if count >= battle_quantity:
+                limit_reached.set()
+        finally:
+            frontier.task_done()
+
+
+def checkpoint(crawl_state, battle_writer, battle_tracker, watermarks=None):
+    dupes, battles = battle_tracker.get_counters()
+    crawl_state.checkpoint(
+        battle_writer,
+        {
+            "unique_battles": battles,
+            "duplicate_battles": dupes,
+            "count": count,
+            "failures": failures,
+        },
+    )
+    # Written after the battle log is synced, so a crash can only leave watermarks
+    # behind the battle log and never skip battles that were not written
+    if watermarks is not None:
+        watermarks.flush()
+
+
+def resume_crawl(crawl_state, battle_tracker):
+    global count, failures
+    seen_players, to_traverse = crawl_state.load_players()
+    for battle_hash in crawl_state.load_battles():
+        battle_tracker.add_processed_battle(battle_hash)
+    battle_tracker.unique_battles = int(crawl_state.get_meta("unique_battles", 0))
+    battle_tracker.duplicate_battles = int(crawl_state.get_meta("duplicate_battles", 0))
+    count = int(crawl_state.get_meta("count", 0))
+    failures = int(crawl_state.get_meta("failures", 0))
+    print(
+        f"Resuming crawl with {len(seen_players)} crawled players, "
+        f"{len(to_traverse)} players to traverse and {battle_tracker.unique_battles} battles"
+    )
+    return seen_players, to_traverse
 
 
 def format_number(value):
@@ -267,81 +470,268 @@ def format_number(value):
         return str(value)
 
 
-async def main(initial_player_tag, battle_quantity):
-    battle_tracker = BattleLogTracker()
-    seen_players, to_traverse = set(), set()
-    to_traverse.add(initial_player_tag)
-
-    # Initialize a semaphore to limit concurrent requests
-    semaphore = asyncio.Semaphore(5)  # Limit to 10 concurrent requests
-
-    date_time_str = datetime.now().strftime("%m-%d-%Y_%I:%M_%p").lower()
-    csv_file_name = (
-        f"raw_data/battle_logs_{date_time_str}_{format_number(battle_quantity)}.csv"
+async def main(
+    initial_player_tag,
+    battle_quantity,
+    resume=None,
+    checkpoint_interval=10000,
+    dedup="exact",
+    bloom_error_rate=0.001,
+    requests_per_second=20,
+    max_concurrency=64,
+    max_retries=5,
+    max_frontier=100000,
+    num_workers=None,
+    shard=None,
+    csv_file_name=None,
+    api_key=None,
+    incremental=None,
+    min_expected_battles=1.0,
+    output_format="csv",
+):
+    global write_battle_digests
+    battle_tracker = BattleLogTracker(
+        create_dedup_index(dedup, battle_quantity, bloom_error_rate)
     )
-    # Open CSV file for writing
-    with open(csv_file_name, "w", newline="") as csvfile:
-        csv_writer = csv.writer(csvfile)
-        # Write CSV header
-        csv_writer.writerow(
-            [
-                "battle_mode",
-                "map_name",
-                "winner_1",
-                "winner_2",
-                "winner_3",
-                "loser_1",
-                "loser_2",
-                "loser_3",
-            ]
+
+    if resume:
+        state_file = find_most_recent_state() if resume == "latest" else resume
+        if not state_file or not os.path.exists(state_file):
+            raise ValueError(f"No crawl state file found to resume from: {resume}")
+        crawl_state = CrawlState(state_file, checkpoint_interval)
+        csv_file_name, output_offset = crawl_state.output_checkpoint()
+        seen_players, to_traverse = resume_crawl(crawl_state, battle_tracker)
+        # Rows written after the last checkpoint are dropped
+        battle_writer = open_battle_writer(
+            csv_file_name, BATTLE_LOG_COLUMNS, output_offset
+        )
+    else:
+        date_time_str = datetime.now().strftime("%m-%d-%Y_%I:%M_%p").lower()
+        csv_file_name = (
+            csv_file_name
+            or f"raw_data/battle_logs_{date_time_str}_{format_number(battle_quantity)}{STORE_FORMATS[output_format]}"
+        )
+        crawl_state = CrawlState(
+            state_file_for(csv_file_name), checkpoint_interval, new=True
+        )
+        seen_players, to_traverse = set(), set()
+        if not shard:
+            # Sharded crawls are seeded through the broker
+            to_traverse.add(initial_player_tag)
+            crawl_state.mark_discovered(initial_player_tag)
+        header = list(BATTLE_LOG_COLUMNS)
+        if shard:
+            write_battle_digests = True
+            header.append(DIGEST_COLUMN)
+        battle_writer = open_battle_writer(csv_file_name, header)
+        checkpoint(crawl_state, battle_writer, battle_tracker)
+    print(f'Crawl state: "{crawl_state.state_file}"')
+
+    watermarks, revisit_players = None, []
+    if incremental:
+        watermarks = PlayerWatermarks(incremental, min_expected_battles)
+        if not resume and not shard:
+            # Resumed crawls already have them in the state, shards get them from the broker
+            revisit_players = watermarks.revisit_order(max_frontier)
+            for player_tag in revisit_players:
+                crawl_state.mark_discovered(player_tag)
+        print(
+            f"Incremental crawl: {len(watermarks)} players with watermarks, "
+            f"{len(revisit_players)} due for a revisit"
         )
 
+    try:
         async with aiohttp.ClientSession() as session:
-            while to_traverse and count < battle_quantity:
-                # Copy the current traversal set to avoid modifying it while iterating
-                traverse_copy = to_traverse.copy()
-                to_traverse.clear()
-                tasks = []
-                for (
-                    player_tag
-                ) in (
-                    traverse_copy
-                ):  # Process every player in the traversal copy, resulting in newly encountered players being processed
-                    if count >= battle_quantity:
-                        break
-                    tasks.append(
-                        fetch_battle_log(
-                            session,
-                            player_tag,
-                            seen_players,
-                            to_traverse,
-                            battle_tracker,
-                            csv_writer,
-                            semaphore,
-                            battle_quantity,
-                        )
+            client = RateLimitedClient(
+                session,
+                {"Authorization": f"Bearer {api_key}"} if api_key else HEADERS,
+                requests_per_second=requests_per_second,
+                max_concurrency=max_concurrency,
+                max_retries=max_retries,
+            )
+            # Long-lived workers pull players from the frontier as soon as they are
+            # free, instead of waiting for the slowest request of a whole BFS level
+            if shard:
+                frontier = ShardedFrontier(max_frontier, ShardBroker(*shard))
+            else:
+                frontier = CrawlFrontier(max_frontier)
+            # Most active known players first, after the seed
+            for player_tag in [*to_traverse, *revisit_players]:
+                frontier.add(player_tag)
+            limit_reached = asyncio.Event()
+            workers = [
+                asyncio.create_task(
+                    crawl_worker(
+                        client,
+                        frontier,
+                        seen_players,
+                        battle_tracker,
+                        battle_writer,
+                        battle_quantity,
+                        crawl_state,
+                        limit_reached,
+                        watermarks,
                     )
-
-                await asyncio.gather(*tasks)
-
-                # Flush the file every 10,000 battles
-                if battle_tracker.unique_battles % 10000 == 0:
-                    print(f"Backing up data at {battle_tracker.unique_battles} battles")
-                    csvfile.flush()
+                )
+                for _ in range(num_workers or max_concurrency)
+            ]
+            drained = asyncio.create_task(frontier.wait_exhausted())
+            stopped = asyncio.create_task(limit_reached.wait())
+            try:
+                await asyncio.wait(
+                    [drained, stopped], return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                for task in workers + [drained, stopped]:
+                    task.cancel()
+                await asyncio.gather(*workers, drained, stopped, return_exceptions=True)
+    finally:
+        # Checkpoint on completion as well as on Ctrl-C or errors, so the crawl can be resumed
+        checkpoint(crawl_state, battle_writer, battle_tracker, watermarks)
+        crawl_state.close()
+        battle_writer.close()
+        if watermarks is not None:
+            watermarks.close()
 
     dupes, battles = battle_tracker.get_counters()
     print(f"Evaluated {battles} unique battles.")
     print(f"Ignored {dupes} duplicate battles.")
+    if watermarks is not None:
+        print(
+            f"Skipped {watermarks.skipped_battles} battles older than player watermarks."
+        )
     print(f"Encountered {failures} request failures.")
+    print(
+        f"Dropped {frontier.dropped_players} discovered players beyond the frontier limit."
+    )
+    print(format_dedup_stats(battle_tracker.processed_battles.stats()))
+    print(client.stats.report())
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    print(f"Script executed in {elapsed_time:.2f} seconds")
+    if shard:
+        print(f'Shard output: "{csv_file_name}"')
+    else:
+        print(f'Output: "{csv_file_name}"')
+    return csv_file_name
+
+
+def run_shard(shard, csv_file_name, api_key, battle_quantity, crawl_options):
+    asyncio.run(
+        main(
+            None,
+            battle_quantity,
+            shard=shard,
+            csv_file_name=csv_file_name,
+            api_key=api_key,
+            **crawl_options,
+        )
+    )
+
+
+def run_sharded(
+    initial_player_tag, battle_quantity, api_keys, crawl_options, output_format="csv"
+):
+    """
+    Crawls with one process per API key, sharing a frontier through a ShardBroker, then
+    merges the shard CSVs into one deduplicated battle log.
+    """
+    num_shards = len(api_keys)
+    date_time_str = datetime.now().strftime("%m-%d-%Y_%I:%M_%p").lower()
+    csv_file_name = f"raw_data/battle_logs_{date_time_str}_{format_number(battle_quantity)}{STORE_FORMATS[output_format]}"
+    broker_file = broker_file_for(csv_file_name)
+    seed_players = [initial_player_tag]
+    if crawl_options.get("incremental"):
+        watermarks = PlayerWatermarks(
+            crawl_options["incremental"], crawl_options["min_expected_battles"]
+        )
+        seed_players += watermarks.revisit_order(crawl_options["max_frontier"])
+        watermarks.close()
+    broker = ShardBroker(broker_file, 0, num_shards)
+    broker.publish(seed_players)
+    broker.close()
+
+    shard_battle_quantity = -(-battle_quantity // num_shards)
+    shard_csv_files = [
+        shard_csv_file_for(csv_file_name, shard_index)
+        for shard_index in range(num_shards)
+    ]
+    # Spawn so every process starts with its own event loop and SQLite connections
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(
+            target=run_shard,
+            args=(
+                (broker_file, shard_index, num_shards),
+                shard_csv_files[shard_index],
+                api_key,
+                shard_battle_quantity,
+                crawl_options,
+            ),
+        )
+        for shard_index, api_key in enumerate(api_keys)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+        raise
+    failed = [
+        shard_index
+        for shard_index, process in enumerate(processes)
+        if process.exitcode != 0
+    ]
+    if failed:
+        print(f"Shards {failed} exited with errors, merging what they wrote.")
+
+    battles, duplicates = merge_shard_csvs(shard_csv_files, csv_file_name)
+    print(f"Merged {battles} battles from {num_shards} shards.")
+    print(f"Dropped {duplicates} battles crawled by more than one shard.")
     end_time = time.time()
     elapsed_time = end_time - start_time
     print(f"Script executed in {elapsed_time:.2f} seconds")
     print(f'Output: "{csv_file_name}"')
+    return csv_file_name
 
 
 if __name__ == "__main__":
     args = parse_args()
     print(f"> Executing {os.path.basename(__file__)}")
-    asyncio.run(main(args.initial_player_tag, args.battle_quantity))
-
-
+    crawl_options = {
+        "checkpoint_interval": args.checkpoint_interval,
+        "dedup": args.dedup,
+        "bloom_error_rate": args.bloom_error_rate,
+        "requests_per_second": args.requests_per_second,
+        "max_concurrency": args.max_concurrency,
+        "max_retries": args.max_retries,
+        "max_frontier": args.max_frontier,
+        "num_workers": args.workers,
+        "incremental": args.incremental,
+        "min_expected_battles": args.min_expected_battles,
+    }
+    if len(API_KEYS) > 1:
+        if args.resume:
+            raise ValueError(
+                "--resume is not supported for crawls with several API keys."
+            )
+        run_sharded(
+            args.initial_player_tag,
+            args.battle_quantity,
+            API_KEYS,
+            crawl_options,
+            args.format,
+        )
+    else:
+        asyncio.run(
+            main(
+                args.initial_player_tag,
+                args.battle_quantity,
+                args.resume,
+                output_format=args.format,
+                **crawl_options,
+            )
+        )
@@ -1,6 +1,5 @@
 import os
 import time
-import hashlib
 import csv
 import asyncio
 import aiohttp
@@ -20,6 +19,8 @@ if not API_KEY:
 # Headers for the API request
 HEADERS = {"Authorization": f"Bearer {API_KEY}"}
 
+API_URL = os.getenv("BRAWL_STARS_API_URL", "https://api.brawlstars.com/v1")
+
 
 class BattleLogTracker:
     def __init__(self):
@@ -130,7 +131,7 @@ async def fetch_battle_log(
     semaphore,
     num_battles,
 ):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{current_player_tag.replace("#", "%23")}/battlelog'
+    BASE_URL = f'{API_URL}/players/{current_player_tag.replace("#", "%23")}/battlelog'
     async with semaphore:  # Acquire semaphore before making the request
         if battle_tracker.unique_battles > num_battles:
             return
@@ -203,6 +204,7 @@ async def fetch_battle_log(
                                 losers[0],
                                 losers[1],
                                 losers[2],
+                                item.get("battleTime") or "",
                             ]
                         )
                         for player in player_tags:
@@ -253,6 +255,7 @@ async def main(initial_player_tag, battle_quantity):
                 "loser_1",
                 "loser_2",
                 "loser_3",
+                "battle_time",
             ]
         )
 
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+"""
+Player Watermarks - per-player record of the newest battle ingested across crawls
+    Incremental crawls only emit battles newer than a player's watermark and revisit
+    players in order of how many new battles they are expected to have, estimated from
+    how often they played in their last battle log.
+"""
+
+BATTLE_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+BATTLE_LOG_SIZE = 25
+# Weight of the newest battle log in the battles/day estimate
+ACTIVITY_SMOOTHING = 0.5
+
+
+def parse_battle_time(battle_time):
+    return datetime.strptime(battle_time, BATTLE_TIME_FORMAT).replace(
+        tzinfo=timezone.utc
+    )
+
+
+def battles_per_day(battle_times, crawled_at):
+    """
+    Estimates how many battles a player plays per day from one battle log.
+
+    Args:
+    battle_times (list): battleTime strings of the log, any order
+    crawled_at (datetime): time the log was fetched
+
+    Returns:
+    float: battles per day, 0 for an empty log
+    """
+    if not battle_times:
+        return 0.0
+    oldest = parse_battle_time(min(battle_times))
+    if len(battle_times) < BATTLE_LOG_SIZE:
+        # The log holds every recent battle, so it covers up to the crawl time
+        span = crawled_at - oldest
+    else:
+        span = parse_battle_time(max(battle_times)) - oldest
+    span_days = max(span.total_seconds() / 86400, 1 / 24)
+    return len(battle_times) / span_days
+
+
+class PlayerWatermarks:
+    """
+    Watermarks and activity of every crawled player, kept in a SQLite file that
+    outlives individual crawls.
+
+    Besides the watermark, the oldest battleTime of the unbroken span covered by the
+    player's crawls is kept, since battle logs only hold the last 25 battles and older
+    battles of the player may still be new. battleTime strings sort chronologically,
+    so both are compared as strings.
+
+    Updates are buffered in memory and written by flush(), which crawls call at
+    every checkpoint.
+
+    Args:
+    watermark_file (str): path to the SQLite file
+    min_expected_battles (float): known players are only revisited once they are
+        expected to have at least this many new battles
+    """
+
+    def __init__(self, watermark_file, min_expected_battles=1.0):
+        os.makedirs(os.path.dirname(watermark_file) or ".", exist_ok=True)
+        self.watermark_file = watermark_file
+        self.min_expected_battles = min_expected_battles
+        self.connection = sqlite3.connect(watermark_file, timeout=60)
+        # Shards of a sharded crawl share the file
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            "tag TEXT PRIMARY KEY, battle_time TEXT NOT NULL, oldest_battle_time TEXT NOT NULL, "
+            "crawled_at REAL NOT NULL, battles_per_day REAL NOT NULL)"
+        )
+        self.connection.commit()
+        self.now = datetime.now(timezone.utc)
+        # tag -> (battle_time, oldest_battle_time, crawled_at timestamp, battles_per_day)
+        self.players = {
+            row[0]: row[1:]
+            for row in self.connection.execute(
+                "SELECT tag, battle_time, oldest_battle_time, crawled_at, battles_per_day "
+                "FROM watermarks"
+            )
+        }
+        self.pending = {}
+        self.skipped_battles = 0
+
+    def __len__(self):
+        return len(self.players)
+
+    def watermark(self, player_tag):
+        player = self.players.get(player_tag)
+        return player[0] if player else None
+
+    def is_new(self, battle_time, player_tags):
+        """
+        Returns:
+        bool: False if any participant's previous crawl already covered the battle
+        """
+        for player_tag in player_tags:
+            player = self.players.get(player_tag)
+            if player and player[1] <= battle_time <= player[0]:
+                return False
+        return True
+
+    def expected_new_battles(self, player_tag):
+        player = self.players.get(player_tag)
+        if player is None:
+            return float(BATTLE_LOG_SIZE)
+        _, _, crawled_at, activity = player
+        days = max(0.0, self.now.timestamp() - crawled_at) / 86400
+        return min(float(BATTLE_LOG_SIZE), activity * days)
+
+    def is_due(self, player_tag):
+        """
+        Returns:
+        bool: True for unknown players and players expected to have new battles
+        """
+        return self.expected_new_battles(player_tag) >= self.min_expected_battles
+
+    def revisit_order(self, limit=None):
+        """
+        Returns:
+        list: due known players, most expected new battles first
+        """
+        expected = [
+            (self.expected_new_battles(player_tag), player_tag)
+            for player_tag in self.players
+        ]
+        expected = [
+            (battles, player_tag)
+            for battles, player_tag in expected
+            if battles >= self.min_expected_battles
+        ]
+        expected.sort(reverse=True)
+        return [player_tag for _, player_tag in expected[:limit]]
+
+    def update(self, player_tag, battle_times):
+        """
+        Records a fully processed battle log of a player.
+
+        Args:
+        player_tag (str): crawled player
+        battle_times (list): battleTime of every battle in the log
+        """
+        previous = self.players.get(player_tag)
+        now = datetime.now(timezone.utc)
+        activity = battles_per_day(battle_times, now)
+        battle_time = max(battle_times) if battle_times else ""
+        oldest_battle_time = min(battle_times) if battle_times else ""
+        if previous:
+            if oldest_battle_time <= previous[0]:
+                # The new log overlaps the covered span, so the span is extended
+                oldest_battle_time = min(oldest_battle_time, previous[1])
+            battle_time = max(battle_time, previous[0])
+            activity = (
+                ACTIVITY_SMOOTHING * activity + (1 - ACTIVITY_SMOOTHING) * previous[3]
+            )
+        self.players[player_tag] = (
+            battle_time,
+            oldest_battle_time,
+            now.timestamp(),
+            activity,
+        )
+        self.pending[player_tag] = self.players[player_tag]
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO watermarks (tag, battle_time, oldest_battle_time, "
+                "crawled_at, battles_per_day) VALUES (?, ?, ?, ?, ?)",
+                ((tag, *player) for tag, player in self.pending.items()),
+            )
+        self.pending.clear()
+
+    def close(self):
+        self.flush()
+        self.connection.close()
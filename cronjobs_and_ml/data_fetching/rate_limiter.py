@@ -0,0 +1,225 @@
+import time
+import random
+import asyncio
+import aiohttp
+
+"""
+Rate Limiter - request pacing, adaptive concurrency and retries for the Brawl Stars API
+    A token bucket caps requests/sec at the API key's quota, an AIMD controller raises the
+    number of in-flight requests while responses are healthy and halves it on throttling,
+    and transient failures are retried with jittered exponential backoff.
+"""
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` requests per second with bursts of up to `burst`.
+
+    Args:
+    rate (float): tokens added per second
+    burst (int): maximum number of stored tokens
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(1, int(rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        # Stop handing out tokens, e.g. for a Retry-After from the API
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD limit on in-flight requests.
+
+    The limit grows by one after a full window of successful requests (additive increase)
+    and is halved when the API throttles us (multiplicative decrease), at most once per
+    window so a burst of 429s only counts once.
+
+    Args:
+    initial (int): starting limit
+    minimum (int): lowest limit after decreases
+    maximum (int): highest limit after increases
+    """
+
+    def __init__(self, initial=5, minimum=1, maximum=64):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.in_flight = 0
+        self.successes = 0
+        self.last_decrease = 0
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def on_success(self):
+        self.successes += 1
+        if self.successes >= self.limit and self.limit < self.maximum:
+            self.limit += 1
+            self.successes = 0
+
+    def on_throttle(self):
+        now = time.monotonic()
+        if now - self.last_decrease < 1:
+            return
+        self.last_decrease = now
+        self.limit = max(self.minimum, self.limit // 2)
+        self.successes = 0
+
+
+class RequestStats:
+    def __init__(self):
+        self.start_time = time.monotonic()
+        self.requests = 0
+        self.retries = 0
+        self.throttled = 0
+        self.status_counts = {}
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latencies_ms = 0.0
+
+    def record(self, status, latency_ms):
+        self.requests += 1
+        self.status_counts[status] = self.status_counts.get(status, 0) + 1
+        self.latencies_ms += latency_ms
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if latency_ms <= bound:
+                self.latency_counts[index] += 1
+                return
+        self.latency_counts[-1] += 1
+
+    def requests_per_second(self):
+        elapsed = time.monotonic() - self.start_time
+        return self.requests / elapsed if elapsed > 0 else 0
+
+    def report(self):
+        lines = [
+            f"Made {self.requests} requests at {self.requests_per_second():.1f} req/s "
+            f"({self.retries} retries, {self.throttled} throttled)",
+            f"Status codes: {dict(sorted(self.status_counts.items(), key=str))}",
+        ]
+        if self.requests:
+            lines.append(
+                f"Mean latency: {self.latencies_ms / self.requests:.1f} ms, histogram:"
+            )
+            labels = [f"<= {bound} ms" for bound in LATENCY_BUCKETS_MS] + [
+                f"> {LATENCY_BUCKETS_MS[-1]} ms"
+            ]
+            for label, bucket_count in zip(labels, self.latency_counts):
+                lines.append(f"  {label:>10}: {bucket_count}")
+        return "\n".join(lines)
+
+
+class RateLimitedClient:
+    """
+    Wraps an aiohttp session with a token bucket, AIMD concurrency and retries.
+
+    Args:
+    session (aiohttp.ClientSession): session used for every request
+    headers (dict): headers sent with every request
+    requests_per_second (float): API key quota
+    max_concurrency (int): upper bound for in-flight requests
+    max_retries (int): retries per request for 429s, 5xx and connection errors
+    """
+
+    def __init__(
+        self,
+        session,
+        headers,
+        requests_per_second=20,
+        max_concurrency=64,
+        max_retries=5,
+        initial_concurrency=5,
+    ):
+        self.session = session
+        self.headers = headers
+        self.bucket = TokenBucket(requests_per_second)
+        self.concurrency = AdaptiveConcurrency(
+            initial=initial_concurrency, maximum=max_concurrency
+        )
+        self.max_retries = max_retries
+        self.stats = RequestStats()
+
+    async def get_json(self, url):
+        """
+        Returns:
+        tuple: (HTTP status, decoded JSON body or None). Status is None if every
+            attempt failed with a connection error.
+        """
+        status = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            await self.bucket.acquire()
+            async with self.concurrency:
+                start = time.monotonic()
+                try:
+                    async with self.session.get(url, headers=self.headers) as response:
+                        status = response.status
+                        if status == 200:
+                            data = await response.json()
+                            self.stats.record(status, (time.monotonic() - start) * 1000)
+                            self.concurrency.on_success()
+                            return status, data
+                        retry_after = response.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    status = None
+                self.stats.record(status, (time.monotonic() - start) * 1000)
+
+            if status is not None and status not in RETRY_STATUSES:
+                return status, None
+            if attempt == self.max_retries:
+                break
+            if status == 429:
+                self.stats.throttled += 1
+                self.concurrency.on_throttle()
+            self.stats.retries += 1
+            delay = self.backoff(attempt, retry_after)
+            if retry_after is not None:
+                self.bucket.pause(delay)
+            await asyncio.sleep(delay)
+        return status, None
+
+    def backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Full jitter exponential backoff, capped at 30 seconds
+        return random.uniform(0, min(30, 0.5 * 2**attempt))
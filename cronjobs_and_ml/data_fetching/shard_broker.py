@@ -0,0 +1,119 @@
+import os
+import csv
+import hashlib
+import sqlite3
+from battle_dedup import BattleHashSet
+from battle_store import open_battle_writer
+
+"""
+Shard Broker - shared frontier for crawling with several API keys at once
+    Every player tag is owned by one shard (crawler process) chosen by a stable hash of
+    the tag. Shards publish the players they discover to a shared SQLite file and claim
+    the players they own from it, so each player is crawled by one process only.
+"""
+
+
+def shard_of(player_tag, num_shards):
+    # Python's hash() is randomized per process, so use a stable digest
+    digest = hashlib.blake2b(player_tag.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % num_shards
+
+
+class ShardBroker:
+    """
+    Args:
+    broker_file (str): path to the shared SQLite file
+    shard_index (int): shard this process crawls
+    num_shards (int): total number of crawler processes
+    """
+
+    def __init__(self, broker_file, shard_index, num_shards):
+        self.shard_index = shard_index
+        self.num_shards = num_shards
+        self.connection = sqlite3.connect(broker_file, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS players "
+            "(tag TEXT PRIMARY KEY, shard INTEGER NOT NULL, claimed INTEGER NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS players_by_shard ON players (shard, claimed)"
+        )
+        self.connection.commit()
+
+    def owns(self, player_tag):
+        return shard_of(player_tag, self.num_shards) == self.shard_index
+
+    def publish(self, player_tags):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO players (tag, shard, claimed) VALUES (?, ?, 0)",
+                ((tag, shard_of(tag, self.num_shards)) for tag in player_tags),
+            )
+
+    def claim(self, limit):
+        """
+        Marks up to `limit` unclaimed players of this shard as claimed.
+
+        Returns:
+        list: the claimed player tags
+        """
+        with self.connection:
+            player_tags = [
+                tag
+                for (tag,) in self.connection.execute(
+                    "SELECT tag FROM players WHERE shard = ? AND claimed = 0 LIMIT ?",
+                    (self.shard_index, limit),
+                )
+            ]
+            self.connection.executemany(
+                "UPDATE players SET claimed = 1 WHERE tag = ?",
+                ((tag,) for tag in player_tags),
+            )
+        return player_tags
+
+    def close(self):
+        self.connection.close()
+
+
+def broker_file_for(csv_file_name, state_dir="crawl_state"):
+    os.makedirs(state_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(csv_file_name))[0]
+    return os.path.join(state_dir, f"{base_name}_frontier.db")
+
+
+def shard_csv_file_for(csv_file_name, shard_index, state_dir="crawl_state"):
+    os.makedirs(state_dir, exist_ok=True)
+    base_name = os.path.splitext(os.path.basename(csv_file_name))[0]
+    return os.path.join(state_dir, f"{base_name}_shard{shard_index}.csv")
+
+
+def merge_shard_csvs(shard_csv_files, output_file):
+    """
+    Concatenates shard CSVs into one battle log, dropping battles crawled by more than
+    one shard and the battle_digest column used to find them. The battle log is written
+    in the format given by output_file's extension.
+
+    Returns:
+    tuple: (number of battles written, number of cross-shard duplicates dropped)
+    """
+    seen_battles = BattleHashSet()
+    written, duplicates = 0, 0
+    battle_writer = None
+    for shard_csv_file in shard_csv_files:
+        with open(shard_csv_file, newline="") as infile:
+            reader = csv.reader(infile)
+            header = next(reader, None)
+            if header is None:
+                continue
+            if battle_writer is None:
+                battle_writer = open_battle_writer(output_file, header[:-1])
+            for row in reader:
+                if not seen_battles.add(int(row[-1])):
+                    duplicates += 1
+                    continue
+                battle_writer.writerow(row[:-1])
+                written += 1
+    if battle_writer is not None:
+        battle_writer.close()
+    return written, duplicates
@@ -6,7 +6,7 @@ import asyncio
 import aiohttp
 from aiohttp import ClientResponseError, ClientConnectionError, ClientPayloadError
 from dotenv import load_dotenv
-from shared.utils import print_progress_bar
+from shared.utils import API_URL, print_progress_bar
 from shared.class_definitions import BattleLogTracker, BrawlerStats
 
 # Load environment variables from .env file
@@ -41,7 +41,7 @@ def create_battle_hash(battle_time, teams):
     return hashlib.sha256(unique_string.encode()).hexdigest()
 
 async def fetch_battle_log(session, current_player_tag, brawler_stats, seen_players, to_traverse, battle_tracker, csv_writer):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{current_player_tag.replace("#", "%23")}/battlelog'
+    BASE_URL = f'{API_URL}/players/{current_player_tag.replace("#", "%23")}/battlelog'
     try:
         async with session.get(BASE_URL, headers=HEADERS) as response:
             if response.status == 200:
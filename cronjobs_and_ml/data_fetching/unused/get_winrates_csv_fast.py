@@ -5,7 +5,7 @@ from dotenv import load_dotenv
 import time
 import hashlib
 import csv
-from shared.utils import get_player_name, print_progress_bar
+from shared.utils import API_URL, get_player_name, print_progress_bar
 
 # Load environment variables from .env file
 start_time = time.time()
@@ -86,7 +86,7 @@ def create_battle_hash(battle_time, teams):
     return hashlib.sha256(unique_string.encode()).hexdigest()
 
 def fetch_battle_log(current_player_tag, brawler_stats, seen_players, to_traverse, battle_tracker, csv_writer):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{current_player_tag.replace("#", "%23")}/battlelog'
+    BASE_URL = f'{API_URL}/players/{current_player_tag.replace("#", "%23")}/battlelog'
     response = requests.get(BASE_URL, headers=HEADERS)
     
     if response.status_code == 200:
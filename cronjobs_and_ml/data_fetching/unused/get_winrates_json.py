@@ -4,7 +4,7 @@ import os
 from dotenv import load_dotenv
 import time
 import hashlib
-from shared.utils import get_player_name, print_progress_bar
+from shared.utils import API_URL, get_player_name, print_progress_bar
 
 # Load environment variables from .env file
 start_time = time.time()
@@ -112,7 +112,7 @@ def print_and_save_stats(brawler_stats, popular_brawlers):
         print("Updated 'brawler_popularity.json'")
 
 def fetch_battle_log(player_tag, brawler_stats, seen_players, to_traverse, battle_tracker):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{player_tag.replace("#", "%23")}/battlelog'
+    BASE_URL = f'{API_URL}/players/{player_tag.replace("#", "%23")}/battlelog'
     response = requests.get(BASE_URL, headers=HEADERS)
     
     if response.status_code == 200:
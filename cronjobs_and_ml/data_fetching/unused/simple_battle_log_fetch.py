@@ -2,7 +2,7 @@ import requests
 import json
 import os
 from dotenv import load_dotenv
-from shared.utils import get_player_name
+from shared.utils import API_URL, get_player_name
 # Load environment variables from .env file
 load_dotenv()
 
@@ -39,7 +39,7 @@ def update_brawler_stats(brawler_stats, brawler_name, win_status):
         # print(brawler_name, "loss")
         
 def fetch_battle_log(player_tag):
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{player_tag.replace("#", "%23")}/battlelog'
+    BASE_URL = f'{API_URL}/players/{player_tag.replace("#", "%23")}/battlelog'
     response = requests.get(BASE_URL, headers=HEADERS)
     if response.status_code == 200:
         print(f'Now getting stats for {get_player_name(player_tag)} player')
@@ -0,0 +1,353 @@
+import pandas as pd
+import numpy as np
+import os
+import sys
+import glob
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.brawler_registry import REGISTRY
+from shared.battle_logs import (
+    BATTLE_COLUMNS,
+    BATTLE_TIME_FORMAT,
+    BRAWLER_COLUMNS,
+    LOSE_COLUMNS,
+    TIME_COLUMN,
+    WIN_COLUMNS,
+    empty_battles,
+    read_battle_chunks,
+    read_battles,
+    read_new_battle_chunks,
+)
+
+"""
+Battle Aggregator - reads a battle log once and fills every count table used by the stats scripts
+    Brawlers are encoded to their ids in shared/brawler_registry.py and maps and modes
+    to small integer codes, so counting is a handful of numpy bincount calls instead of
+    a Python loop over every row. Battle logs are read CHUNK_ROWS battles at a time
+    and the chunks' counts are summed, so memory depends on the number of brawlers and
+    maps, not on the size of the battle log.
+"""
+
+# Battles per chunk when aggregating, a few hundred MB of categorical columns at most
+CHUNK_ROWS = 1_000_000
+
+
+class BattleCounts:
+    """
+    Count tables for one battle log, indexed by integer brawler/map/mode codes.
+
+    Attributes:
+    brawler_names (list): brawler name for each brawler code, the brawler registry's
+        names, so brawler codes are registry ids
+    map_names (list): map name for each map code
+    mode_names (list): battle mode name for each mode code
+    battle_count (int): number of battles (rows) read
+    slot_count (int): number of brawler slots read, i.e. six per battle
+    wins, losses (ndarray[brawler]): games won/lost by each brawler
+    teammate_wins, teammate_losses (ndarray[brawler, brawler]): games won/lost with
+        the column brawler on the same team, counted only on full 3v3 battles
+        without duplicate brawlers on a team
+    opponent_wins (ndarray[brawler, brawler]): games the row brawler won against the
+        column brawler
+    map_wins, map_losses (ndarray[map, brawler]): games won/lost on each map
+    mode_wins, mode_losses (ndarray[mode, brawler]): games won/lost in each mode
+    """
+
+    def __init__(self, brawler_names, map_names, mode_names):
+        num_brawlers = len(brawler_names)
+        self.brawler_names = list(brawler_names)
+        self.map_names = list(map_names)
+        self.mode_names = list(mode_names)
+        self.battle_count = 0
+        self.slot_count = 0
+        self.wins = np.zeros(num_brawlers, dtype=np.int64)
+        self.losses = np.zeros(num_brawlers, dtype=np.int64)
+        self.teammate_wins = np.zeros((num_brawlers, num_brawlers), dtype=np.int64)
+        self.teammate_losses = np.zeros((num_brawlers, num_brawlers), dtype=np.int64)
+        self.opponent_wins = np.zeros((num_brawlers, num_brawlers), dtype=np.int64)
+        self.map_wins = np.zeros((len(map_names), num_brawlers), dtype=np.int64)
+        self.map_losses = np.zeros((len(map_names), num_brawlers), dtype=np.int64)
+        self.mode_wins = np.zeros((len(mode_names), num_brawlers), dtype=np.int64)
+        self.mode_losses = np.zeros((len(mode_names), num_brawlers), dtype=np.int64)
+
+    def brawler_index(self):
+        return {name: code for code, name in enumerate(self.brawler_names)}
+
+    def merge(self, other):
+        """
+        Adds up the counts of two battle logs, e.g. two chunks of the same one. Maps and
+        modes are matched by name, brawler codes are registry ids in both.
+
+        Returns:
+        BattleCounts: new tables with the summed counts
+        """
+        return self.combine(other, 1)
+
+    def subtract(self, other):
+        """
+        Removes the counts of battles counted in both, e.g. a day leaving a time window.
+
+        Returns:
+        BattleCounts: new tables with the difference of the counts
+        """
+        return self.combine(other, -1)
+
+    def combine(self, other, sign):
+        # A later registry snapshot only has more brawlers appended
+        brawler_names = max(self.brawler_names, other.brawler_names, key=len)
+        map_names = sorted(set(self.map_names) | set(other.map_names))
+        mode_names = sorted(set(self.mode_names) | set(other.mode_names))
+        combined = BattleCounts(brawler_names, map_names, mode_names)
+        map_codes = {name: code for code, name in enumerate(map_names)}
+        mode_codes = {name: code for code, name in enumerate(mode_names)}
+        for counts, factor in ((self, 1), (other, sign)):
+            n = len(counts.brawler_names)
+            map_rows = [map_codes[name] for name in counts.map_names]
+            mode_rows = [mode_codes[name] for name in counts.mode_names]
+            combined.battle_count += factor * counts.battle_count
+            combined.slot_count += factor * counts.slot_count
+            combined.wins[:n] += factor * counts.wins
+            combined.losses[:n] += factor * counts.losses
+            combined.teammate_wins[:n, :n] += factor * counts.teammate_wins
+            combined.teammate_losses[:n, :n] += factor * counts.teammate_losses
+            combined.opponent_wins[:n, :n] += factor * counts.opponent_wins
+            combined.map_wins[map_rows, :n] += factor * counts.map_wins
+            combined.map_losses[map_rows, :n] += factor * counts.map_losses
+            combined.mode_wins[mode_rows, :n] += factor * counts.mode_wins
+            combined.mode_losses[mode_rows, :n] += factor * counts.mode_losses
+        return combined
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Create brawler data, synergies, counters and map winrates in one pass over match data."
+    )
+    parser.add_argument(
+        "input_file",
+        type=str,
+        nargs="?",
+        default=None,
+        help="Path to the input match data CSV file or Parquet/Arrow directory. If not provided, the most recent one in the raw_data folder will be used.",
+    )
+    add_chunk_rows_argument(parser)
+    return parser.parse_args()
+
+
+def add_chunk_rows_argument(parser):
+    parser.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=CHUNK_ROWS,
+        help=f"Battles read and counted at a time. Default is {CHUNK_ROWS}, 0 reads the whole battle log at once.",
+    )
+
+
+def find_most_recent_file(directory):
+    files = glob.glob(os.path.join(directory, "*"))
+    if not files:
+        return None
+    most_recent_file = max(files, key=os.path.getctime)
+    return most_recent_file
+
+
+def pair_counts(left, right, size):
+    """
+    Counts how often each (left, right) code pair occurs, skipping pairs with a missing code.
+
+    Returns:
+    ndarray: size x size matrix of pair counts
+    """
+    mask = (left >= 0) & (right >= 0)
+    flat = left[mask].astype(np.int64) * size + right[mask]
+    return np.bincount(flat, minlength=size * size).reshape(size, size)
+
+
+def grouped_counts(groups, codes, num_groups, size):
+    """
+    Counts how often each brawler code occurs within each group code (map or mode).
+
+    Returns:
+    ndarray: num_groups x size matrix of counts
+    """
+    counts = np.zeros((num_groups, size), dtype=np.int64)
+    for column in codes.T:
+        mask = (groups >= 0) & (column >= 0)
+        flat = groups[mask].astype(np.int64) * size + column[mask]
+        counts += np.bincount(flat, minlength=num_groups * size).reshape(
+            num_groups, size
+        )
+    return counts
+
+
+def aggregate_battles(input_file, chunk_rows=CHUNK_ROWS):
+    """
+    Reads a battle log once and fills all count tables, with a vectorized pass per chunk.
+
+    Args:
+    input_file (str): path to a battle log CSV, Parquet or Arrow directory written by
+        get_battle_logs.py
+    chunk_rows (int): battles per chunk, 0 or None to read the whole battle log at once
+
+    Returns:
+    BattleCounts: the filled count tables
+    """
+    if not chunk_rows:
+        return count_battles(read_battles(input_file))
+    counts = None
+    for battles in read_battle_chunks(input_file, chunk_rows):
+        chunk_counts = count_battles(battles)
+        counts = chunk_counts if counts is None else counts.merge(chunk_counts)
+    return (
+        counts if counts is not None else count_battles(empty_battles(BATTLE_COLUMNS))
+    )
+
+
+def team_codes(df):
+    """
+    Returns:
+    tuple: (winners, losers), battles x 3 arrays of registry brawler ids. Missing
+        values ("N/A" in the crawler output) become -1, brawlers the registry doesn't
+        know yet are interned.
+    """
+    winners = np.column_stack([REGISTRY.codes(df[column]) for column in WIN_COLUMNS])
+    losers = np.column_stack([REGISTRY.codes(df[column]) for column in LOSE_COLUMNS])
+    return winners, losers
+
+
+def full_team_mask(winners, losers):
+    # Battles where both teams are three distinct known brawlers
+    return (
+        (winners >= 0).all(axis=1)
+        & (losers >= 0).all(axis=1)
+        & (winners[:, 0] != winners[:, 1])
+        & (winners[:, 0] != winners[:, 2])
+        & (winners[:, 1] != winners[:, 2])
+        & (losers[:, 0] != losers[:, 1])
+        & (losers[:, 0] != losers[:, 2])
+        & (losers[:, 1] != losers[:, 2])
+    )
+
+
+def count_battles(df):
+    winners, losers = team_codes(df)
+    map_names = list(df["map_name"].cat.categories)
+    mode_names = list(df["battle_mode"].cat.categories)
+    counts = BattleCounts(REGISTRY.names, map_names, mode_names)
+    size = len(REGISTRY)
+    maps = df["map_name"].cat.codes.to_numpy().astype(np.int32)
+    modes = df["battle_mode"].cat.codes.to_numpy().astype(np.int32)
+
+    counts.battle_count = len(df)
+    counts.slot_count = len(df) * len(BRAWLER_COLUMNS)
+    counts.wins = np.bincount(winners[winners >= 0], minlength=size)
+    counts.losses = np.bincount(losers[losers >= 0], minlength=size)
+
+    # Teammate pairs only count full teams of three distinct brawlers
+    full_teams = full_team_mask(winners, losers)
+    full_winners, full_losers = winners[full_teams], losers[full_teams]
+    for primary_idx in range(3):
+        for secondary_idx in range(3):
+            if primary_idx == secondary_idx:
+                continue
+            counts.teammate_wins += pair_counts(
+                full_winners[:, primary_idx], full_winners[:, secondary_idx], size
+            )
+            counts.teammate_losses += pair_counts(
+                full_losers[:, primary_idx], full_losers[:, secondary_idx], size
+            )
+
+    for winner_idx in range(3):
+        for loser_idx in range(3):
+            counts.opponent_wins += pair_counts(
+                winners[:, winner_idx], losers[:, loser_idx], size
+            )
+
+    counts.map_wins = grouped_counts(maps, winners, len(map_names), size)
+    counts.map_losses = grouped_counts(maps, losers, len(map_names), size)
+    counts.mode_wins = grouped_counts(modes, winners, len(mode_names), size)
+    counts.mode_losses = grouped_counts(modes, losers, len(mode_names), size)
+    return counts
+
+
+def battle_days(column):
+    """
+    Args:
+    column (Series): battle times, API strings or timestamps
+
+    Returns:
+    ndarray: datetime64[D] UTC day of every battle, NaT without a battle time
+    """
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        # One parse per distinct battle time, the rows only index the result
+        times = pd.to_datetime(
+            column.cat.categories, format=BATTLE_TIME_FORMAT, utc=True, errors="coerce"
+        )
+        days = times.tz_convert(None).to_numpy().astype("datetime64[D]")
+        days = np.append(days, np.datetime64("NaT", "D"))
+        return days[column.cat.codes.to_numpy()]
+    times = pd.DatetimeIndex(pd.to_datetime(column, utc=True))
+    return times.tz_convert(None).to_numpy().astype("datetime64[D]")
+
+
+def count_battles_by_day(df):
+    """
+    Counts the battles of each UTC day separately.
+
+    Returns:
+    dict: day ("YYYY-MM-DD") -> BattleCounts of its battles, battles without a battle
+        time are left out
+    """
+    days = battle_days(df[TIME_COLUMN])
+    rows = np.flatnonzero(~np.isnat(days))
+    unique_days, day_codes = np.unique(days[rows], return_inverse=True)
+    return {
+        str(day): count_battles(df.iloc[rows[day_codes == code]])
+        for code, day in enumerate(unique_days)
+    }
+
+
+def main(input_file, chunk_rows=CHUNK_ROWS):
+    print(f'Input: "{input_file}"')
+    counts = aggregate_battles(input_file, chunk_rows)
+    print(f"Aggregated {counts.battle_count} battles")
+    write_outputs(counts)
+
+
+def write_outputs(counts, output_dir="output"):
+    """
+    Writes the brawler data, synergy, counters and map winrates of the count tables.
+
+    Returns:
+    DataFrame: the brawler data
+    """
+    # Imported here so the stats scripts can import this module without a cycle
+    from create_brawler_data import generate_brawler_stats_from_counts
+    from create_brawler_synergy import find_all_brawler_pairs_synergy_from_counts
+    from create_brawler_counters import process_brawler_counts
+    from create_map_brawler_winrates import process_map_brawler_counts
+
+    os.makedirs(output_dir, exist_ok=True)
+    brawler_data_file = os.path.join(output_dir, "brawler_data.csv")
+    brawler_stats = generate_brawler_stats_from_counts(counts, brawler_data_file)
+    find_all_brawler_pairs_synergy_from_counts(
+        counts,
+        dict(zip(brawler_stats["brawler_id"], brawler_stats["win_rate"])),
+        os.path.join(output_dir, "brawler_synergy.json"),
+    )
+    process_brawler_counts(counts, os.path.join(output_dir, "brawler_counters.json"))
+    process_map_brawler_counts(
+        counts, os.path.join(output_dir, "brawler_map_winrates.json")
+    )
+    print(f'Output: "{brawler_data_file}"')
+    return brawler_stats
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    input_file = args.input_file or find_most_recent_file("raw_data")
+    if not input_file:
+        print("Invalid input file")
+    else:
+        main(input_file, args.chunk_rows)
@@ -0,0 +1,239 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+from battle_aggregator import (
+    BattleCounts,
+    CHUNK_ROWS,
+    add_chunk_rows_argument,
+    count_battles,
+    read_new_battle_chunks,
+    write_outputs,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically
+from shared.brawler_registry import REGISTRY
+from shared.versioned_index import VersionedIndex
+
+"""
+Count Snapshots - the BattleCounts tables of every battle counted so far, as versioned .npz files
+    Each version is the previous version's counts plus the counts of the battles crawled
+    since, and records how many battles it has counted from each battle log file. An
+    update only reads the new battles, merges their counts into the latest snapshot and
+    regenerates the outputs from the summed tables, instead of recounting every battle.
+
+Layout, in the snapshot directory:
+    index.json: {"versions": [{version, file, parent, created_at, battle_count,
+        new_battles, watermark, file_sizes}]}
+    counts-<version>.npz: the count tables with their brawler, map and mode names
+"""
+
+SNAPSHOT_FORMAT = 1
+DEFAULT_SNAPSHOT_DIR = "output/count_snapshots"
+COUNT_TABLES = [
+    "wins",
+    "losses",
+    "teammate_wins",
+    "teammate_losses",
+    "opponent_wins",
+    "map_wins",
+    "map_losses",
+    "mode_wins",
+    "mode_losses",
+]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Add the counts of new battles to the latest count snapshot and regenerate the stats outputs from it."
+    )
+    parser.add_argument(
+        "battle_logs",
+        type=str,
+        nargs="*",
+        help="Battle log CSVs or Parquet/Arrow directories. Battles already in the snapshot are skipped.",
+    )
+    parser.add_argument(
+        "--snapshot-dir",
+        type=str,
+        default=DEFAULT_SNAPSHOT_DIR,
+        help=f"Directory of the count snapshots. Default is '{DEFAULT_SNAPSHOT_DIR}'.",
+    )
+    parser.add_argument(
+        "--from-version",
+        type=int,
+        default=None,
+        help="Snapshot version to add the new battles to. Default is the latest one.",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="Count every battle of the battle logs into a new snapshot without a parent.",
+    )
+    add_chunk_rows_argument(parser)
+    return parser.parse_args()
+
+
+def save_counts(counts, path):
+    replace_atomically(lambda temp_path: write_counts(counts, temp_path), path)
+
+
+def write_counts(counts, path):
+    tables = {name: getattr(counts, name) for name in COUNT_TABLES}
+    # A file object, np.savez would append .npz to the path
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f,
+            format=np.array(SNAPSHOT_FORMAT),
+            brawler_names=np.array(counts.brawler_names, dtype=str),
+            map_names=np.array(counts.map_names, dtype=str),
+            mode_names=np.array(counts.mode_names, dtype=str),
+            battle_count=np.array(counts.battle_count),
+            slot_count=np.array(counts.slot_count),
+            **tables,
+        )
+
+
+def load_counts(path):
+    """
+    Returns:
+    BattleCounts: the count tables of a snapshot, with brawler codes mapped to the
+        current registry ids
+    """
+    with np.load(path) as data:
+        if int(data["format"]) != SNAPSHOT_FORMAT:
+            raise ValueError(f'Unsupported count snapshot format in "{path}"')
+        # Brawlers the registry doesn't know are interned in the order they are seen,
+        # so their ids can differ from the run that wrote the snapshot
+        ids = np.array(
+            [REGISTRY.intern(str(name)) for name in data["brawler_names"]],
+            dtype=np.int64,
+        )
+        counts = BattleCounts(
+            REGISTRY.names, data["map_names"].tolist(), data["mode_names"].tolist()
+        )
+        counts.battle_count = int(data["battle_count"])
+        counts.slot_count = int(data["slot_count"])
+        for name in ["wins", "losses"]:
+            getattr(counts, name)[ids] = data[name]
+        for name in ["teammate_wins", "teammate_losses", "opponent_wins"]:
+            getattr(counts, name)[np.ix_(ids, ids)] = data[name]
+        for name in ["map_wins", "map_losses", "mode_wins", "mode_losses"]:
+            getattr(counts, name)[:, ids] = data[name]
+    return counts
+
+
+class CountSnapshots(VersionedIndex):
+    """
+    Args:
+    snapshot_dir (str): directory of index.json and the snapshot files
+    """
+
+    def __init__(self, snapshot_dir):
+        super().__init__(
+            snapshot_dir, "counts-{version:04d}.npz", "count snapshot version"
+        )
+        self.snapshot_dir = snapshot_dir
+
+    def load(self, entry):
+        return load_counts(self.path(entry))
+
+    def save(self, counts, info):
+        """
+        Stores count tables as the next version.
+
+        Args:
+        counts (BattleCounts)
+        info (dict): index fields of the version, at least its watermark
+
+        Returns:
+        dict: index entry of the new version
+        """
+        return self.add(
+            lambda entry, path: write_counts(counts, path),
+            {"battle_count": counts.battle_count, **info},
+        )
+
+
+def count_new_battles(battle_logs, watermark, file_sizes, chunk_rows=CHUNK_ROWS):
+    """
+    Counts the battles of battle logs past a watermark, see read_new_battle_chunks.
+
+    Returns:
+    tuple: (BattleCounts of the new battles, None without any, dict of battles read
+        per file)
+    """
+    delta = None
+    read_rows = {}
+    for path, battles in read_new_battle_chunks(
+        battle_logs, chunk_rows, watermark, file_sizes
+    ):
+        chunk_counts = count_battles(battles)
+        delta = chunk_counts if delta is None else delta.merge(chunk_counts)
+        read_rows[path] = read_rows.get(path, 0) + len(battles)
+    return delta, read_rows
+
+
+def update_snapshot(
+    battle_logs, snapshots, chunk_rows=CHUNK_ROWS, from_version=None, rebuild=False
+):
+    """
+    Adds the counts of the battles past the parent snapshot's watermark to its counts
+    and stores the sum as a new version. Nothing is stored without new battles.
+
+    Returns:
+    tuple: (BattleCounts of every battle counted so far, index entry of their snapshot,
+        number of new battles)
+    """
+    parent = None if rebuild else snapshots.get(from_version)
+    watermark = dict(parent["watermark"]) if parent else {}
+    file_sizes = dict(parent.get("file_sizes", {})) if parent else {}
+    delta, read_rows = count_new_battles(battle_logs, watermark, file_sizes, chunk_rows)
+    counts = snapshots.load(parent) if parent else None
+    if delta is None:
+        if parent:
+            return counts, parent, 0
+        raise ValueError(f"No battles in {battle_logs}")
+    counts = delta if counts is None else counts.merge(delta)
+    for path, rows in read_rows.items():
+        watermark[path] = watermark.get(path, 0) + rows
+    entry = snapshots.save(
+        counts,
+        {
+            "parent": parent["version"] if parent else None,
+            "new_battles": delta.battle_count,
+            "watermark": watermark,
+            "file_sizes": file_sizes,
+        },
+    )
+    return counts, entry, delta.battle_count
+
+
+def main(args):
+    snapshots = CountSnapshots(args.snapshot_dir)
+    start_time = time.time()
+    counts, entry, new_battles = update_snapshot(
+        args.battle_logs,
+        snapshots,
+        args.chunk_rows,
+        from_version=args.from_version,
+        rebuild=args.rebuild,
+    )
+    update_time = time.time() - start_time
+    print(
+        f"Snapshot version {entry['version']}: {new_battles} new battles, "
+        f"{counts.battle_count} in total ({update_time:.2f} s)"
+    )
+    start_time = time.time()
+    write_outputs(counts)
+    print(f"Outputs regenerated in {time.time() - start_time:.2f} s")
+    print(f'Output: "{os.path.join(args.snapshot_dir, entry["file"])}"')
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    print(f"Input: {args.battle_logs}")
+    main(args)
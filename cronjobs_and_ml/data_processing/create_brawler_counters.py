@@ -1,9 +1,9 @@
-import pandas as pd
+import numpy as np
 import json
-from collections import defaultdict
 import os
 import glob
 import argparse
+from battle_aggregator import aggregate_battles
 
 """
 Antagony - {Brawler A: {Brawler B, Brawler C, ...}, ...}
@@ -34,47 +34,33 @@ def find_most_recent_file(directory):
 
 
 def process_brawler_data(input_csv_path, output_antagony_json_path):
-    # Load the CSV file into a DataFrame
-    df = pd.read_csv(input_csv_path)
-
-    # Initialize dictionary to store antagony data
-    antagony_stats = defaultdict(lambda: defaultdict(lambda: {"wins": 0, "total": 0}))
-
-    # Process each row in the DataFrame
-    for index, row in df.iterrows():
-        winners = [row["winner_1"], row["winner_2"], row["winner_3"]]
-        losers = [row["loser_1"], row["loser_2"], row["loser_3"]]
-
-        # Skip rows with NaN values for brawlers
-        winners = [brawler for brawler in winners if pd.notna(brawler)]
-        losers = [brawler for brawler in losers if pd.notna(brawler)]
-
-        # Update antagony stats
-        for winner in winners:
-            for loser in losers:
-                antagony_stats[winner][loser]["wins"] += 1
-                antagony_stats[winner][loser]["total"] += 1
-                antagony_stats[loser][winner]["total"] += 1
-
-    # Calculate antagony percentages
-    antagony_percentages = defaultdict(dict)
-
-    for brawler, opponents in antagony_stats.items():
-        for opponent, stats in opponents.items():
-            if stats["total"] > 0:
-                antagony_percentage = (stats["wins"] / stats["total"]) * 100
-                antagony_percentages[brawler][opponent] = antagony_percentage
+    process_brawler_counts(aggregate_battles(input_csv_path), output_antagony_json_path)
+
+
+def process_brawler_counts(counts, output_antagony_json_path):
+    # Games between each pair of brawlers, from either side of the matchup
+    wins = counts.opponent_wins
+    totals = wins + wins.T
+    antagony_percentages = 100 * np.divide(
+        wins,
+        totals,
+        out=np.zeros(totals.shape, dtype=np.float64),
+        where=totals > 0,
+    )
 
     # Prepare JSON data for antagony
-    antagony_data = defaultdict(dict)
-    for brawler in antagony_percentages:
-        antagony = sorted(
-            antagony_percentages[brawler].items(), key=lambda x: x[1], reverse=True
-        )
+    antagony_data = {}
+    for brawler_idx, brawler in enumerate(counts.brawler_names):
+        if not totals[brawler_idx].any():
+            continue
+        order = np.argsort(-antagony_percentages[brawler_idx], kind="stable")
         antagony_data[brawler] = [
-            {"brawler": opponent, "percentage": percentage}
-            for opponent, percentage in antagony
-            if opponent != brawler
+            {
+                "brawler": counts.brawler_names[opponent_idx],
+                "percentage": float(antagony_percentages[brawler_idx, opponent_idx]),
+            }
+            for opponent_idx in order
+            if totals[brawler_idx, opponent_idx] > 0 and opponent_idx != brawler_idx
         ]
 
     # Save to JSON file
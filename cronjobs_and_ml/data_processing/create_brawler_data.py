@@ -1,115 +1,12 @@
 import pandas as pd
+import numpy as np
 import re
 from datetime import datetime
 import glob
 import os
 import argparse
-
-
-# For new brawlers, they are dropped unless included in one of the classes
-# Define brawler classes
-formatted_damage_dealer_names = [
-    "8-Bit",
-    "Carl",
-    "Chester",
-    "Chuck",
-    "Clancy",
-    "Colette",
-    "Colt",
-    "Eve",
-    "Lola",
-    "Nita",
-    "Pearl",
-    "R-T",
-    "Rico",
-    "Shelly",
-    "Spike",
-    "Surge",
-    "Tara",
-]
-
-formatted_controller_names = [
-    "Amber",
-    "Bo",
-    "Jessie",
-    "Lou",
-    "Charlie",
-    "Mr. P",
-    "Emz",
-    "Otis",
-    "Gale",
-    "Sandy",
-    "Gene",
-    "Griff",
-    "Squeak",
-    "Willow",
-    "Penny",
-]
-
-formatted_sniper_names = [
-    "Angelo",
-    "Bea",
-    "Belle",
-    "Bonnie",
-    "Brock",
-    "Janet",
-    "Maisie",
-    "Mandy",
-    "Nani",
-    "Piper",
-]
-
-formatted_thrower_names = [
-    "Barley",
-    "Dynamike",
-    "Grom",
-    "Larry & Lawrie",
-    "Sprout",
-    "Tick",
-]
-
-formatted_assasin_names = [
-    "Buzz",
-    "Cordelius",
-    "Crow",
-    "Edgar",
-    "Fang",
-    "Leon",
-    "Lily",
-    "Melodie",
-    "Mico",
-    "Mortis",
-    "Sam",
-    "Stu",
-]
-
-formatted_tank_names = [
-    "Ash",
-    "Bibi",
-    "Bull",
-    "Buster",
-    "Darryl",
-    "Draco",
-    "El Primo",
-    "Frank",
-    "Hank",
-    "Jacky",
-    "Meg",
-    "Rosa",
-]
-
-formatted_support_names = [
-    "Berry",
-    "Byron",
-    "Doug",
-    "Gray",
-    "Gus",
-    "Kit",
-    "Max",
-    "Pam",
-    "Poco",
-    "Ruffs",
-]
+from battle_aggregator import aggregate_battles, add_chunk_rows_argument, CHUNK_ROWS
+from shared.brawler_registry import REGISTRY
 
 
 def parse_args():
@@ -123,50 +20,28 @@ def parse_args():
         default=None,
         help="Path to the input CSV file. If not provided, the most recent file in the raw_data folder will be used.",
     )
+    add_chunk_rows_argument(parser)
     return parser.parse_args()
 
 
-def generate_brawler_stats(input_file, output_file):
-    damage_dealers = [element.upper() for element in formatted_damage_dealer_names]
-    controllers = [element.upper() for element in formatted_controller_names]
-    snipers = [element.upper() for element in formatted_sniper_names]
-    throwers = [element.upper() for element in formatted_thrower_names]
-    assassins = [element.upper() for element in formatted_assasin_names]
-    tanks = [element.upper() for element in formatted_tank_names]
-    supports = [element.upper() for element in formatted_support_names]
-
-    df = pd.read_csv(input_file)
-    # Convert from wide format to long format
-    win_columns = ["winner_1", "winner_2", "winner_3"]
-    lose_columns = ["loser_1", "loser_2", "loser_3"]
-
-    winners = df.melt(
-        id_vars=["battle_mode", "map_name"],
-        value_vars=win_columns,
-        var_name="win_column",
-        value_name="brawler_id",
-    )
-    winners["win"] = 1
-
-    losers = df.melt(
-        id_vars=["battle_mode", "map_name"],
-        value_vars=lose_columns,
-        var_name="lose_column",
-        value_name="brawler_id",
+def generate_brawler_stats(input_file, output_file, chunk_rows=CHUNK_ROWS):
+    # The battle log is counted chunk by chunk, only the per-brawler counts are kept
+    return generate_brawler_stats_from_counts(
+        aggregate_battles(input_file, chunk_rows), output_file
     )
-    losers["win"] = 0
 
-    df_long = pd.concat([winners, losers])
 
-    # Calculate win rate for each brawler
-    brawler_stats = (
-        df_long.groupby("brawler_id").agg(win_rate=("win", "mean")).reset_index()
-    )
-
-    # Calculate usage rate
-    total_battles = len(df_long)
-    brawler_stats["usage_rate"] = (
-        df_long.groupby("brawler_id")["win"].count().values / total_battles
+def generate_brawler_stats_from_counts(counts, output_file):
+    # Calculate win rate and usage rate for each brawler that was played
+    games = counts.wins + counts.losses
+    played = np.flatnonzero(games > 0)
+    brawler_stats = pd.DataFrame(
+        {
+            "brawler_id": np.array(counts.brawler_names, dtype=object)[played],
+            "win_rate": counts.wins[played] / games[played],
+            "usage_rate": games[played] / counts.slot_count,
+        },
+        index=played,
     )
 
     # Standardize win rate and usage rate
@@ -191,34 +66,13 @@ def generate_brawler_stats(input_file, output_file):
     # Sort by win rate
     brawler_stats = brawler_stats.sort_values("win_rate", ascending=False)
 
-    # Add class column and assign class based on brawler lists
-    brawler_stats["class"] = brawler_stats["brawler_id"].apply(
-        lambda x: (
-            "damage_dealer"
-            if x in damage_dealers
-            else (
-                "controller"
-                if x in controllers
-                else (
-                    "sniper"
-                    if x in snipers
-                    else (
-                        "thrower"
-                        if x in throwers
-                        else (
-                            "assassin"
-                            if x in assassins
-                            else (
-                                "tank"
-                                if x in tanks
-                                else "support" if x in supports else None
-                            )
-                        )
-                    )
-                )
-            )
-        )
-    )
+    # Add class column from the brawler registry. Looked up by name, the counts may come
+    # from another process that interned brawlers this one hasn't seen. New brawlers are
+    # dropped until they get a class there.
+    brawler_stats["class"] = [
+        REGISTRY.class_name(REGISTRY.intern(name))
+        for name in brawler_stats["brawler_id"]
+    ]
 
     # Remove rows where class is None
     brawler_stats = brawler_stats.dropna(subset=["class"])
@@ -237,9 +91,10 @@ def generate_brawler_stats(input_file, output_file):
 
     # Save the resulting DataFrame to a new CSV file
     brawler_stats.to_csv(output_file, index=False)
+    return brawler_stats
 
 
-def main(input_file):
+def main(input_file, chunk_rows=CHUNK_ROWS):
     if not input_file:
         print("Input file was invalid")
         return
@@ -247,7 +102,7 @@ def main(input_file):
         print(f'Input: "{input_file}"')
         output_file = f"output/brawler_data.csv"
         print(f'Output: "{output_file}"')
-        generate_brawler_stats(input_file, output_file)
+        generate_brawler_stats(input_file, output_file, chunk_rows)
 
 
 def find_most_recent_file(directory):
@@ -262,4 +117,4 @@ if __name__ == "__main__":
     print(f"> Executing {os.path.basename(__file__)}")
     args = parse_args()
     input_file = args.input_file or find_most_recent_file("raw_data")
-    main(input_file)
+    main(input_file, args.chunk_rows)
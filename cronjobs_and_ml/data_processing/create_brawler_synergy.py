@@ -4,6 +4,7 @@ import os
 import json
 import glob
 import argparse
+from battle_aggregator import aggregate_battles
 
 
 def parse_args():
@@ -37,108 +38,68 @@ def find_all_brawler_pairs_synergy(
     brawler_data_path="output/brawler_data.csv",
 ):
     output_path = "output/brawler_synergy.json"
-    brawlers = get_all_brawlers(brawler_data_path)
     brawler_winrates = create_brawler_winrate_dict(brawler_data_path)
+    counts = aggregate_battles(input_match_data_csv)
+    find_all_brawler_pairs_synergy_from_counts(counts, brawler_winrates, output_path)
+    print(f'Output:"{output_path}')
+
+
+def find_all_brawler_pairs_synergy_from_counts(counts, brawler_winrates, output_path):
+    # Only brawlers present in brawler data get a synergy entry
+    brawler_index = counts.brawler_index()
+    brawlers = sorted(
+        brawler for brawler in brawler_winrates if brawler in brawler_index
+    )
+    codes = np.array([brawler_index[brawler] for brawler in brawlers], dtype=np.int64)
+    pair_wins = counts.teammate_wins[np.ix_(codes, codes)]
+    pair_losses = counts.teammate_losses[np.ix_(codes, codes)]
+    total_games = pair_wins + pair_losses
+    winrates = np.divide(
+        pair_wins,
+        total_games,
+        out=np.zeros(total_games.shape, dtype=np.float64),
+        where=total_games > 0,
+    )
+    average_winrates = np.array([brawler_winrates[brawler] for brawler in brawlers])
+    synergy_scores = (
+        0.50 + winrates - (average_winrates[:, None] + average_winrates[None, :]) / 2
+    )
 
-    brawler_pairs = {
-        brawler: {
-            inner_s: {"wins": 0, "losses": 0, "winrate": 0, "synergy": 0}
-            for inner_s in brawlers
-            if inner_s != brawler
+    sorted_outer_brawler_pairs = {}
+    for primary_idx, brawler in enumerate(brawlers):
+        # Stable sort keeps ties in alphabetical order
+        order = np.argsort(-winrates[primary_idx], kind="stable")
+        sorted_outer_brawler_pairs[brawler] = {
+            brawlers[secondary_idx]: {
+                "wins": int(pair_wins[primary_idx, secondary_idx]),
+                "losses": int(pair_losses[primary_idx, secondary_idx]),
+                "winrate": round(float(winrates[primary_idx, secondary_idx]), 4),
+                "synergy": round(float(synergy_scores[primary_idx, secondary_idx]), 4),
+            }
+            for secondary_idx in order
+            if secondary_idx != primary_idx
         }
-        for brawler in brawlers
-    }
-
-    df = pd.read_csv(input_match_data_csv)
-    for index, row in df.iterrows():
-        winners = [row["winner_1"], row["winner_2"], row["winner_3"]]
-        losers = [row["loser_1"], row["loser_2"], row["loser_3"]]
-
-        winners = [winner for winner in winners if pd.notna(winner)]
-        losers = [loser for loser in losers if pd.notna(loser)]
-
-        if (
-            len(winners) != 3
-            or len(losers) != 3
-            or len(winners) != len(set(winners))
-            or len(losers) != len(set(losers))
-        ):
-            continue
-
-        for primary_idx in range(3):
-            for secondary_idx in range(3):
-                if primary_idx == secondary_idx:
-                    continue
-                brawler_pairs[winners[primary_idx]][winners[secondary_idx]]["wins"] += 1
-                brawler_pairs[losers[primary_idx]][losers[secondary_idx]]["losses"] += 1
-
-    for brawler, inner_dictionary in brawler_pairs.items():
-        for inner_brawler, stats in inner_dictionary.items():
-            total_games = stats["wins"] + stats["losses"]
-            winrate = (stats["wins"] / total_games) if total_games > 0 else 0
-            brawler_pairs[brawler][inner_brawler]["winrate"] = round(winrate, 4)
-            synergy_score = (
-                0.50
-                + winrate
-                - (brawler_winrates[brawler] + brawler_winrates[inner_brawler]) / 2
-            )
-            brawler_pairs[brawler][inner_brawler]["synergy"] = round(synergy_score, 4)
-
-    sorted_inner_brawler_pairs = {
-        brawler: dict(
-            sorted(
-                inner_dict.items(), key=lambda item: item[1]["winrate"], reverse=True
-            )
-        )
-        for brawler, inner_dict in brawler_pairs.items()
-    }
-    sorted_outer_brawler_pairs = {
-        brawler: sorted_inner_brawler_pairs[brawler]
-        for brawler in sorted(sorted_inner_brawler_pairs.keys())
-    }
 
     with open(output_path, "w") as f:
         json.dump(sorted_outer_brawler_pairs, f, indent=4)
-    print(f'Output:"{output_path}')
 
 
 def find_brawler_pair_synergy(input_csv_path, brawler_1, brawler_2):
-    brawlers = get_all_brawlers()
-    if brawler_1 not in brawlers or brawler_2 not in brawlers:
+    counts = aggregate_battles(input_csv_path)
+    brawler_index = counts.brawler_index()
+    if brawler_1 not in brawler_index or brawler_2 not in brawler_index:
         print("Invalid brawler IDs.")
         return
 
-    df = pd.read_csv(input_csv_path)
-    same_team_count = 0
-    win_count = 0
-    loss_count = 0
-
-    # Process each row in the DataFrame
-    for index, row in df.iterrows():
-        winners = [row["winner_1"], row["winner_2"], row["winner_3"]]
-        losers = [row["loser_1"], row["loser_2"], row["loser_3"]]
-
-        winners = [
-            brawler for brawler in winners if pd.notna(brawler)
-        ]  # Skip rows with NaN values for brawlers
-        losers = [brawler for brawler in losers if pd.notna(brawler)]
-
-        if (
-            brawler_1 in winners and brawler_2 in winners
-        ):  # Check if on same winning team
-            same_team_count += 1
-            win_count += 1
-
-        if brawler_1 in losers and brawler_2 in losers:  # Check if on same losing team
-            same_team_count += 1
-            loss_count += 1
+    first, second = brawler_index[brawler_1], brawler_index[brawler_2]
+    win_count = counts.teammate_wins[first, second]
+    loss_count = counts.teammate_losses[first, second]
+    same_team_count = win_count + loss_count
 
     if same_team_count > 0:
         win_rate = (win_count / same_team_count) * 100
-        lose_rate = (loss_count / same_team_count) * 100
     else:
         win_rate = 0
-        lose_rate = 0
 
     return win_rate
 
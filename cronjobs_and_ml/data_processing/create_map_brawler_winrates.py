@@ -1,9 +1,9 @@
-import pandas as pd
+import numpy as np
 import json
-from collections import defaultdict
 import os
 import glob
 import argparse
+from battle_aggregator import aggregate_battles
 
 """
 Map Brawler Winrates - {Map Name: [{Brawler: Winrate, Ranking}, ...], ...}
@@ -34,51 +34,33 @@ def find_most_recent_file(directory):
 
 
 def process_map_brawler_data(input_csv_path, output_json_path):
-    # Load the CSV file into a DataFrame
-    df = pd.read_csv(input_csv_path)
+    process_map_brawler_counts(aggregate_battles(input_csv_path), output_json_path)
 
-    # Initialize dictionaries to store data
-    map_brawler_stats = defaultdict(
-        lambda: defaultdict(lambda: {"wins": 0, "losses": 0})
-    )
-
-    # Process each row in the DataFrame
-    for index, row in df.iterrows():
-        map_name = row["map_name"]
-
-        winners = [row["winner_1"], row["winner_2"], row["winner_3"]]
-        losers = [row["loser_1"], row["loser_2"], row["loser_3"]]
-
-        # Skip rows with NaN values for brawlers
-        winners = [brawler for brawler in winners if pd.notna(brawler)]
-        losers = [brawler for brawler in losers if pd.notna(brawler)]
 
-        for brawler in winners:
-            map_brawler_stats[map_name][brawler]["wins"] += 1
-
-        for brawler in losers:
-            map_brawler_stats[map_name][brawler]["losses"] += 1
-
-    # Calculate win rates and prepare data for JSON
-    map_brawler_winrates = defaultdict(list)
-
-    for map_name, brawlers in map_brawler_stats.items():
-        for brawler, stats in brawlers.items():
-            total_games = stats["wins"] + stats["losses"]
-            winrate = (stats["wins"] / total_games) * 100 if total_games > 0 else 0
-            map_brawler_winrates[map_name].append(
-                {
-                    "brawler": brawler,
-                    "winrate": winrate,
-                    "ranking": None,  # Placeholder for ranking
-                }
-            )
+def process_map_brawler_counts(counts, output_json_path):
+    total_games = counts.map_wins + counts.map_losses
+    winrates = 100 * np.divide(
+        counts.map_wins,
+        total_games,
+        out=np.zeros(total_games.shape, dtype=np.float64),
+        where=total_games > 0,
+    )
 
     # Rank brawlers by winrate on each map
-    for map_name, brawlers in map_brawler_winrates.items():
-        brawlers.sort(key=lambda x: x["winrate"], reverse=True)
-        for rank, brawler in enumerate(brawlers, start=1):
-            brawler["ranking"] = rank
+    map_brawler_winrates = {}
+    for map_idx, map_name in enumerate(counts.map_names):
+        order = np.argsort(-winrates[map_idx], kind="stable")
+        order = order[total_games[map_idx, order] > 0]
+        if len(order) == 0:
+            continue
+        map_brawler_winrates[map_name] = [
+            {
+                "brawler": counts.brawler_names[brawler_idx],
+                "winrate": float(winrates[map_idx, brawler_idx]),
+                "ranking": rank,
+            }
+            for rank, brawler_idx in enumerate(order, start=1)
+        ]
 
     # Convert the dictionary to JSON and save to file
     with open(output_json_path, "w") as f:
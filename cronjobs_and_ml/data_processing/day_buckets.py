@@ -0,0 +1,316 @@
+import os
+import sys
+import glob
+import json
+import time
+import argparse
+from datetime import date, datetime, timedelta, timezone
+from battle_aggregator import (
+    BATTLE_COLUMNS,
+    CHUNK_ROWS,
+    TIME_COLUMN,
+    add_chunk_rows_argument,
+    count_battles_by_day,
+    read_new_battle_chunks,
+    write_outputs,
+)
+from count_snapshots import load_counts, save_counts
+from format_brawler_data import format_brawler_stats
+from publish_outputs import WINDOW_DAYS, window_output_dir
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically, write_json
+
+"""
+Day Buckets - count tables of each UTC day, and of the last 1/7/14/30 days
+    Battles are counted into one bucket per day of their battle time. The totals of
+    each time window are kept next to the buckets and slid forward when new days come
+    in: the buckets of the days that entered the window are added and the ones of the
+    days that left it are subtracted. A run reads the new battles and a few buckets,
+    never the battles already counted, and writes the stats outputs of every window.
+
+Layout, in the bucket directory:
+    index.json: {generation, updated_at, end_day, watermark, file_sizes,
+        days: {day: {file, battle_count}},
+        windows: {window days: {file, end_day, battle_count}}}
+    day-<day>-<generation>.npz, window-<days>d-<generation>.npz: count tables in the
+        format of count_snapshots.py
+
+Windows end on the latest day with battles. Files are written under a new generation
+and the index is replaced last, so a run that stops halfway leaves the previous index
+and its files as they were.
+"""
+
+DEFAULT_BUCKET_DIR = "output/day_buckets"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Count new battles into per-day buckets and write the stats outputs of the last 1, 7, 14 and 30 days."
+    )
+    parser.add_argument(
+        "battle_logs",
+        type=str,
+        nargs="*",
+        help="Battle log CSVs or Parquet/Arrow directories with a battle_time column, battles of logs without one are skipped. Battles already counted are skipped.",
+    )
+    parser.add_argument(
+        "--bucket-dir",
+        type=str,
+        default=DEFAULT_BUCKET_DIR,
+        help=f"Directory of the day buckets. Default is '{DEFAULT_BUCKET_DIR}'.",
+    )
+    parser.add_argument(
+        "--windows",
+        type=str,
+        default=",".join(str(days) for days in WINDOW_DAYS),
+        help="Comma-separated window lengths in days. Default is '1,7,14,30'.",
+    )
+    add_chunk_rows_argument(parser)
+    return parser.parse_args()
+
+
+def day_offset(day, days):
+    return (date.fromisoformat(day) + timedelta(days=days)).isoformat()
+
+
+def in_window(day, end_day, days):
+    # The window of `days` days ending on end_day, end_day included
+    return day_offset(end_day, -days) < day <= end_day
+
+
+class DayBuckets:
+    """
+    Args:
+    bucket_dir (str): directory of index.json and the count files
+    """
+
+    def __init__(self, bucket_dir):
+        self.bucket_dir = bucket_dir
+        self.index_path = os.path.join(bucket_dir, "index.json")
+        self.index = self.read_index()
+        self.loaded = {}
+
+    def read_index(self):
+        if not os.path.exists(self.index_path):
+            return {
+                "generation": 0,
+                "end_day": None,
+                "watermark": {},
+                "file_sizes": {},
+                "days": {},
+                "windows": {},
+            }
+        with open(self.index_path) as f:
+            return json.load(f)
+
+    def load(self, file_name):
+        # Buckets are read at most once per run, sliding several windows reuses them
+        if file_name not in self.loaded:
+            self.loaded[file_name] = load_counts(
+                os.path.join(self.bucket_dir, file_name)
+            )
+        return self.loaded[file_name]
+
+    def bucket(self, day):
+        """
+        Returns:
+        BattleCounts: the day's bucket as of the current index, None without battles
+        """
+        entry = self.index["days"].get(day)
+        return self.load(entry["file"]) if entry else None
+
+    def window(self, days):
+        """
+        Returns:
+        tuple: (BattleCounts, end day) of the stored window, (None, None) without one
+        """
+        entry = self.index["windows"].get(str(days))
+        if entry is None:
+            return None, None
+        return self.load(entry["file"]), entry["end_day"]
+
+    def write_index(self, index):
+        replace_atomically(lambda path: write_json(index, path), self.index_path)
+        self.index = index
+        # Files of older generations are not referenced anymore
+        referenced = {entry["file"] for entry in index["days"].values()}
+        referenced |= {entry["file"] for entry in index["windows"].values()}
+        for path in glob.glob(os.path.join(self.bucket_dir, "*.npz")):
+            if os.path.basename(path) not in referenced:
+                os.remove(path)
+
+
+def count_new_battles_by_day(battle_logs, watermark, file_sizes, chunk_rows):
+    """
+    Returns:
+    tuple: (dict of day -> BattleCounts of the new battles, dict of battles read per
+        file, number of new battles without a battle time)
+    """
+    deltas = {}
+    read_rows = {}
+    undated = 0
+    for path, battles in read_new_battle_chunks(
+        battle_logs,
+        chunk_rows,
+        watermark,
+        file_sizes,
+        columns=BATTLE_COLUMNS,
+        # Battle logs crawled before battle times were written count as undated
+        optional_columns=[TIME_COLUMN],
+    ):
+        day_counts = count_battles_by_day(battles)
+        for day, counts in day_counts.items():
+            deltas[day] = deltas[day].merge(counts) if day in deltas else counts
+        read_rows[path] = read_rows.get(path, 0) + len(battles)
+        undated += len(battles) - sum(c.battle_count for c in day_counts.values())
+    return deltas, read_rows, undated
+
+
+def slide_window(buckets, days, end_day, deltas):
+    """
+    Moves a stored window to end_day. With W the stored window ending on E, B the
+    buckets before this run and D the counts of this run's new battles, the window
+    ending on end_day is
+        W + B(days that entered it) - B(days that left it) + D(days in it)
+
+    Returns:
+    BattleCounts: counts of the window ending on end_day, None without any battles
+    """
+    window, window_end = buckets.window(days)
+    if window is not None:
+        for day in buckets.index["days"]:
+            entered = in_window(day, end_day, days) and not in_window(
+                day, window_end, days
+            )
+            left = in_window(day, window_end, days) and not in_window(
+                day, end_day, days
+            )
+            if entered:
+                window = window.merge(buckets.bucket(day))
+            elif left:
+                window = window.subtract(buckets.bucket(day))
+    else:
+        # No stored window of this length yet, it is the sum of its buckets
+        for day in buckets.index["days"]:
+            if in_window(day, end_day, days):
+                bucket = buckets.bucket(day)
+                window = bucket if window is None else window.merge(bucket)
+    for day, delta in deltas.items():
+        if in_window(day, end_day, days):
+            window = delta if window is None else window.merge(delta)
+    return window
+
+
+def update_day_buckets(
+    battle_logs, buckets, window_days=WINDOW_DAYS, chunk_rows=CHUNK_ROWS
+):
+    """
+    Adds the battles past the watermark to their day buckets and slides the windows to
+    the latest day.
+
+    Returns:
+    tuple: (dict of window days -> BattleCounts, end day, number of new battles)
+    """
+    index = buckets.index
+    watermark = dict(index["watermark"])
+    file_sizes = dict(index["file_sizes"])
+    deltas, read_rows, undated = count_new_battles_by_day(
+        battle_logs, watermark, file_sizes, chunk_rows
+    )
+    if undated:
+        print(f"Skipped {undated} battles without a battle time")
+    if not deltas and not index["days"]:
+        raise ValueError(f"No battles with a battle time in {battle_logs}")
+    new_battles = sum(delta.battle_count for delta in deltas.values())
+    stored = all(
+        index["windows"].get(str(days), {}).get("end_day") == index["end_day"]
+        for days in window_days
+    )
+    if not deltas and stored:
+        windows = {days: buckets.window(days)[0] for days in window_days}
+        return windows, index["end_day"], 0
+
+    generation = index["generation"] + 1
+    end_day = max([*index["days"], *deltas])
+    os.makedirs(buckets.bucket_dir, exist_ok=True)
+    new_index = {
+        "generation": generation,
+        "updated_at": datetime.now(timezone.utc).isoformat(),
+        "end_day": end_day,
+        "watermark": watermark,
+        "file_sizes": file_sizes,
+        "days": dict(index["days"]),
+        "windows": {},
+    }
+    for path, rows in read_rows.items():
+        watermark[path] = watermark.get(path, 0) + rows
+
+    # Windows first, sliding them needs the buckets as they were before this run
+    windows = {}
+    for days in window_days:
+        window = slide_window(buckets, days, end_day, deltas)
+        windows[days] = window
+        if window is None:
+            continue
+        file_name = f"window-{days}d-{generation:04d}.npz"
+        save_counts(window, os.path.join(buckets.bucket_dir, file_name))
+        new_index["windows"][str(days)] = {
+            "file": file_name,
+            "end_day": end_day,
+            "battle_count": window.battle_count,
+        }
+    for day, delta in deltas.items():
+        bucket = buckets.bucket(day)
+        bucket = delta if bucket is None else bucket.merge(delta)
+        file_name = f"day-{day}-{generation:04d}.npz"
+        save_counts(bucket, os.path.join(buckets.bucket_dir, file_name))
+        new_index["days"][day] = {
+            "file": file_name,
+            "battle_count": bucket.battle_count,
+        }
+    buckets.write_index(new_index)
+    return windows, end_day, new_battles
+
+
+def write_window_outputs(windows):
+    # Same files as the pipeline outputs, in output/windows/<days>d/
+    for days, counts in windows.items():
+        if counts is None:
+            continue
+        print(f"Last {days} days: {counts.battle_count} battles")
+        output_dir = window_output_dir(days)
+        brawler_stats = write_outputs(counts, output_dir)
+        format_brawler_stats(
+            brawler_stats, os.path.join(output_dir, "brawler_data_formatted.csv")
+        )
+
+
+def update_time_windows(
+    battle_logs,
+    bucket_dir=DEFAULT_BUCKET_DIR,
+    window_days=WINDOW_DAYS,
+    chunk_rows=CHUNK_ROWS,
+):
+    start_time = time.time()
+    windows, end_day, new_battles = update_day_buckets(
+        battle_logs, DayBuckets(bucket_dir), window_days, chunk_rows
+    )
+    print(
+        f"{new_battles} new battles, windows ending on {end_day} "
+        f"({time.time() - start_time:.2f} s)"
+    )
+    write_window_outputs(windows)
+    return windows
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    print(f"Input: {args.battle_logs}")
+    update_time_windows(
+        args.battle_logs,
+        args.bucket_dir,
+        [int(days) for days in args.windows.split(",")],
+        args.chunk_rows,
+    )
@@ -1,93 +1,10 @@
 import csv
 import argparse
 import os
+import sys
 
-# Define brawler categories
-formatted_brawlers = [
-    "8-Bit",
-    "Carl",
-    "Chester",
-    "Chuck",
-    "Clancy",
-    "Colette",
-    "Colt",
-    "Eve",
-    "Lola",
-    "Nita",
-    "Pearl",
-    "R-T",
-    "Rico",
-    "Shelly",
-    "Spike",
-    "Surge",
-    "Tara",
-    "Amber",
-    "Bo",
-    "Jessie",
-    "Lou",
-    "Charlie",
-    "Mr. P",
-    "Emz",
-    "Otis",
-    "Gale",
-    "Sandy",
-    "Gene",
-    "Griff",
-    "Squeak",
-    "Willow",
-    "Penny",
-    "Angelo",
-    "Bea",
-    "Belle",
-    "Bonnie",
-    "Brock",
-    "Janet",
-    "Maisie",
-    "Mandy",
-    "Nani",
-    "Piper",
-    "Barley",
-    "Dynamike",
-    "Grom",
-    "Larry & Lawrie",
-    "Sprout",
-    "Tick",
-    "Buzz",
-    "Cordelius",
-    "Crow",
-    "Edgar",
-    "Fang",
-    "Leon",
-    "Lily",
-    "Melodie",
-    "Mico",
-    "Mortis",
-    "Sam",
-    "Stu",
-    "Ash",
-    "Bibi",
-    "Bull",
-    "Buster",
-    "Darryl",
-    "Draco",
-    "El Primo",
-    "Frank",
-    "Hank",
-    "Jacky",
-    "Meg",
-    "Rosa",
-    "Berry",
-    "Byron",
-    "Doug",
-    "Gray",
-    "Gus",
-    "Kit",
-    "Max",
-    "Pam",
-    "Poco",
-    "Ruffs",
-]
-lowercase_brawlers = {brawler.lower(): brawler for brawler in formatted_brawlers}
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.brawler_registry import REGISTRY
 
 
 def parse_args():
@@ -102,6 +19,14 @@ def parse_args():
     return parser.parse_args()
 
 
+def format_brawler_id(original_brawler_id):
+    brawler_id = REGISTRY.id(original_brawler_id)
+    if brawler_id is None:
+        print(f"Unknown brawler: {original_brawler_id.lower()}")
+        return original_brawler_id
+    return REGISTRY.display_names[brawler_id]
+
+
 def process_csv(input_file, output_file):
     with open(input_file, "r") as infile, open(output_file, "w", newline="") as outfile:
         reader = csv.DictReader(infile)
@@ -110,21 +35,22 @@ def process_csv(input_file, output_file):
 
         writer.writeheader()
         for row in reader:
-            brawler_id = row["brawler_id"].lower()
-            if brawler_id in lowercase_brawlers:
-                if brawler_id == "8-bit":
-                    row["brawler_id"] = "8-Bit"
-                elif brawler_id == "r-t":
-                    row["brawler_id"] = "R-T"
-                elif brawler_id == "larry & lawrie":
-                    row["brawler_id"] = "Larry & Lawrie"
-                else:
-                    row["brawler_id"] = brawler_id[0].upper() + brawler_id[1:]
-            else:
-                print(f"Unknown brawler: {brawler_id}")
+            row["brawler_id"] = format_brawler_id(row["brawler_id"])
             writer.writerow(row)
 
 
+def format_brawler_stats(brawler_stats, output_file):
+    """
+    Same as process_csv for brawler stats already in memory, e.g. from
+    create_brawler_data.generate_brawler_stats_from_counts.
+    """
+    formatted = brawler_stats.copy()
+    formatted["brawler_id"] = formatted["brawler_id"].map(format_brawler_id)
+    # Same line endings as the csv module writes in process_csv
+    formatted.to_csv(output_file, index=False, lineterminator="\r\n")
+    return formatted
+
+
 if __name__ == "__main__":
     print(f"> Executing {os.path.basename(__file__)}")
     args = parse_args()
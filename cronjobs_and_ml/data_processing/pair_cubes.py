@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+import numpy as np
+from battle_aggregator import (
+    BATTLE_COLUMNS,
+    CHUNK_ROWS,
+    add_chunk_rows_argument,
+    empty_battles,
+    find_most_recent_file,
+    full_team_mask,
+    read_battle_chunks,
+    read_battles,
+    team_codes,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically
+from shared.brawler_registry import REGISTRY
+
+"""
+Pair Cubes - teammate and matchup counts of every brawler pair on each map and in each mode
+    The counts are dense cubes indexed by (map or mode, table, brawler, brawler) with the
+    registry's brawler ids. A chunk of battles is counted in one vectorized pass, a
+    bincount of the flattened cube indexes of each pair position of its teams, and the
+    cubes are written as .npy arrays the backend memory-maps, so a per-map synergy or
+    counter query reads a slice of the cube instead of parsing a nested JSON object.
+
+Layout, in the output directory:
+    pair_cubes.json: format, battle count, brawlers, maps, modes and table names
+    map_pair_cubes.npy: uint32 [map, table, brawler, brawler], uint64 if a count
+        doesn't fit
+    mode_pair_cubes.npy: same for [mode, table, brawler, brawler]
+    Tables are CUBE_TABLES, with the meaning of the BattleCounts tables of the same name.
+"""
+
+CUBE_FORMAT = 1
+CUBE_TABLES = ["teammate_wins", "teammate_losses", "opponent_wins"]
+DEFAULT_OUTPUT_DIR = "output/pair_cubes"
+META_FILE = "pair_cubes.json"
+MAP_CUBES_FILE = "map_pair_cubes.npy"
+MODE_CUBES_FILE = "mode_pair_cubes.npy"
+
+# Ordered teammate pairs of a team of three and every winner-loser pair of a battle,
+# as column indexes into the battles x 3 team arrays
+TEAMMATE_PAIRS = ([0, 0, 1, 1, 2, 2], [1, 2, 0, 2, 0, 1])
+OPPONENT_PAIRS = ([0, 0, 0, 1, 1, 1, 2, 2, 2], [0, 1, 2, 0, 1, 2, 0, 1, 2])
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Count brawler pair synergies and matchups per map and per mode into memory-mappable cubes."
+    )
+    parser.add_argument(
+        "input_file",
+        type=str,
+        nargs="?",
+        default=None,
+        help="Path to the input match data CSV file or Parquet/Arrow directory. If not provided, the most recent one in the raw_data folder will be used.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=DEFAULT_OUTPUT_DIR,
+        help=f"Output directory. Default is '{DEFAULT_OUTPUT_DIR}'.",
+    )
+    add_chunk_rows_argument(parser)
+    return parser.parse_args()
+
+
+class PairCubes:
+    """
+    Pair count cubes of one battle log.
+
+    Attributes:
+    brawler_names (list): brawler name for each brawler code, the registry's names
+    map_names (list): map name for each map code
+    mode_names (list): battle mode name for each mode code
+    battle_count (int): number of battles read
+    map_cubes (ndarray[map, table, brawler, brawler]): CUBE_TABLES on each map
+    mode_cubes (ndarray[mode, table, brawler, brawler]): CUBE_TABLES in each mode
+    """
+
+    def __init__(self, brawler_names, map_names, mode_names):
+        shape = (len(CUBE_TABLES), len(brawler_names), len(brawler_names))
+        self.brawler_names = list(brawler_names)
+        self.map_names = list(map_names)
+        self.mode_names = list(mode_names)
+        self.battle_count = 0
+        self.map_cubes = np.zeros((len(map_names), *shape), dtype=np.int64)
+        self.mode_cubes = np.zeros((len(mode_names), *shape), dtype=np.int64)
+
+    def merge(self, other):
+        """
+        Adds up the cubes of two battle logs, see BattleCounts.merge.
+
+        Returns:
+        PairCubes: new cubes with the summed counts
+        """
+        brawler_names = max(self.brawler_names, other.brawler_names, key=len)
+        map_names = sorted(set(self.map_names) | set(other.map_names))
+        mode_names = sorted(set(self.mode_names) | set(other.mode_names))
+        merged = PairCubes(brawler_names, map_names, mode_names)
+        map_codes = {name: code for code, name in enumerate(map_names)}
+        mode_codes = {name: code for code, name in enumerate(mode_names)}
+        for cubes in (self, other):
+            n = len(cubes.brawler_names)
+            map_rows = [map_codes[name] for name in cubes.map_names]
+            mode_rows = [mode_codes[name] for name in cubes.mode_names]
+            merged.battle_count += cubes.battle_count
+            merged.map_cubes[map_rows, :, :n, :n] += cubes.map_cubes
+            merged.mode_cubes[mode_rows, :, :n, :n] += cubes.mode_cubes
+        return merged
+
+
+def cube_counts(groups, num_groups, left, right, pairs, size):
+    """
+    Counts how often each (group, left brawler, right brawler) triple occurs, skipping
+    triples with a missing code.
+
+    Args:
+    groups (ndarray[battle]): map or mode code of each battle
+    left, right (ndarray[battle, 3]): brawler codes of the two sides of the pairs
+    pairs (tuple): (left columns, right columns) of the pairs of a battle
+    size (int): number of brawlers
+
+    Returns:
+    ndarray: num_groups x size x size cube of pair counts
+    """
+    counts = np.zeros(num_groups * size * size, dtype=np.int64)
+    # One pair column at a time, a chunk's flattened indexes of every pair at once
+    # would take several times the memory of its battles
+    group_offsets = groups.astype(np.int64) * size
+    for left_idx, right_idx in zip(*pairs):
+        mask = (groups >= 0) & (left[:, left_idx] >= 0) & (right[:, right_idx] >= 0)
+        flat = (group_offsets[mask] + left[mask, left_idx]) * size + right[
+            mask, right_idx
+        ]
+        counts += np.bincount(flat, minlength=len(counts))
+    return counts.reshape(num_groups, size, size)
+
+
+def group_cubes(groups, num_groups, winners, losers, full_teams, size):
+    """
+    Returns:
+    ndarray: num_groups x CUBE_TABLES x size x size counts of the battles of each group
+    """
+    # Like the global teammate tables, teammate pairs only count full teams of three
+    # distinct brawlers
+    full_groups = groups[full_teams]
+    full_winners, full_losers = winners[full_teams], losers[full_teams]
+    return np.stack(
+        [
+            cube_counts(
+                full_groups,
+                num_groups,
+                full_winners,
+                full_winners,
+                TEAMMATE_PAIRS,
+                size,
+            ),
+            cube_counts(
+                full_groups, num_groups, full_losers, full_losers, TEAMMATE_PAIRS, size
+            ),
+            cube_counts(groups, num_groups, winners, losers, OPPONENT_PAIRS, size),
+        ],
+        axis=1,
+    )
+
+
+def count_pair_cubes(df):
+    winners, losers = team_codes(df)
+    full_teams = full_team_mask(winners, losers)
+    map_names = list(df["map_name"].cat.categories)
+    mode_names = list(df["battle_mode"].cat.categories)
+    # Read after team_codes, which interns the brawlers the registry doesn't know yet
+    size = len(REGISTRY)
+    maps = df["map_name"].cat.codes.to_numpy()
+    modes = df["battle_mode"].cat.codes.to_numpy()
+
+    cubes = PairCubes(REGISTRY.names, map_names, mode_names)
+    cubes.battle_count = len(df)
+    cubes.map_cubes = group_cubes(
+        maps, len(map_names), winners, losers, full_teams, size
+    )
+    cubes.mode_cubes = group_cubes(
+        modes, len(mode_names), winners, losers, full_teams, size
+    )
+    return cubes
+
+
+def aggregate_pair_cubes(input_file, chunk_rows=CHUNK_ROWS):
+    """
+    Reads a battle log once and counts its pair cubes, chunk_rows battles at a time.
+
+    Returns:
+    PairCubes: the filled cubes
+    """
+    if not chunk_rows:
+        return count_pair_cubes(read_battles(input_file))
+    cubes = None
+    for battles in read_battle_chunks(input_file, chunk_rows):
+        chunk_cubes = count_pair_cubes(battles)
+        cubes = chunk_cubes if cubes is None else cubes.merge(chunk_cubes)
+    return (
+        cubes if cubes is not None else count_pair_cubes(empty_battles(BATTLE_COLUMNS))
+    )
+
+
+def cube_dtype(cubes):
+    # Counts fit in 32 bits unless a single pair has played billions of games
+    largest = max(
+        int(cubes.map_cubes.max(initial=0)), int(cubes.mode_cubes.max(initial=0))
+    )
+    return np.uint32 if largest <= np.iinfo(np.uint32).max else np.uint64
+
+
+def write_pair_cubes(cubes, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Writes the cubes and their pair_cubes.json, see the layout above.
+
+    Returns:
+    dict: the written pair_cubes.json
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    dtype = cube_dtype(cubes)
+    for file_name, array in (
+        (MAP_CUBES_FILE, cubes.map_cubes),
+        (MODE_CUBES_FILE, cubes.mode_cubes),
+    ):
+
+        def write(temp_path, array=array):
+            # A file object, np.save would append .npy to the temporary path
+            with open(temp_path, "wb") as f:
+                np.save(f, array.astype(dtype))
+
+        replace_atomically(write, os.path.join(output_dir, file_name))
+
+    meta = {
+        "format": CUBE_FORMAT,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "battle_count": cubes.battle_count,
+        "tables": CUBE_TABLES,
+        "brawlers": cubes.brawler_names,
+        "maps": cubes.map_names,
+        "modes": cubes.mode_names,
+    }
+
+    def write_meta(temp_path):
+        with open(temp_path, "w") as f:
+            json.dump(meta, f, indent=2)
+
+    # Written last, the arrays of a pair_cubes.json are always complete
+    replace_atomically(write_meta, os.path.join(output_dir, META_FILE))
+    return meta
+
+
+def create_pair_cubes(input_file, output_dir=DEFAULT_OUTPUT_DIR, chunk_rows=CHUNK_ROWS):
+    cubes = aggregate_pair_cubes(input_file, chunk_rows)
+    return write_pair_cubes(cubes, output_dir)
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    input_file = args.input_file or find_most_recent_file("raw_data")
+    if not input_file:
+        print("Invalid input file")
+    else:
+        print(f'Input: "{input_file}"')
+        start_time = time.time()
+        meta = create_pair_cubes(input_file, args.output, args.chunk_rows)
+        print(
+            f"Counted {meta['battle_count']} battles on {len(meta['maps'])} maps and "
+            f"{len(meta['modes'])} modes in {time.time() - start_time:.2f} seconds"
+        )
+        print(f'Output: "{args.output}"')
@@ -1,71 +1,145 @@
-import subprocess
 import os
 import sys
-import re
-
-
-def run_subprocess(script, *args):
-    result = subprocess.run(
-        [sys.executable, script] + list(args),
-        capture_output=True,
-        text=True,
-    )
-    print(result.stdout)
-    print(result.stderr, file=sys.stderr)
-    if result.returncode != 0:
-        print(f"Error running {script}: {result.stderr}")
-        sys.exit(1)
-    return result
-
-
-def main(num_battles=1000, player_tag="#PLYYP2RRQ"):
-    fetch_data_script = "data_fetching/get_battle_logs.py"
-    result = run_subprocess(fetch_data_script, player_tag, str(num_battles))
-
-    match = re.search(r'Output: "(.*?)"', result.stdout)
-    if match:
-        match_data_file = match.group(1)
-        stats_scripts = [
-            "create_brawler_synergy.py",
-            "create_brawler_counters.py",
-            "create_map_brawler_winrates.py",
-        ]
-
-        # Run create_brawler_data.py
-        relative_path = "data_processing/" + "create_brawler_data.py"
-        result = run_subprocess(relative_path, match_data_file)
-
-        match = re.search(r'Output: "(.*?)"', result.stdout)
-        if match:
-            brawler_data_file = match.group(1)
-
-            # Run format_brawler_data.py
-            relative_path = "data_processing/" + "format_brawler_data.py"
-            result = run_subprocess(relative_path, brawler_data_file)
-
-            match = re.search(r'Output: "(.*?)"', result.stdout)
-            if match:
-                formatted_brawler_data_file = match.group(1)
-
-                # Run stats scripts with the formatted brawler data file
-                for script in stats_scripts:
-                    relative_path = "data_processing/" + script
-                    run_subprocess(relative_path, match_data_file)
-            else:
-                print(
-                    "Could not find the output file in the script output of format_brawler_data.py."
-                )
-                sys.exit(1)
-        else:
-            print(
-                "Could not find the output file in the script output of create_brawler_data.py."
-            )
-            sys.exit(1)
-    else:
-        print(
-            "Could not find the output file in the script output of get_battle_logs.py."
+import time
+import asyncio
+from stage_graph import Stage, run_stage_graph, format_stage_report
+from battle_aggregator import aggregate_battles
+from create_brawler_data import generate_brawler_stats_from_counts
+from create_brawler_synergy import find_all_brawler_pairs_synergy_from_counts
+from create_brawler_counters import process_brawler_counts
+from create_map_brawler_winrates import process_map_brawler_counts
+from format_brawler_data import format_brawler_stats
+from day_buckets import update_time_windows
+from pair_cubes import META_FILE, create_pair_cubes
+from team_trios import create_team_trios
+from publish_outputs import publish_outputs, default_publish_dir
+
+sys.path.insert(
+    0,
+    os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data_fetching"
+    ),
+)
+
+BRAWLER_DATA_FILE = "output/brawler_data.csv"
+BRAWLER_DATA_FORMATTED_FILE = "output/brawler_data_formatted.csv"
+BRAWLER_SYNERGY_FILE = "output/brawler_synergy.json"
+BRAWLER_COUNTERS_FILE = "output/brawler_counters.json"
+BRAWLER_MAP_WINRATES_FILE = "output/brawler_map_winrates.json"
+PAIR_CUBES_DIR = "output/pair_cubes"
+TEAM_TRIOS_FILE = "output/team_trios.json"
+
+
+def crawl_battle_logs(player_tag, num_battles):
+    # Imported in the worker, the crawler checks for an API key on import
+    import get_battle_logs
+
+    # Incremental crawls only fetch battles newer than the previous runs' watermarks
+    crawl_options = {
+        "incremental": get_battle_logs.DEFAULT_WATERMARK_FILE,
+        "min_expected_battles": 1.0,
+        "max_frontier": 100000,
+    }
+    if len(get_battle_logs.API_KEYS) > 1:
+        return get_battle_logs.run_sharded(
+            player_tag, num_battles, get_battle_logs.API_KEYS, crawl_options
         )
-        sys.exit(1)
+    return asyncio.run(get_battle_logs.main(player_tag, num_battles, **crawl_options))
+
+
+def create_brawler_synergy(counts, brawler_stats, output_path):
+    brawler_winrates = dict(zip(brawler_stats["brawler_id"], brawler_stats["win_rate"]))
+    find_all_brawler_pairs_synergy_from_counts(counts, brawler_winrates, output_path)
+
+
+def create_time_windows(battle_log):
+    # The day buckets keep the battles of earlier crawls, only this crawl's are counted
+    try:
+        update_time_windows([battle_log])
+    except ValueError as e:
+        print(f"Skipping time windows: {e}")
+
+
+def pipeline_stages(num_battles, player_tag):
+    # The stats stages only depend on the aggregated counts, so they run in parallel
+    return [
+        Stage("crawl", crawl_battle_logs, args=(player_tag, num_battles)),
+        Stage("aggregate", aggregate_battles, inputs=["crawl"]),
+        Stage(
+            "brawler_data",
+            generate_brawler_stats_from_counts,
+            inputs=["aggregate"],
+            args=(BRAWLER_DATA_FILE,),
+            outputs=[BRAWLER_DATA_FILE],
+        ),
+        Stage(
+            "counters",
+            process_brawler_counts,
+            inputs=["aggregate"],
+            args=(BRAWLER_COUNTERS_FILE,),
+            outputs=[BRAWLER_COUNTERS_FILE],
+        ),
+        Stage(
+            "map_winrates",
+            process_map_brawler_counts,
+            inputs=["aggregate"],
+            args=(BRAWLER_MAP_WINRATES_FILE,),
+            outputs=[BRAWLER_MAP_WINRATES_FILE],
+        ),
+        Stage(
+            "synergy",
+            create_brawler_synergy,
+            inputs=["aggregate", "brawler_data"],
+            args=(BRAWLER_SYNERGY_FILE,),
+            outputs=[BRAWLER_SYNERGY_FILE],
+        ),
+        Stage(
+            "format_brawler_data",
+            format_brawler_stats,
+            inputs=["brawler_data"],
+            args=(BRAWLER_DATA_FORMATTED_FILE,),
+            outputs=[BRAWLER_DATA_FORMATTED_FILE],
+        ),
+        Stage("time_windows", create_time_windows, inputs=["crawl"]),
+        Stage(
+            "pair_cubes",
+            create_pair_cubes,
+            inputs=["crawl"],
+            args=(PAIR_CUBES_DIR,),
+            outputs=[os.path.join(PAIR_CUBES_DIR, META_FILE)],
+        ),
+        Stage(
+            "team_trios",
+            create_team_trios,
+            inputs=["crawl"],
+            args=(TEAM_TRIOS_FILE,),
+            outputs=[TEAM_TRIOS_FILE],
+        ),
+        # Runs last so the backend picks up the outputs of one run as a single version
+        Stage(
+            "publish",
+            publish_outputs,
+            args=(default_publish_dir(),),
+            after=[
+                "counters",
+                "map_winrates",
+                "synergy",
+                "format_brawler_data",
+                "time_windows",
+                "pair_cubes",
+                "team_trios",
+            ],
+        ),
+    ]
+
+
+def main(num_battles=1000, player_tag="#PLYYP2RRQ", max_workers=None):
+    start_time = time.perf_counter()
+    results = run_stage_graph(pipeline_stages(num_battles, player_tag), max_workers)
+    print(format_stage_report(results, time.perf_counter() - start_time))
+    print(f'Input: "{results["crawl"].value}"')
+    print(f'Output: "{BRAWLER_DATA_FORMATTED_FILE}"')
+    return results
 
 
 if __name__ == "__main__":
@@ -81,5 +155,5 @@ if __name__ == "__main__":
         player_tag = sys.argv[2]
         print(f'num_battles: "{num_battles}", player_tag: "{player_tag}"')
         main(num_battles, player_tag)
- 
- # Usage: venv/bin/python pipeline.py 200 "#PLYYP2RRQ"
\ No newline at end of file
+
+# Usage: venv/bin/python pipeline.py 200 "#PLYYP2RRQ"
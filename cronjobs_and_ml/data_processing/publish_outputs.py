@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+import argparse
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically
+
+"""
+Publish Outputs - hands the pipeline outputs to the backend as one consistent version
+    Every file is copied next to its destination and renamed into place, then a
+    manifest.json with the version and each file's sha256 is renamed into place last.
+    The backend only loads a version once every file matches the manifest, so it never
+    serves a half-written file or a mix of two pipeline runs.
+"""
+
+MANIFEST_FILE = "manifest.json"
+
+# Published name -> pipeline output
+PUBLISHED_FILES = {
+    "brawler_data.csv": "output/brawler_data_formatted.csv",
+    "brawler_synergy.json": "output/brawler_synergy.json",
+    "brawler_counters.json": "output/brawler_counters.json",
+    "brawler_map_winrates.json": "output/brawler_map_winrates.json",
+    "team_trios.json": "output/team_trios.json",
+}
+# Memory-mapped by the backend, see pair_cubes.py
+PAIR_CUBE_FILES = {
+    "map_pair_cubes.npy": "output/pair_cubes/map_pair_cubes.npy",
+    "mode_pair_cubes.npy": "output/pair_cubes/mode_pair_cubes.npy",
+    "pair_cubes.json": "output/pair_cubes/pair_cubes.json",
+}
+# Time windows day_buckets.py writes the same outputs for, in days
+WINDOW_DAYS = [1, 7, 14, 30]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Publish the pipeline outputs to the backend data directory."
+    )
+    parser.add_argument(
+        "publish_dir",
+        type=str,
+        nargs="?",
+        default=None,
+        help="Directory the backend loads from (BRAWLER_DATA_DIR). Defaults to BRAWLER_DATA_PUBLISH_DIR or output/published.",
+    )
+    return parser.parse_args()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def window_output_dir(days):
+    return os.path.join("output", "windows", f"{days}d")
+
+
+def window_files(window_days=WINDOW_DAYS):
+    """
+    Returns:
+    dict: published file name -> source path of the time window outputs that exist,
+        e.g. brawler_synergy_7d.json -> output/windows/7d/brawler_synergy.json
+    """
+    files = {}
+    for days in window_days:
+        for name, source in PUBLISHED_FILES.items():
+            stem, extension = os.path.splitext(name)
+            path = os.path.join(window_output_dir(days), os.path.basename(source))
+            if os.path.exists(path):
+                files[f"{stem}_{days}d{extension}"] = path
+    return files
+
+
+def publish_outputs(publish_dir, published_files=None):
+    """
+    Copies the pipeline outputs into publish_dir and writes a new manifest.
+
+    Args:
+    publish_dir (str): directory the backend loads from
+    published_files (dict): published file name -> source path, by default the
+        pipeline outputs, the pair cubes and the time window outputs that exist
+
+    Returns:
+    str: the published version
+    """
+    if published_files is None:
+        published_files = {**PUBLISHED_FILES, **PAIR_CUBE_FILES, **window_files()}
+    os.makedirs(publish_dir, exist_ok=True)
+    hashes = {}
+    for name, source in published_files.items():
+        if not os.path.exists(source):
+            print(f"Skipping missing output {source}")
+            continue
+        replace_atomically(
+            lambda temp_path: shutil.copyfile(source, temp_path),
+            os.path.join(publish_dir, name),
+        )
+        hashes[name] = file_sha256(os.path.join(publish_dir, name))
+
+    content_hash = hashlib.sha256(
+        json.dumps(hashes, sort_keys=True).encode()
+    ).hexdigest()
+    version = (
+        f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{content_hash[:12]}"
+    )
+
+    def write_manifest(temp_path):
+        with open(temp_path, "w") as f:
+            json.dump({"version": version, "files": hashes}, f, indent=4)
+
+    replace_atomically(write_manifest, os.path.join(publish_dir, MANIFEST_FILE))
+    return version
+
+
+def default_publish_dir():
+    return os.getenv("BRAWLER_DATA_PUBLISH_DIR", "output/published")
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    publish_dir = args.publish_dir or default_publish_dir()
+    version = publish_outputs(publish_dir)
+    print(f'Published version {version} to "{publish_dir}"')
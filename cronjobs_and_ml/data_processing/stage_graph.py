@@ -0,0 +1,151 @@
+import os
+import time
+import resource
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+"""
+Stage Graph - runs pipeline stages in-process by their declared inputs
+    Every stage names the stages whose results it takes as arguments. Stages whose inputs
+    are ready run in parallel on a process pool, results are passed between stages as
+    Python objects instead of files found by parsing stdout, and each stage's wall time
+    and peak memory are recorded.
+"""
+
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+    name (str): unique stage name, also the name its result is passed on as
+    func (callable): module-level function, so it can be sent to a worker process
+    inputs (list): names of the stages whose results are passed to func, in order
+    args (tuple): extra arguments passed to func after the inputs
+    outputs (list): files the stage writes, checked once it finishes
+    after (list): names of stages that must finish first without passing their results
+    """
+
+    def __init__(self, name, func, inputs=(), args=(), outputs=(), after=()):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.args = tuple(args)
+        self.outputs = list(outputs)
+        self.after = list(after)
+
+    def dependencies(self):
+        return self.inputs + self.after
+
+
+class StageResult:
+    def __init__(self, name, value, wall_seconds, peak_rss_bytes):
+        self.name = name
+        self.value = value
+        self.wall_seconds = wall_seconds
+        self.peak_rss_bytes = peak_rss_bytes
+
+
+def reset_peak_rss():
+    # Linux resets the VmHWM high-water mark on writing 5 to clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_bytes():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak of the whole worker process, in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def run_stage(func, args):
+    """
+    Runs one stage in a worker process.
+
+    Returns:
+    tuple: (result, wall seconds, peak RSS bytes of the worker during the stage)
+    """
+    reset_peak_rss()
+    start = time.perf_counter()
+    value = func(*args)
+    return value, time.perf_counter() - start, peak_rss_bytes()
+
+
+def check_stages(stages):
+    names = set()
+    for stage in stages:
+        if stage.name in names:
+            raise ValueError(f"Duplicate stage name: {stage.name}")
+        names.add(stage.name)
+    for stage in stages:
+        unknown = [name for name in stage.dependencies() if name not in names]
+        if unknown:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {unknown}")
+
+
+def run_stage_graph(stages, max_workers=None):
+    """
+    Runs every stage once its inputs are done, in parallel where the graph allows.
+
+    Args:
+    stages (list): Stage objects, in any order
+    max_workers (int): size of the process pool, defaults to the number of CPUs
+
+    Returns:
+    dict: stage name -> StageResult, in completion order
+    """
+    check_stages(stages)
+    pending = {stage.name: stage for stage in stages}
+    results = {}
+    running = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            ready = [
+                stage
+                for stage in pending.values()
+                if all(name in results for name in stage.dependencies())
+            ]
+            for stage in ready:
+                del pending[stage.name]
+                args = [results[name].value for name in stage.inputs]
+                args.extend(stage.args)
+                print(f"> Running stage {stage.name}")
+                running[executor.submit(run_stage, stage.func, args)] = stage
+            if not running:
+                raise ValueError(f"Stages {sorted(pending)} have circular inputs")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                # Re-raises the stage's exception, which stops the pipeline
+                value, wall_seconds, peak_rss = future.result()
+                missing = [path for path in stage.outputs if not os.path.exists(path)]
+                if missing:
+                    raise RuntimeError(
+                        f"Stage {stage.name} did not write its outputs {missing}"
+                    )
+                results[stage.name] = StageResult(
+                    stage.name, value, wall_seconds, peak_rss
+                )
+    return results
+
+
+def format_stage_report(results, total_seconds):
+    lines = [f"{'stage':<24}{'wall s':>10}{'peak RSS MB':>14}"]
+    for result in results.values():
+        lines.append(
+            f"{result.name:<24}{result.wall_seconds:>10.2f}"
+            f"{result.peak_rss_bytes / 1_000_000:>14.1f}"
+        )
+    lines.append(f"{'total':<24}{total_seconds:>10.2f}")
+    return "\n".join(lines)
@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from battle_aggregator import (
+    BATTLE_COLUMNS,
+    CHUNK_ROWS,
+    add_chunk_rows_argument,
+    empty_battles,
+    find_most_recent_file,
+    full_team_mask,
+    read_battle_chunks,
+    read_battles,
+    team_codes,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically
+from shared.brawler_registry import REGISTRY
+
+"""
+Team Trios - {Map Name: [{brawlers: [A, B, C], wins, losses, games, winrate}, ...], ...}
+    Win rates of whole teams of three on each map. With every map there are far too many
+    trios for a dense table, so each full team is packed with its map into one integer
+    key, (map << 30) | (A << 20) | (B << 10) | C with A < B < C, and only the keys that
+    occur are counted: a chunk's keys are sorted and counted per key, then merged into
+    the sorted keys of the chunks before by binary search, adding the counts of the keys
+    already there and inserting the new ones. Memory depends on the number of distinct
+    (map, trio) keys, not on the number of battles.
+"""
+
+# Bits per brawler id in a trio key, the registry can grow to 1024 brawlers
+BRAWLER_BITS = 10
+TRIO_BITS = 3 * BRAWLER_BITS
+BRAWLER_MASK = (1 << BRAWLER_BITS) - 1
+DEFAULT_TOP_K = 20
+DEFAULT_MIN_GAMES = 10
+DEFAULT_OUTPUT_FILE = "output/team_trios.json"
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Create a JSON file with the best three-brawler teams on each map given match data."
+    )
+    parser.add_argument(
+        "input_file",
+        type=str,
+        nargs="?",
+        default=None,
+        help="Path to the input match data CSV file or Parquet/Arrow directory. If not provided, the most recent one in the raw_data folder will be used.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=DEFAULT_OUTPUT_FILE,
+        help=f"Output JSON file. Default is '{DEFAULT_OUTPUT_FILE}'.",
+    )
+    parser.add_argument(
+        "--top-k",
+        type=int,
+        default=DEFAULT_TOP_K,
+        help=f"Trios kept per map. Default is {DEFAULT_TOP_K}.",
+    )
+    parser.add_argument(
+        "--min-games",
+        type=int,
+        default=DEFAULT_MIN_GAMES,
+        help=f"Games a trio needs on a map to be ranked. Default is {DEFAULT_MIN_GAMES}.",
+    )
+    add_chunk_rows_argument(parser)
+    return parser.parse_args()
+
+
+def trio_keys(maps, teams):
+    """
+    Args:
+    maps (ndarray[battle]): map code of each battle
+    teams (ndarray[battle, 3]): distinct registry brawler ids of one team
+
+    Returns:
+    ndarray: int64 key of each (map, sorted team)
+    """
+    teams = np.sort(teams, axis=1).astype(np.int64)
+    return (
+        (maps.astype(np.int64) << TRIO_BITS)
+        | (teams[:, 0] << (2 * BRAWLER_BITS))
+        | (teams[:, 1] << BRAWLER_BITS)
+        | teams[:, 2]
+    )
+
+
+def unpack_trio_keys(keys):
+    """
+    Returns:
+    tuple: (map code, 3 sorted brawler ids) of each trio key
+    """
+    brawlers = np.column_stack(
+        [
+            (keys >> shift) & BRAWLER_MASK
+            for shift in (2 * BRAWLER_BITS, BRAWLER_BITS, 0)
+        ]
+    )
+    return keys >> TRIO_BITS, brawlers
+
+
+class TrioCounts:
+    """
+    Sparse win/loss counts of the trios played on each map.
+
+    Attributes:
+    brawler_names (list): brawler name for each brawler id, the registry's names
+    map_names (list): map name for each map code of the keys
+    battle_count (int): number of battles read
+    keys (ndarray[trio]): sorted trio keys, see trio_keys
+    wins, losses (ndarray[trio]): games won/lost by each key's team on its map
+    """
+
+    def __init__(self, brawler_names, map_names, keys=None, counts=None):
+        self.brawler_names = list(brawler_names)
+        self.map_names = list(map_names)
+        self.battle_count = 0
+        self.keys = np.zeros(0, dtype=np.int64) if keys is None else keys
+        self.wins, self.losses = (
+            counts if counts is not None else [np.zeros(0, dtype=np.int64)] * 2
+        )
+
+    def merge(self, other):
+        """
+        Adds up the counts of two battle logs, e.g. two chunks of the same one. Maps are
+        matched by name, brawler ids are registry ids in both.
+
+        Returns:
+        TrioCounts: new counts with the summed wins and losses
+        """
+        brawler_names = max(self.brawler_names, other.brawler_names, key=len)
+        map_names = sorted(set(self.map_names) | set(other.map_names))
+        keys, other_keys = (
+            remap_trio_keys(trios.keys, trios.map_names, map_names)
+            for trios in (self, other)
+        )
+        # Both sides are sorted and unique: the other side's counts of keys this side
+        # has are added in place and its new keys are inserted at their sorted positions,
+        # without sorting the union again
+        positions = np.searchsorted(keys, other_keys)
+        found = positions < len(keys)
+        found[found] = keys[positions[found]] == other_keys[found]
+        new = ~found
+        counts = []
+        for column, other_column in (
+            (self.wins, other.wins),
+            (self.losses, other.losses),
+        ):
+            column = column.copy()
+            column[positions[found]] += other_column[found]
+            counts.append(np.insert(column, positions[new], other_column[new]))
+        merged = TrioCounts(
+            brawler_names,
+            map_names,
+            np.insert(keys, positions[new], other_keys[new]),
+            counts,
+        )
+        merged.battle_count = self.battle_count + other.battle_count
+        return merged
+
+
+def remap_trio_keys(keys, map_names, merged_map_names):
+    """
+    Moves trio keys to the map codes of merged map names, the trio bits stay as they
+    are. Both map name lists are sorted, so sorted keys stay sorted.
+    """
+    if map_names == merged_map_names:
+        return keys
+    map_codes = {name: code for code, name in enumerate(merged_map_names)}
+    remap = np.array([map_codes[name] for name in map_names], dtype=np.int64)
+    return (remap[keys >> TRIO_BITS] << TRIO_BITS) | (keys & ((1 << TRIO_BITS) - 1))
+
+
+def count_trios(df):
+    winners, losers = team_codes(df)
+    if len(REGISTRY) > 1 << BRAWLER_BITS:
+        raise ValueError(f"Trio keys hold {1 << BRAWLER_BITS} brawler ids at most")
+    # Like the teammate tables, only full 3v3 battles of distinct brawlers
+    full_teams = full_team_mask(winners, losers)
+    map_names = list(df["map_name"].cat.categories)
+    maps = df["map_name"].cat.codes.to_numpy()
+    full_teams &= maps >= 0
+    maps = maps[full_teams]
+
+    # Each side's teams are counted by sorting their keys, then merged like two chunks
+    sides = []
+    for teams, column in ((winners, 0), (losers, 1)):
+        keys, games = np.unique(trio_keys(maps, teams[full_teams]), return_counts=True)
+        counts = [
+            np.zeros(len(keys), dtype=np.int64),
+            np.zeros(len(keys), dtype=np.int64),
+        ]
+        counts[column] = games.astype(np.int64)
+        sides.append(TrioCounts(REGISTRY.names, map_names, keys, counts))
+    trios = sides[0].merge(sides[1])
+    trios.battle_count = len(df)
+    return trios
+
+
+def aggregate_trios(input_file, chunk_rows=CHUNK_ROWS):
+    """
+    Reads a battle log once and counts the trios of each map, chunk_rows battles at a time.
+
+    Returns:
+    TrioCounts: the summed counts
+    """
+    if not chunk_rows:
+        return count_trios(read_battles(input_file))
+    trios = None
+    for battles in read_battle_chunks(input_file, chunk_rows):
+        chunk_trios = count_trios(battles)
+        trios = chunk_trios if trios is None else trios.merge(chunk_trios)
+    return trios if trios is not None else count_trios(empty_battles(BATTLE_COLUMNS))
+
+
+def top_trios(trios, top_k=DEFAULT_TOP_K, min_games=DEFAULT_MIN_GAMES):
+    """
+    Ranks the trios with at least min_games games on each map by win rate, more games
+    first on equal win rates.
+
+    Returns:
+    dict: map name -> list of the top_k trios, empty for maps without a ranked trio
+    """
+    ranked = np.flatnonzero(trios.wins + trios.losses >= max(1, min_games))
+    maps, brawlers = unpack_trio_keys(trios.keys[ranked])
+    wins, losses = trios.wins[ranked], trios.losses[ranked]
+    games = wins + losses
+    winrates = 100 * wins / games
+    # By map, then win rate, then games, lexsort sorts by its last key first
+    order = np.lexsort((-games, -winrates, maps))
+    map_starts = np.searchsorted(maps[order], np.arange(len(trios.map_names) + 1))
+
+    map_trios = {}
+    for map_code, map_name in enumerate(trios.map_names):
+        best = order[map_starts[map_code] : map_starts[map_code + 1]][:top_k]
+        map_trios[map_name] = [
+            {
+                "brawlers": [trios.brawler_names[b] for b in brawlers[i]],
+                "wins": int(wins[i]),
+                "losses": int(losses[i]),
+                "games": int(games[i]),
+                "winrate": float(winrates[i]),
+            }
+            for i in best
+        ]
+    return map_trios
+
+
+def create_team_trios(
+    input_file,
+    output_path=DEFAULT_OUTPUT_FILE,
+    top_k=DEFAULT_TOP_K,
+    min_games=DEFAULT_MIN_GAMES,
+    chunk_rows=CHUNK_ROWS,
+):
+    """
+    Returns:
+    dict: battle_count, trio_count and map_count of the battle log, the counts stay in
+        this process
+    """
+    trios = aggregate_trios(input_file, chunk_rows)
+    map_trios = top_trios(trios, top_k, min_games)
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    def write(temp_path):
+        with open(temp_path, "w") as f:
+            json.dump(map_trios, f, indent=4)
+
+    replace_atomically(write, output_path)
+    return {
+        "battle_count": trios.battle_count,
+        "trio_count": len(trios.keys),
+        "map_count": len(map_trios),
+    }
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    input_file = args.input_file or find_most_recent_file("raw_data")
+    if not input_file:
+        print("Invalid input file")
+    else:
+        print(f'Input: "{input_file}"')
+        start_time = time.time()
+        summary = create_team_trios(
+            input_file, args.output, args.top_k, args.min_games, args.chunk_rows
+        )
+        print(
+            f"Counted {summary['trio_count']} map trios in {summary['battle_count']} "
+            f"battles in {time.time() - start_time:.2f} seconds"
+        )
+        print(f'Output: "{args.output}"')
@@ -0,0 +1,12 @@
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+def concat_battles(frames):
+    # pd.concat turns categoricals with different categories into objects
+    if len(frames) == 1:
+        return frames[0]
+    return pd.DataFrame({
+        column: union_categoricals([frame[column] for frame in frames], ignore_order=True)
+        for column in frames[0].columns
+    })
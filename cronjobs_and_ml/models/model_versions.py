@@ -0,0 +1,52 @@
+import os
+import sys
+import joblib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.versioned_index import VersionedIndex
+
+"""
+Model Versions - every model random_forest.py trains, with the battles it has seen
+    Each version is a joblib file next to an index.json listing the versions in order.
+    A version's watermark maps every battle log file to the battles read from it, so an
+    update only reads what was crawled after the version it starts from.
+
+Layout, in the versions directory:
+    index.json: {"versions": [{version, file, parent, created_at, mode, new_rows,
+        trained_rows, n_estimators, watermark}]}
+    random_forest-<version>.pkl: the model dict, with its version and watermark
+"""
+
+
+class ModelVersions(VersionedIndex):
+    """
+    Args:
+    versions_dir (str): directory of index.json and the model files
+    """
+
+    def __init__(self, versions_dir):
+        super().__init__(versions_dir, 'random_forest-{version:04d}.pkl', 'model version')
+        self.versions_dir = versions_dir
+
+    def load(self, entry):
+        return joblib.load(self.path(entry))
+
+    def save(self, model, info):
+        """
+        Stores a model as the next version.
+
+        Args:
+        model (dict): model dict, its version is set here
+        info (dict): index fields of the version, at least its watermark
+
+        Returns:
+        tuple: (index entry, path of the model file)
+        """
+
+        def write(entry, path):
+            model['version'] = entry['version']
+            model['watermark'] = entry['watermark']
+            joblib.dump(model, path)
+
+        entry = self.add(write, info)
+        return entry, self.path(entry)
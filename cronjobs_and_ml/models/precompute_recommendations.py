@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import itertools
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+import joblib
+from team_encoding import TeamVocabulary, encode_drafts
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.battle_logs import read_battles
+
+"""
+Precompute Recommendations - top-N picks of the random forest for common draft states
+    Every (battle mode, map) is combined with no teammate, each single teammate and each
+    pair of teammates, with no opponents picked yet. The model runs on all of these
+    states in large batches and the best picks are written to a table of .npy arrays
+    the backend memory-maps, so only rarer draft states need live inference.
+
+Table layout, in the output directory:
+    meta.json: model hash, brawlers in teammate order, (mode, map) list, top_n
+        The teammates are every brawler the model encodes, not only its classes, so
+        a brawler that never won a battle as the target still has its states.
+    brawlers.npy: uint16 [states, top_n], model class index of each pick
+    probabilities.npy: float32 [states, top_n]
+    State of (mode, map) m and teammates is m * states_per_map + the teammate state:
+    0 for no teammate, 1 + i for teammate i, 1 + n + pair_index(i, j) for i < j.
+"""
+
+DRAFT_COLUMNS = [
+    "battle_mode",
+    "map_name",
+    "winner_1",
+    "winner_2",
+    "winner_3",
+    "loser_1",
+    "loser_2",
+    "loser_3",
+]
+TABLE_FORMAT = 1
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Precompute draft recommendations for the backend."
+    )
+    parser.add_argument(
+        "model",
+        type=str,
+        nargs="?",
+        default="models/random_forest.pkl",
+        help="Model saved by random_forest.py.",
+    )
+    parser.add_argument(
+        "--battle-log",
+        type=str,
+        default=None,
+        help="Battle log CSV or Parquet/Arrow directory to take the (mode, map) pairs from. Defaults to the pairs played in the model's training battles.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="models/recommendation_table",
+        help="Output directory, the backend reads it from RECOMMENDATION_TABLE_DIR.",
+    )
+    parser.add_argument("--top-n", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    return parser.parse_args()
+
+
+def name_key(name):
+    return name.strip().upper()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def pair_index(i, j, n):
+    # Index of the pair i < j among all pairs of n brawlers in lexicographic order
+    return i * (2 * n - i - 1) // 2 + (j - i - 1)
+
+
+def teammate_states(n):
+    """
+    Yields:
+    tuple: teammate indices of each state, in state order
+    """
+    yield ()
+    for i in range(n):
+        yield (i,)
+    yield from itertools.combinations(range(n), 2)
+
+
+def model_mode_maps(model):
+    """
+    Returns:
+    list: (mode, map) pairs played in the model's training battles, every mode and map
+        combination for models saved without them
+    """
+    if isinstance(model, dict):
+        if model.get("mode_maps") is not None:
+            return [tuple(pair) for pair in model["mode_maps"]]
+        print(
+            "Warning: the model has no (mode, map) pairs, every combination is "
+            "precomputed, pass --battle-log to only take the played ones"
+        )
+        return [
+            (mode, map_name) for mode in model["modes"] for map_name in model["maps"]
+        ]
+    encoder = model.named_steps["preprocessor"].named_transformers_["cat"]
+    categories = dict(zip(DRAFT_COLUMNS, encoder.categories_))
+    return [
+        (mode, map_name)
+        for mode in categories["battle_mode"]
+        for map_name in categories["map_name"]
+        if isinstance(mode, str) and isinstance(map_name, str)
+    ]
+
+
+def model_predictor(model):
+    """
+    Args:
+    model: dict saved by random_forest.py, or an older Pipeline
+
+    Returns:
+    tuple: (classifier, class names, teammate names, function of (mode, map, teammate
+        names) drafts -> probabilities)
+    """
+    if isinstance(model, dict):
+        classifier = model["classifier"]
+        vocabulary = TeamVocabulary.from_dict(model)
+
+        def predict(drafts):
+            features = encode_drafts(
+                [
+                    (mode, map_name, teammates, [])
+                    for mode, map_name, teammates in drafts
+                ],
+                vocabulary,
+            )
+            return classifier.predict_proba(features)
+
+        class_names = [model["brawlers"][i] for i in classifier.classes_]
+        return classifier, class_names, model["brawlers"], predict
+
+    def predict(drafts):
+        return model.predict_proba(
+            pd.DataFrame(
+                [
+                    [mode, map_name] + list(teammates) + [""] * (6 - len(teammates))
+                    for mode, map_name, teammates in drafts
+                ],
+                columns=DRAFT_COLUMNS,
+            )
+        )
+
+    classifier = model.named_steps["classifier"]
+    encoder = model.named_steps["preprocessor"].named_transformers_["cat"]
+    categories = dict(zip(DRAFT_COLUMNS, encoder.categories_))
+    teammates = list(categories["winner_2"]) + list(categories["winner_3"])
+    return classifier, list(classifier.classes_), teammates, predict
+
+
+def battle_log_mode_maps(battle_log):
+    battles = read_battles(battle_log, ["battle_mode", "map_name"]).dropna()
+    pairs = battles.drop_duplicates().astype(str)
+    return sorted(zip(pairs["battle_mode"], pairs["map_name"]))
+
+
+def precompute(model, mode_maps, top_n, batch_size):
+    classifier, classes, teammate_names, predict = model_predictor(model)
+    classifier.n_jobs = -1
+    # Picks are the same brawlers as the backend recommends
+    class_ids = {
+        name_key(brawler): i
+        for i, brawler in enumerate(classes)
+        if isinstance(brawler, str) and brawler.strip()
+    }
+    not_brawlers = np.setdiff1d(np.arange(len(classes)), list(class_ids.values()))
+    # Teammates are every brawler the model encodes, in the backend's teammate order
+    teammate_ids = {}
+    for brawler in teammate_names:
+        if isinstance(brawler, str) and brawler.strip():
+            teammate_ids.setdefault(name_key(brawler), brawler)
+    brawlers = sorted(teammate_ids)
+    original_names = [teammate_ids[key] for key in brawlers]
+    # Class of each teammate, None for brawlers the model never predicts
+    teammate_classes = [class_ids.get(key) for key in brawlers]
+
+    states = list(teammate_states(len(brawlers)))
+    # Teammates never get recommended, so 2 fewer picks than classes are always left
+    top_n = min(top_n, len(class_ids) - 2)
+    picks = np.zeros((len(mode_maps) * len(states), top_n), dtype=np.uint16)
+    probabilities = np.zeros(picks.shape, dtype=np.float32)
+
+    rows = [
+        (mode, map_name, teammates)
+        for mode, map_name in mode_maps
+        for teammates in states
+    ]
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start : start + batch_size]
+        scores = predict(
+            [
+                (mode, map_name, [original_names[i] for i in teammates])
+                for mode, map_name, teammates in batch
+            ]
+        )
+        scores[:, not_brawlers] = -1
+        for row, (_, _, teammates) in enumerate(batch):
+            for i in teammates:
+                if teammate_classes[i] is not None:
+                    scores[row, teammate_classes[i]] = -1
+        # Stable sort breaks ties in class order, like live inference
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_n]
+        picks[start : start + len(batch)] = order
+        probabilities[start : start + len(batch)] = np.take_along_axis(
+            scores, order, axis=1
+        )
+        print(f"{start + len(batch)}/{len(rows)} draft states")
+
+    meta = {
+        "format": TABLE_FORMAT,
+        "top_n": top_n,
+        "brawlers": brawlers,
+        "mode_maps": [list(mode_map) for mode_map in mode_maps],
+        "states_per_map": len(states),
+    }
+    return meta, picks, probabilities
+
+
+def write_table(output_dir, meta, picks, probabilities):
+    os.makedirs(output_dir, exist_ok=True)
+    for name, array in (("brawlers", picks), ("probabilities", probabilities)):
+        temp_path = os.path.join(output_dir, f"{name}.tmp.npy")
+        np.save(temp_path, array)
+        os.replace(temp_path, os.path.join(output_dir, f"{name}.npy"))
+    # Written last, the backend only uses a table whose arrays match its meta.json
+    temp_path = os.path.join(output_dir, "meta.json.tmp")
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, os.path.join(output_dir, "meta.json"))
+
+
+if __name__ == "__main__":
+    print(f"> Executing {os.path.basename(__file__)}")
+    args = parse_args()
+    print(f'Input: "{args.model}"')
+    model = joblib.load(args.model)
+    if args.battle_log:
+        mode_maps = battle_log_mode_maps(args.battle_log)
+    else:
+        mode_maps = model_mode_maps(model)
+
+    start_time = time.time()
+    meta, picks, probabilities = precompute(
+        model, mode_maps, args.top_n, args.batch_size
+    )
+    meta["model_sha256"] = file_sha256(args.model)
+    meta["created_at"] = datetime.now(timezone.utc).isoformat()
+    write_table(args.output, meta, picks, probabilities)
+    print(
+        f"{len(picks)} draft states for {len(mode_maps)} modes and maps in {time.time() - start_time:.2f} seconds"
+    )
+    print(f'Output: "{args.output}"')
@@ -1,58 +1,399 @@
-import pandas as pd
+import os
+import sys
+import json
 import time
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
+import shutil
+import hashlib
+import argparse
+import numpy as np
+import scipy.sparse as sp
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import accuracy_score, classification_report
-import joblib
+from sklearn.metrics import accuracy_score
+from battle_data import concat_battles
+from model_versions import ModelVersions
+from team_encoding import (
+    BATTLE_COLUMNS,
+    MODEL_FORMAT,
+    WINNER_COLUMNS,
+    TeamVocabulary,
+    vocabulary_from_battles,
+    encode_battles,
+)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.atomic_files import replace_atomically
+from shared.battle_logs import battle_log_files, read_new_battle_chunks
+
+"""
+Random Forest - trains the pick recommender on a sparse multi-hot team encoding
+    Battles are read with categorical columns and encoded by team_encoding.py into a
+    float32 sparse matrix of battle mode, map, teammates and opponents, which
+    RandomForestClassifier trains on directly with all cores. Every winner of a battle
+    is the target of one row, with the other two winners as its teammates, and no
+    target is also a feature like winner_1 was for the old one-hot pipeline.
+
+    The encoded matrix is cached in --cache-dir, keyed by the battle logs' files, sizes
+    and modification times, so retraining with other model parameters skips reading and
+    encoding. --sample trains on a random subset of the battles. --stream reads the
+    battle logs in chunks and grows the forest with a share of the trees per chunk, for
+    battle logs that don't fit in memory.
+
+    Every model is stored as a version in --versions-dir with the watermark of the
+    battles it was trained on (model_versions.py). --update loads the latest version
+    and adds --update-trees trees fitted on only the battles past its watermark, so a
+    nightly update costs time in proportion to the new crawls, not the whole archive.
 
-# Load the data
-data = pd.read_csv('raw_data/battle_logs_07-10-2024_10:05_am_5M.csv')
+Saved model: a joblib dict with format "team_multi_hot", the classifier, whose classes
+    are brawler ids, the modes, maps and brawlers of the encoding, the (mode, map) pairs
+    played in the battles, its version and watermark. The latest version is copied to
+    --output.
+"""
 
-# Preprocess the data
-categorical_features = ['battle_mode', 'map_name', 'winner_1', 'winner_2', 'winner_3', 'loser_1', 'loser_2', 'loser_3']
+# Bump when the encoding changes, so cached matrices of the old one are not reused
+ENCODING_VERSION = 3
+# Held-out battles kept for evaluation in --stream and --update mode
+MAX_EVALUATION_ROWS = 200000
 
-# Define the target (assuming 'winner_1' for the purpose of this example)
-target = 'winner_1'  # Adjust this to your actual target column
 
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('cat', OneHotEncoder(handle_unknown='ignore'), categorical_features)
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Train the random forest pick recommender.'
+    )
+    parser.add_argument(
+        'battle_logs',
+        type=str,
+        nargs='*',
+        default=['raw_data/battle_logs_07-10-2024_10:05_am_5M.csv'],
+        help='Battle log CSVs or Parquet/Arrow directories.',
+    )
+    parser.add_argument('--output', type=str, default='models/random_forest.pkl')
+    parser.add_argument(
+        '--versions-dir',
+        type=str,
+        default='models/versions',
+        help='Every trained model is kept here as a version with its battle watermark.',
+    )
+    parser.add_argument(
+        '--update',
+        action='store_true',
+        help='Add trees fitted on the battles past the latest version\'s watermark instead of training from scratch.',
+    )
+    parser.add_argument('--from-version', type=int, default=None, help='Version --update starts from, defaults to the latest.')
+    parser.add_argument('--update-trees', type=int, default=10, help='Trees added by --update.')
+    parser.add_argument(
+        '--max-trees',
+        type=int,
+        default=None,
+        help='Drop the oldest trees beyond this many after --update, so old battles age out.',
+    )
+    parser.add_argument('--n-estimators', type=int, default=50)
+    parser.add_argument('--max-depth', type=int, default=10)
+    parser.add_argument(
+        '--max-samples',
+        type=float,
+        default=None,
+        help='Fraction of the training battles each tree is bootstrapped from, defaults to all of them.',
+    )
+    parser.add_argument('--n-jobs', type=int, default=-1, help='Cores to train with, -1 for all.')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument(
+        '--sample', type=int, default=None, help='Train on this many random battles.'
+    )
+    parser.add_argument(
+        '--stream',
+        type=int,
+        default=None,
+        metavar='CHUNK_ROWS',
+        help='Read and train in chunks of this many battles instead of all at once.',
+    )
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default='models/encoded_cache',
+        help='Directory of cached encoded matrices, empty to disable the cache.',
+    )
+    return parser.parse_args()
+
+
+def cache_key(battle_logs, sample, seed):
+    files = [
+        (os.path.abspath(path), os.path.getsize(path), os.path.getmtime(path))
+        for battle_log in battle_logs
+        for path in battle_log_files(battle_log)
     ]
-)
+    key = json.dumps([ENCODING_VERSION, files, sample, seed if sample else None])
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def save_encoded(cache_path, X, y, row_battles, vocabulary, watermark):
+    temp_path = f'{cache_path}.tmp'
+    os.makedirs(temp_path, exist_ok=True)
+    sp.save_npz(os.path.join(temp_path, 'X.npz'), X, compressed=False)
+    np.save(os.path.join(temp_path, 'y.npy'), y)
+    np.save(os.path.join(temp_path, 'row_battles.npy'), row_battles)
+    with open(os.path.join(temp_path, 'vocabulary.json'), 'w') as f:
+        json.dump({**vocabulary.to_dict(), 'watermark': watermark}, f)
+    os.replace(temp_path, cache_path)
+
+
+def load_encoded(cache_path):
+    X = sp.load_npz(os.path.join(cache_path, 'X.npz'))
+    y = np.load(os.path.join(cache_path, 'y.npy'))
+    row_battles = np.load(os.path.join(cache_path, 'row_battles.npy'))
+    with open(os.path.join(cache_path, 'vocabulary.json')) as f:
+        data = json.load(f)
+    return X, y, row_battles, TeamVocabulary.from_dict(data), data['watermark']
+
+
+def encoded_battles(battle_logs, sample, seed, cache_dir):
+    """
+    Returns:
+    tuple: (csr_matrix of features, brawler id targets, battle index of every row,
+        TeamVocabulary, watermark of the battles read)
+    """
+    cache_path = None
+    if cache_dir:
+        cache_path = os.path.join(cache_dir, cache_key(battle_logs, sample, seed))
+        if os.path.isdir(cache_path):
+            print(f'Encoded battles from cache "{cache_path}"')
+            return load_encoded(cache_path)
+
+    frames, watermark = [], {}
+    for path, battles in read_new_battle_chunks(battle_logs, None, {}, columns=BATTLE_COLUMNS):
+        frames.append(battles)
+        watermark[path] = watermark.get(path, 0) + len(battles)
+    if not frames:
+        raise ValueError(f'No battles in {battle_logs}')
+    battles = concat_battles(frames)
+    del frames
+    # A sample is drawn from every battle read, which the watermark covers
+    if sample and sample < len(battles):
+        battles = battles.sample(n=sample, random_state=seed)
+    vocabulary = vocabulary_from_battles(battles)
+    X, y, row_battles = encode_battles(battles, vocabulary)
+    del battles
+    if cache_path:
+        save_encoded(cache_path, X, y, row_battles, vocabulary, watermark)
+    return X, y, row_battles, vocabulary, watermark
+
+
+def evaluation_mask(row_battles, test_size, rng):
+    # Whole battles are held out, the rows of a battle's winners share its other picks
+    n_battles = int(row_battles[-1]) + 1 if len(row_battles) else 0
+    return (rng.random(n_battles) < test_size)[row_battles]
+
+
+def with_all_classes(X, y, classes):
+    """
+    Appends a featureless battle with sample weight 0 for every class missing from the
+    targets, so every chunk's trees have the same classes without the extra battles
+    affecting them.
+
+    Returns:
+    tuple: (X, y, sample_weight), sample_weight is None if no class is missing
+    """
+    missing = np.setdiff1d(classes, y).astype(y.dtype)
+    if not len(missing):
+        return X, y, None
+    X = sp.vstack([X, sp.csr_matrix((len(missing), X.shape[1]), dtype=X.dtype)], format='csr')
+    sample_weight = np.ones(len(y) + len(missing), dtype=np.float64)
+    sample_weight[len(y):] = 0
+    return X, np.concatenate([y, missing]), sample_weight
+
+
+def new_classifier(args):
+    return RandomForestClassifier(
+        n_estimators=0,
+        max_depth=args.max_depth,
+        max_samples=args.max_samples,
+        n_jobs=args.n_jobs,
+        random_state=args.seed,
+        warm_start=True,
+    )
+
+
+def fit_trees(classifier, X, y, n_trees, sample_weight=None):
+    """
+    Adds n_trees trees fitted on X, a csc_matrix, the format the trees are grown from,
+    so fit doesn't keep a copy of it next to the caller's.
+    """
+    classifier.n_estimators += n_trees
+    classifier.fit(X, y, sample_weight=sample_weight)
+
+
+def train_in_memory(args):
+    X, y, row_battles, vocabulary, watermark = encoded_battles(args.battle_logs, args.sample, args.seed, args.cache_dir)
+    test = evaluation_mask(row_battles, args.test_size, np.random.default_rng(args.seed))
+    X_test, y_test = X[test], y[test]
+    X_train, y_train = X[~test].tocsc(), y[~test]
+    del X, y, row_battles
+
+    classifier = new_classifier(args)
+    start_time = time.time()
+    fit_trees(classifier, X_train, y_train, args.n_estimators)
+    print(f'Training time for {len(y_train)} rows: {time.time() - start_time:.2f} seconds')
+    info = {'mode': 'full', 'new_rows': len(y_train), 'trained_rows': len(y_train), 'watermark': watermark}
+    return classifier, vocabulary, info, X_test, y_test
+
+
+def fit_chunks(args, classifier, vocabulary, classes, watermark, n_chunks, n_trees):
+    """
+    Adds n_trees trees, spread evenly over the chunks of battles past watermark. Every
+    chunk needs at least one tree, the watermark moves past all of them.
+
+    Returns:
+    tuple: (rows trained on, watermark after the battles read, held-out features,
+        held-out targets)
+    """
+    if n_chunks > n_trees:
+        # A chunk without trees would be marked as trained on without being fitted
+        raise ValueError(
+            f'{n_chunks} chunks of battles for {n_trees} trees, use a larger --stream or more trees'
+        )
+    trees = np.diff(np.linspace(0, n_trees, n_chunks + 1).round().astype(int))
+
+    rng = np.random.default_rng(args.seed)
+    new_watermark = dict(watermark)
+    n_train, unknown = 0, 0
+    test_parts, test_targets, n_test = [], [], 0
+    chunks = read_new_battle_chunks(args.battle_logs, args.stream, watermark, columns=BATTLE_COLUMNS)
+    for chunk, ((path, battles), chunk_trees) in enumerate(zip(chunks, trees), start=1):
+        new_watermark[path] = new_watermark.get(path, 0) + len(battles)
+        X, y, row_battles = encode_battles(battles, vocabulary)
+        known = np.isin(y, classes)
+        unknown += len(y) - int(known.sum())
+        if not known.all():
+            X, y, row_battles = X[known], y[known], row_battles[known]
+        del battles
+        test = evaluation_mask(row_battles, args.test_size, rng)
+        if n_test < MAX_EVALUATION_ROWS:
+            keep = np.flatnonzero(test)[: MAX_EVALUATION_ROWS - n_test]
+            test_parts.append(X[keep])
+            test_targets.append(y[keep])
+            n_test += len(keep)
+        X_train, y_train = X[~test], y[~test]
+        n_train += len(y_train)
+        del X
+        X_train, y_train, sample_weight = with_all_classes(X_train, y_train, classes)
+        fit_trees(classifier, X_train.tocsc(), y_train, chunk_trees, sample_weight)
+        print(f'Chunk {chunk}/{n_chunks}: {len(classifier.estimators_)} trees, {n_train} rows')
+    if unknown:
+        print(f'{unknown} rows without a target the model has a class for were left out')
+    X_test = sp.vstack(test_parts, format='csr') if test_parts else None
+    y_test = np.concatenate(test_targets) if test_targets else None
+    return n_train, new_watermark, X_test, y_test
+
+
+def train_streaming(args):
+    # First pass: the vocabulary and the number of chunks, to split the trees evenly
+    vocabulary = TeamVocabulary([], [], [], [])
+    n_chunks = 0
+    for _, battles in read_new_battle_chunks(args.battle_logs, args.stream, {}, columns=BATTLE_COLUMNS):
+        vocabulary = vocabulary.merge(vocabulary_from_battles(battles))
+        n_chunks += 1
+    if not n_chunks:
+        raise ValueError(f'No battles in {args.battle_logs}')
+    # Brawlers stay in registry id order
+    vocabulary = TeamVocabulary(sorted(vocabulary.modes), sorted(vocabulary.maps), vocabulary.brawlers, vocabulary.mode_maps)
+
+    classifier = new_classifier(args)
+    start_time = time.time()
+    n_train, watermark, X_test, y_test = fit_chunks(
+        args, classifier, vocabulary, np.arange(len(vocabulary.brawlers)), {}, n_chunks, args.n_estimators
+    )
+    print(f'Training time for {n_train} rows: {time.time() - start_time:.2f} seconds')
+    info = {'mode': 'stream', 'new_rows': n_train, 'trained_rows': n_train, 'watermark': watermark}
+    return classifier, vocabulary, info, X_test, y_test
+
+
+def train_update(args, versions):
+    """
+    Warm-starts the forest of a model version with trees fitted on the battles past its
+    watermark. The encoding stays the version's, battles of brawlers, modes or maps it
+    doesn't know are encoded without them until the next full training.
+
+    Returns:
+    tuple: like train_in_memory, None if no battles were added since the version
+    """
+    parent = versions.get(args.from_version)
+    if parent is None:
+        raise ValueError(f'No model version in {args.versions_dir}, train one without --update first')
+    model = versions.load(parent)
+    classifier = model['classifier']
+    classifier.n_jobs = args.n_jobs
+    vocabulary = TeamVocabulary.from_dict(model)
+    print(f'Updating version {parent["version"]} ({len(classifier.estimators_)} trees, {parent["trained_rows"]} rows)')
 
-# Separate features and target
-X = data[categorical_features]
-y = data[target]
+    n_chunks = sum(1 for _ in read_new_battle_chunks(args.battle_logs, args.stream, parent['watermark'], columns=BATTLE_COLUMNS))
+    if not n_chunks:
+        print(f'No new battles since version {parent["version"]}')
+        return None
+    start_time = time.time()
+    n_train, watermark, X_test, y_test = fit_chunks(
+        args, classifier, vocabulary, classifier.classes_, parent['watermark'], n_chunks, args.update_trees
+    )
+    if args.max_trees and len(classifier.estimators_) > args.max_trees:
+        classifier.estimators_ = classifier.estimators_[-args.max_trees:]
+        classifier.n_estimators = len(classifier.estimators_)
+    print(f'Training time for {n_train} new rows: {time.time() - start_time:.2f} seconds')
+    info = {
+        'mode': 'update',
+        'parent': parent['version'],
+        'new_rows': n_train,
+        'trained_rows': parent['trained_rows'] + n_train,
+        'watermark': watermark,
+    }
+    return classifier, vocabulary, info, X_test, y_test
 
-# Split the data into training and test sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
-# Create a pipeline with preprocessing and a classifier model
-pipeline = Pipeline(steps=[
-    ('preprocessor', preprocessor),
-    ('classifier', RandomForestClassifier(random_state=42, n_estimators=50, max_depth=10))
-])
+def evaluate(classifier, X_test, y_test, batch_size=65536):
+    if X_test is None or not len(y_test):
+        return
+    classes = classifier.classes_
+    predicted = np.empty(len(y_test), dtype=classes.dtype)
+    in_top_3 = np.zeros(len(y_test), dtype=bool)
+    for start in range(0, len(y_test), batch_size):
+        stop = start + batch_size
+        probabilities = classifier.predict_proba(X_test[start:stop])
+        top_3 = classes[np.argsort(-probabilities, axis=1)[:, :3]]
+        predicted[start:stop] = top_3[:, 0]
+        in_top_3[start:stop] = (top_3 == y_test[start:stop, None]).any(axis=1)
+    print(f'Accuracy: {accuracy_score(y_test, predicted)}')
+    print(f'Top-3 accuracy: {in_top_3.mean()}')
 
-# Measure training time
-start_time = time.time()
-pipeline.fit(X_train, y_train)
-end_time = time.time()
 
-training_time = end_time - start_time
-print(f'Training time for {len(data)} rows: {training_time:.2f} seconds')
+def save_model(args, versions, classifier, vocabulary, info):
+    model = {
+        'format': MODEL_FORMAT,
+        'classifier': classifier,
+        'targets': WINNER_COLUMNS,
+        'trained_rows': info['trained_rows'],
+        **vocabulary.to_dict(),
+    }
+    entry, version_path = versions.save(model, {**info, 'n_estimators': len(classifier.estimators_)})
+    # The latest version is also copied to --output, the path the other jobs read
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    replace_atomically(lambda temp_path: shutil.copyfile(version_path, temp_path), args.output)
+    return entry
 
-# Predict on the test set
-y_pred = pipeline.predict(X_test)
 
-# Evaluate the model
-accuracy = accuracy_score(y_test, y_pred)
-report = classification_report(y_test, y_pred)
-print(f'Accuracy: {accuracy}')
-print(f'Classification Report:\n{report}')
+if __name__ == '__main__':
+    print(f'> Executing {os.path.basename(__file__)}')
+    args = parse_args()
+    print(f'Input: {args.battle_logs}')
+    versions = ModelVersions(args.versions_dir)
+    if args.update:
+        result = train_update(args, versions)
+    elif args.stream:
+        result = train_streaming(args)
+    else:
+        result = train_in_memory(args)
 
-# Save the pipeline (including the preprocessor and the classifier)
-joblib.dump(pipeline, 'models/random_forest.pkl')
-print("Model saved successfully!")
+    if result is not None:
+        classifier, vocabulary, info, X_test, y_test = result
+        evaluate(classifier, X_test, y_test)
+        entry = save_model(args, versions, classifier, vocabulary, info)
+        print(f'Version {entry["version"]}: {entry["n_estimators"]} trees, {entry["trained_rows"]} rows')
+        print(f'Output: "{args.output}"')
+        print('Model saved successfully!')
@@ -1,99 +1,12 @@
 import pandas as pd
 import joblib
+from team_encoding import MODEL_FORMAT, TeamVocabulary, encode_drafts
+from shared.brawler_registry import REGISTRY
 
 # Load the trained model
 pipeline = joblib.load("models/random_forest.pkl")
 print("Model loaded successfully!")
 
-# Mapping of brawler names to formatted brawler names
-formatted_brawlers = [
-    "8-Bit",
-    "Carl",
-    "Chester",
-    "Chuck",
-    "Clancy",
-    "Colette",
-    "Colt",
-    "Eve",
-    "Lola",
-    "Nita",
-    "Pearl",
-    "R-T",
-    "Rico",
-    "Shelly",
-    "Spike",
-    "Surge",
-    "Tara",
-    "Amber",
-    "Bo",
-    "Jessie",
-    "Lou",
-    "Charlie",
-    "Mr. P",
-    "Emz",
-    "Otis",
-    "Gale",
-    "Sandy",
-    "Gene",
-    "Griff",
-    "Squeak",
-    "Willow",
-    "Penny",
-    "Angelo",
-    "Bea",
-    "Belle",
-    "Bonnie",
-    "Brock",
-    "Janet",
-    "Maisie",
-    "Mandy",
-    "Nani",
-    "Piper",
-    "Barley",
-    "Dynamike",
-    "Grom",
-    "Larry & Lawrie",
-    "Sprout",
-    "Tick",
-    "Buzz",
-    "Cordelius",
-    "Crow",
-    "Edgar",
-    "Fang",
-    "Leon",
-    "Lily",
-    "Melodie",
-    "Mico",
-    "Mortis",
-    "Sam",
-    "Stu",
-    "Ash",
-    "Bibi",
-    "Bull",
-    "Buster",
-    "Darryl",
-    "Draco",
-    "El Primo",
-    "Frank",
-    "Hank",
-    "Jacky",
-    "Meg",
-    "Rosa",
-    "Berry",
-    "Byron",
-    "Doug",
-    "Gray",
-    "Gus",
-    "Kit",
-    "Max",
-    "Pam",
-    "Poco",
-    "Ruffs",
-]
-
-# Create a mapping from lowercase names to formatted names
-formatted_brawlers_map = {brawler.lower(): brawler for brawler in formatted_brawlers}
-
 
 # Function to make predictions based on input
 def recommend_brawlers(
@@ -134,7 +47,20 @@ def recommend_brawlers(
     )
 
     # Predict probabilities for each brawler
-    probabilities = pipeline.predict_proba(input_data)[0]
+    if isinstance(pipeline, dict) and pipeline.get("format") == MODEL_FORMAT:
+        # Team model of random_forest.py, classes are vocabulary brawler ids
+        vocabulary = TeamVocabulary.from_dict(pipeline)
+        teammates = [b.upper() for b in (winner_1, winner_2, winner_3) if b]
+        opponents = [b.upper() for b in (loser_1, loser_2, loser_3) if b]
+        features = encode_drafts(
+            [(battle_mode, map_name, teammates, opponents)], vocabulary
+        )
+        classifier = pipeline["classifier"]
+        probabilities = classifier.predict_proba(features)[0]
+        classes = [vocabulary.brawlers[c] for c in classifier.classes_]
+    else:
+        probabilities = pipeline.predict_proba(input_data)[0]
+        classes = pipeline.classes_
 
     # Get already picked brawlers (case insensitive)
     already_picked = {
@@ -149,9 +75,12 @@ def recommend_brawlers(
     # Get the top N brawlers with the highest probabilities excluding already picked ones
     top_brawlers = []
     for index in probabilities.argsort()[::-1]:
-        brawler = pipeline.classes_[index].lower()
-        if brawler not in already_picked and brawler in formatted_brawlers_map:
-            top_brawlers.append((formatted_brawlers_map[brawler], probabilities[index]))
+        brawler_id = REGISTRY.id(classes[index])
+        if brawler_id is None or REGISTRY.class_ids[brawler_id] < 0:
+            continue
+        display_name = REGISTRY.display_names[brawler_id]
+        if display_name.lower() not in already_picked:
+            top_brawlers.append((display_name, probabilities[index]))
             if len(top_brawlers) == top_n:
                 break
 
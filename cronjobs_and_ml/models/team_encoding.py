@@ -0,0 +1,269 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shared.brawler_registry import REGISTRY
+
+"""
+Team Encoding - sparse multi-hot features of a draft, built from integer codes
+    A draft is encoded as one-hot battle mode and map columns plus a multi-hot vector of
+    the teammates and one of the opponents, so the model sees teams as sets instead of
+    learning every brawler separately for each of the six slots. Columns are read as
+    pandas categoricals and their codes are mapped to vocabulary ids with one lookup
+    array per column, without touching a string per row. Brawler ids are the ids of
+    shared/brawler_registry.py.
+
+    A battle is encoded once per winner, with that winner as the target and the other
+    two as its teammates. The crawler sorts each team by name, so a fixed winner slot as
+    the target would only ever see teammates that sort after it.
+
+Feature columns: [modes | maps | teammates (brawlers) | opponents (brawlers)]
+"""
+
+MODEL_FORMAT = "team_multi_hot"
+# Each winner is the target of one row, the other two are its teammates
+WINNER_COLUMNS = ["winner_1", "winner_2", "winner_3"]
+OPPONENT_COLUMNS = ["loser_1", "loser_2", "loser_3"]
+BATTLE_COLUMNS = ["battle_mode", "map_name"] + WINNER_COLUMNS + OPPONENT_COLUMNS
+BRAWLER_COLUMNS = WINNER_COLUMNS + OPPONENT_COLUMNS
+# Missing picks of the battle log
+MISSING_VALUES = {"", "N/A"}
+
+
+class TeamVocabulary:
+    """
+    Args:
+    modes (list): battle modes
+    maps (list): map names
+    brawlers (list): brawler names, a brawler's id is its position
+    mode_maps (list): (mode, map) pairs played in the battles, None if not known, like
+        for models saved before they were kept
+    """
+
+    def __init__(self, modes, maps, brawlers, mode_maps=None):
+        self.modes = list(modes)
+        self.maps = list(maps)
+        self.brawlers = list(brawlers)
+        self.mode_maps = (
+            None if mode_maps is None else sorted({tuple(pair) for pair in mode_maps})
+        )
+        self.mode_ids = {mode: i for i, mode in enumerate(self.modes)}
+        self.map_ids = {map_name: i for i, map_name in enumerate(self.maps)}
+        self.brawler_ids = {brawler: i for i, brawler in enumerate(self.brawlers)}
+        self.map_offset = len(self.modes)
+        self.teammate_offset = self.map_offset + len(self.maps)
+        self.opponent_offset = self.teammate_offset + len(self.brawlers)
+        self.n_features = self.opponent_offset + len(self.brawlers)
+
+    def to_dict(self):
+        return {
+            "modes": self.modes,
+            "maps": self.maps,
+            "brawlers": self.brawlers,
+            "mode_maps": (
+                None if self.mode_maps is None else [list(p) for p in self.mode_maps]
+            ),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["modes"], data["maps"], data["brawlers"], data.get("mode_maps"))
+
+    def merge(self, other):
+        """
+        Returns:
+        TeamVocabulary: this vocabulary with the new values of other appended, so the
+            ids of this vocabulary stay valid
+        """
+        return TeamVocabulary(
+            self.modes + [mode for mode in other.modes if mode not in self.mode_ids],
+            self.maps + [m for m in other.maps if m not in self.map_ids],
+            self.brawlers
+            + [
+                brawler for brawler in other.brawlers if brawler not in self.brawler_ids
+            ],
+            (
+                None
+                if self.mode_maps is None or other.mode_maps is None
+                else self.mode_maps + other.mode_maps
+            ),
+        )
+
+
+def as_categorical(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column
+    return column.astype("category")
+
+
+def column_values(column):
+    categories = as_categorical(column).cat.categories
+    return {str(value) for value in categories if str(value) not in MISSING_VALUES}
+
+
+def vocabulary_from_battles(battles):
+    # Every registry brawler, brawlers of the battles the registry doesn't know yet are
+    # interned first
+    for column in BRAWLER_COLUMNS:
+        REGISTRY.codes(battles[column])
+    return TeamVocabulary(
+        sorted(column_values(battles["battle_mode"])),
+        sorted(column_values(battles["map_name"])),
+        REGISTRY.names,
+        played_mode_maps(battles),
+    )
+
+
+def played_mode_maps(battles):
+    """
+    Returns:
+    list: distinct (mode, map) pairs of the battles, by their codes instead of a string
+        pair per row
+    """
+    modes = as_categorical(battles["battle_mode"])
+    maps = as_categorical(battles["map_name"])
+    codes = pd.DataFrame(
+        {"mode": modes.cat.codes.to_numpy(), "map": maps.cat.codes.to_numpy()}
+    ).drop_duplicates()
+    codes = codes[(codes["mode"] >= 0) & (codes["map"] >= 0)]
+    pairs = zip(
+        modes.cat.categories[codes["mode"]].astype(str),
+        maps.cat.categories[codes["map"]].astype(str),
+    )
+    return [
+        (mode, map_name)
+        for mode, map_name in pairs
+        if mode not in MISSING_VALUES and map_name not in MISSING_VALUES
+    ]
+
+
+def column_ids(column, ids):
+    """
+    Returns:
+    ndarray: int32 vocabulary id of every row, -1 for missing and unknown values
+    """
+    column = as_categorical(column)
+    lookup = np.array(
+        [ids.get(str(value), -1) for value in column.cat.categories] + [-1],
+        dtype=np.int32,
+    )
+    # Code -1 (missing) picks the trailing -1 of the lookup
+    return lookup[column.cat.codes.to_numpy()]
+
+
+def sparse_rows(columns, n_rows, n_features):
+    """
+    Args:
+    columns (list): (ids, offset) per feature group, ids -1 are left out
+
+    Returns:
+    csr_matrix: float32 with a 1 at offset + id for every valid id
+    """
+    rows, cols = [], []
+    for ids, offset in columns:
+        valid = np.flatnonzero(ids >= 0).astype(np.int32)
+        rows.append(valid)
+        cols.append(ids[valid] + offset)
+    rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int32)
+    cols = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int32)
+    # Sorting by row gives the CSR layout directly
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+    return sp.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), cols[order].astype(np.int32), indptr),
+        shape=(n_rows, n_features),
+    )
+
+
+def encode_battles(battles, vocabulary):
+    """
+    Args:
+    battles (DataFrame): BATTLE_COLUMNS, strings or categoricals
+    vocabulary (TeamVocabulary)
+
+    Returns:
+    tuple: (csr_matrix of features, int32 brawler id of the target, index of the battle
+        of every row), one row per winner in battle order, winners that aren't known
+        are left out
+    """
+    winners = np.column_stack(
+        [
+            column_ids(battles[column], vocabulary.brawler_ids)
+            for column in WINNER_COLUMNS
+        ]
+    )
+    target = winners.reshape(-1)
+    keep = target >= 0
+    row_battles = np.repeat(np.arange(len(battles)), len(WINNER_COLUMNS))[keep]
+    slots = np.tile(np.arange(len(WINNER_COLUMNS)), len(battles))[keep]
+    columns = [
+        (column_ids(battles["battle_mode"], vocabulary.mode_ids)[row_battles], 0),
+        (
+            column_ids(battles["map_name"], vocabulary.map_ids)[row_battles],
+            vocabulary.map_offset,
+        ),
+    ]
+    # The teammates of the winner in a slot are the winners in the other two slots
+    for shift in range(1, len(WINNER_COLUMNS)):
+        columns.append(
+            (
+                winners[row_battles, (slots + shift) % len(WINNER_COLUMNS)],
+                vocabulary.teammate_offset,
+            )
+        )
+    for column in OPPONENT_COLUMNS:
+        columns.append(
+            (
+                column_ids(battles[column], vocabulary.brawler_ids)[row_battles],
+                vocabulary.opponent_offset,
+            )
+        )
+    features = sparse_rows(columns, len(row_battles), vocabulary.n_features)
+    return features, target[keep], row_battles
+
+
+def encode_drafts(drafts, vocabulary):
+    """
+    Args:
+    drafts (list): (mode, map, teammates, opponents) with lists of brawler names
+
+    Returns:
+    csr_matrix: features of every draft
+    """
+    columns = [
+        (
+            np.array([vocabulary.mode_ids.get(d[0], -1) for d in drafts], np.int32),
+            0,
+        ),
+        (
+            np.array([vocabulary.map_ids.get(d[1], -1) for d in drafts], np.int32),
+            vocabulary.map_offset,
+        ),
+    ]
+    for team, offset in (
+        (2, vocabulary.teammate_offset),
+        (3, vocabulary.opponent_offset),
+    ):
+        width = max((len(d[team]) for d in drafts), default=0)
+        for slot in range(width):
+            columns.append(
+                (
+                    np.array(
+                        [
+                            (
+                                vocabulary.brawler_ids.get(d[team][slot], -1)
+                                if slot < len(d[team])
+                                else -1
+                            )
+                            for d in drafts
+                        ],
+                        np.int32,
+                    ),
+                    offset,
+                )
+            )
+    return sparse_rows(columns, len(drafts), vocabulary.n_features)
@@ -0,0 +1,20 @@
+import os
+import json
+
+
+def replace_atomically(write, path):
+    # Write to a temporary file in the same directory, then rename it over the target
+    temp_path = f"{path}.tmp{os.getpid()}"
+    try:
+        write(temp_path)
+        with open(temp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def write_json(data, path):
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2)
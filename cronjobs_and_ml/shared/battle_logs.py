@@ -0,0 +1,228 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow.dataset as ds
+    import pyarrow.fs as pafs
+except ImportError:  # Only needed for Parquet and Arrow battle logs
+    ds = pafs = None
+
+"""
+Battle Logs - reads the battle logs the crawlers write, for the stats scripts and the models
+    A battle log is a CSV or a .parquet/.arrow directory of part files. Columns are read
+    as pandas categoricals, a few bytes per value instead of a string object, and part
+    files memory-mapped and only for the requested columns. Battle logs only ever grow,
+    a crawl writes a new CSV or new part files and never rewrites one, so the battles
+    read up to a point are the first rows of each file and a watermark of rows per file
+    is enough to read only the new ones.
+"""
+
+WIN_COLUMNS = ["winner_1", "winner_2", "winner_3"]
+LOSE_COLUMNS = ["loser_1", "loser_2", "loser_3"]
+BRAWLER_COLUMNS = WIN_COLUMNS + LOSE_COLUMNS
+BATTLE_COLUMNS = ["battle_mode", "map_name"] + BRAWLER_COLUMNS
+# battleTime of the Brawl Stars API as the crawler writes it, e.g. 20241018T101500.000Z
+TIME_COLUMN = "battle_time"
+BATTLE_TIME_FORMAT = "%Y%m%dT%H%M%S.%fZ"
+# Placeholder the crawler writes for empty team slots, read as missing like read_csv does
+MISSING_BRAWLER = "N/A"
+
+
+def read_battles(input_file, columns=BATTLE_COLUMNS):
+    """
+    Reads the given columns of a battle log as pandas categoricals.
+
+    Args:
+    input_file (str): battle log CSV, or .parquet/.arrow directory of part files
+    columns (list): columns to read
+
+    Returns:
+    DataFrame: one categorical column per requested column
+    """
+    if os.path.isdir(input_file):
+        return read_battle_store(input_file, columns)
+    return pd.read_csv(input_file, usecols=columns, dtype="category")
+
+
+def read_battle_chunks(input_file, chunk_rows, columns=BATTLE_COLUMNS):
+    """
+    Reads a battle log like read_battles, chunk_rows battles at a time.
+
+    Yields:
+    DataFrame: one categorical column per requested column, chunk_rows battles at most
+    """
+    for path in battle_log_files(input_file):
+        yield from read_file_chunks(path, chunk_rows, columns=columns)
+
+
+def read_new_battle_chunks(
+    battle_logs,
+    chunk_rows,
+    watermark,
+    file_sizes=None,
+    columns=BATTLE_COLUMNS,
+    optional_columns=(),
+):
+    """
+    Reads the battles of battle logs past a watermark.
+
+    Args:
+    battle_logs (list): battle log CSVs or Parquet/Arrow directories
+    chunk_rows (int): battles per DataFrame, 0 or None for whole files
+    watermark (dict): absolute file path -> battles already read from it
+    file_sizes (dict): absolute file path -> its size when it was read. Files that
+        still have that size are skipped without reading them, the size of every file
+        read is set before reading it.
+    optional_columns (list): see read_file_chunks
+
+    Yields:
+    tuple: (absolute file path, DataFrame of its next chunk_rows battles at most)
+    """
+    if file_sizes is None:
+        file_sizes = {}
+    for battle_log in battle_logs:
+        for path in battle_log_files(battle_log):
+            path = os.path.abspath(path)
+            size = os.path.getsize(path)
+            if path in watermark and file_sizes.get(path) == size:
+                continue
+            file_sizes[path] = size
+            skip_rows = watermark.get(path, 0)
+            for battles in read_file_chunks(
+                path, chunk_rows, skip_rows, columns, optional_columns
+            ):
+                yield path, battles
+
+
+def battle_log_files(input_file):
+    """
+    Returns:
+    list: the CSV, or the part files of a Parquet/Arrow directory
+    """
+    if not os.path.isdir(input_file):
+        return [input_file]
+    extension = ".arrow" if input_file.rstrip("/").endswith(".arrow") else ".parquet"
+    return sorted(glob.glob(os.path.join(input_file, f"part-*{extension}")))
+
+
+def read_file_chunks(
+    path, chunk_rows, skip_rows=0, columns=BATTLE_COLUMNS, optional_columns=()
+):
+    """
+    Args:
+    optional_columns (list): columns read too when the file has them, all missing
+        values when it was written without them
+
+    Yields:
+    DataFrame: categorical columns of the next chunk_rows battles of one CSV or part
+        file, leaving out its first skip_rows battles. 0 or None chunk_rows reads the
+        whole file at once.
+    """
+    missing = []
+    if optional_columns:
+        present = set(file_columns(path))
+        missing = [column for column in optional_columns if column not in present]
+        columns = columns + [column for column in optional_columns if column in present]
+    for battles in file_chunks(path, chunk_rows, skip_rows, columns):
+        for column in missing:
+            battles[column] = pd.Categorical.from_codes(
+                np.full(len(battles), -1, dtype=np.int8), categories=[]
+            )
+        yield battles
+
+
+def file_columns(path):
+    """
+    Returns:
+    list: column names of one CSV or part file, without reading its battles
+    """
+    if is_part_file(path):
+        return part_file_dataset(path).schema.names
+    return list(pd.read_csv(path, nrows=0).columns)
+
+
+def is_part_file(path):
+    return path.endswith(".parquet") or path.endswith(".arrow")
+
+
+def part_file_dataset(path):
+    if ds is None:
+        raise ImportError(f'pyarrow is required to read "{path}"')
+    return ds.dataset(
+        [path],
+        format="ipc" if path.endswith(".arrow") else "parquet",
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def file_chunks(path, chunk_rows, skip_rows, columns):
+    # read_file_chunks of columns the file has
+    if is_part_file(path):
+        dataset = part_file_dataset(path)
+        # A table slices and converts like a record batch
+        batches = (
+            dataset.to_batches(columns=columns, batch_size=chunk_rows)
+            if chunk_rows
+            else [dataset.to_table(columns=columns)]
+        )
+        for batch in batches:
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            batch, skip_rows = batch.slice(skip_rows), 0
+            yield sorted_categories(batch.to_pandas(), columns)
+        return
+    # A callable, read_csv turns a list of rows to skip into a set
+    skip = (lambda row: 0 < row <= skip_rows) if skip_rows else None
+    chunks = pd.read_csv(
+        path,
+        usecols=columns,
+        dtype="category",
+        skiprows=skip,
+        chunksize=chunk_rows or None,
+    )
+    for battles in chunks if chunk_rows else [chunks]:
+        if len(battles):
+            yield battles
+
+
+def empty_battles(columns):
+    return pd.DataFrame({column: pd.Categorical([]) for column in columns})
+
+
+def battle_store_dataset(input_dir):
+    if ds is None:
+        raise ImportError(f'pyarrow is required to read "{input_dir}"')
+    part_files = battle_log_files(input_dir)
+    if not part_files:
+        return None
+    return ds.dataset(
+        part_files,
+        format="ipc" if input_dir.rstrip("/").endswith(".arrow") else "parquet",
+        filesystem=pafs.LocalFileSystem(use_mmap=True),
+    )
+
+
+def read_battle_store(input_dir, columns):
+    # Dictionary-encoded columns come back as categoricals without building a string
+    # per cell, and only the requested columns are read from the memory-mapped parts
+    dataset = battle_store_dataset(input_dir)
+    if dataset is None:
+        return empty_battles(columns)
+    return sorted_categories(dataset.to_table(columns=columns).to_pandas(), columns)
+
+
+def sorted_categories(df, columns):
+    # Sorted categories without the placeholder, like read_csv(dtype="category")
+    for column in columns:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            continue
+        categories = sorted(
+            category
+            for category in df[column].cat.categories
+            if category != MISSING_BRAWLER
+        )
+        df[column] = df[column].cat.set_categories(categories)
+    return df
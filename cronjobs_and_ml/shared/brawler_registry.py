@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+
+"""
+Brawler Registry - every brawler's dense integer id, names and class
+    Names from the battle logs, display names, other spellings ("El primo", "MR.P",
+    "8bit") and Brawl Stars API brawler ids all resolve to the same id with a dict
+    lookup, so the pipeline stages count into arrays indexed by id and only turn ids
+    back into names when writing their outputs. Brawlers missing from BRAWLERS, like a
+    newly released one, are interned with the next free id and no class.
+
+Ids are positions in BRAWLERS and are stored in count snapshots and models, so new
+brawlers are only ever appended.
+"""
+
+CLASSES = [
+    "damage_dealer",
+    "controller",
+    "sniper",
+    "thrower",
+    "assassin",
+    "tank",
+    "support",
+]
+# Placeholders of empty team slots in the battle logs
+MISSING_NAMES = {"", "N/A"}
+
+# (display name, class, Brawl Stars API brawler id), new brawlers go at the end
+BRAWLERS = [
+    ("8-Bit", "damage_dealer", 16000027),
+    ("Amber", "controller", 16000040),
+    ("Angelo", "sniper", 16000079),
+    ("Ash", "tank", 16000051),
+    ("Barley", "thrower", 16000006),
+    ("Bea", "sniper", 16000029),
+    ("Belle", "sniper", 16000046),
+    ("Berry", "support", 16000082),
+    ("Bibi", "tank", 16000026),
+    ("Bo", "controller", 16000014),
+    ("Bonnie", "sniper", 16000058),
+    ("Brock", "sniper", 16000003),
+    ("Bull", "tank", 16000002),
+    ("Buster", "tank", 16000062),
+    ("Buzz", "assassin", 16000049),
+    ("Byron", "support", 16000042),
+    ("Carl", "damage_dealer", 16000025),
+    ("Charlie", "controller", 16000074),
+    ("Chester", "damage_dealer", 16000063),
+    ("Chuck", "damage_dealer", 16000073),
+    ("Clancy", "damage_dealer", 16000083),
+    ("Colette", "damage_dealer", 16000039),
+    ("Colt", "damage_dealer", 16000001),
+    ("Cordelius", "assassin", 16000070),
+    ("Crow", "assassin", 16000012),
+    ("Darryl", "tank", 16000018),
+    ("Doug", "support", 16000071),
+    ("Draco", "tank", 16000080),
+    ("Dynamike", "thrower", 16000009),
+    ("Edgar", "assassin", 16000043),
+    ("El Primo", "tank", 16000010),
+    ("Emz", "controller", 16000030),
+    ("Eve", "damage_dealer", 16000056),
+    ("Fang", "assassin", 16000054),
+    ("Frank", "tank", 16000020),
+    ("Gale", "controller", 16000035),
+    ("Gene", "controller", 16000021),
+    ("Gray", "support", 16000064),
+    ("Griff", "controller", 16000050),
+    ("Grom", "thrower", 16000048),
+    ("Gus", "support", 16000061),
+    ("Hank", "tank", 16000069),
+    ("Jacky", "tank", 16000034),
+    ("Janet", "sniper", 16000057),
+    ("Jessie", "controller", 16000007),
+    ("Kit", "support", 16000076),
+    ("Larry & Lawrie", "thrower", 16000077),
+    ("Leon", "assassin", 16000023),
+    ("Lily", "assassin", 16000081),
+    ("Lola", "damage_dealer", 16000053),
+    ("Lou", "controller", 16000041),
+    ("Maisie", "sniper", 16000068),
+    ("Mandy", "sniper", 16000065),
+    ("Max", "support", 16000032),
+    ("Meg", "tank", 16000052),
+    ("Melodie", "assassin", 16000078),
+    ("Mico", "assassin", 16000075),
+    ("Mortis", "assassin", 16000011),
+    ("Mr. P", "controller", 16000031),
+    ("Nani", "sniper", 16000036),
+    ("Nita", "damage_dealer", 16000008),
+    ("Otis", "controller", 16000059),
+    ("Pam", "support", 16000016),
+    ("Pearl", "damage_dealer", 16000072),
+    ("Penny", "controller", 16000019),
+    ("Piper", "sniper", 16000015),
+    ("Poco", "support", 16000013),
+    ("R-T", "damage_dealer", 16000066),
+    ("Rico", "damage_dealer", 16000004),
+    ("Rosa", "tank", 16000024),
+    ("Ruffs", "support", 16000044),
+    ("Sam", "assassin", 16000060),
+    ("Sandy", "controller", 16000028),
+    ("Shelly", "damage_dealer", 16000000),
+    ("Spike", "damage_dealer", 16000005),
+    ("Sprout", "thrower", 16000037),
+    ("Squeak", "controller", 16000047),
+    ("Stu", "assassin", 16000045),
+    ("Surge", "damage_dealer", 16000038),
+    ("Tara", "damage_dealer", 16000017),
+    ("Tick", "thrower", 16000022),
+    ("Willow", "controller", 16000067),
+]
+
+
+def compact_name(name):
+    # Spelling-insensitive form of a name, e.g. "Mr. P" and "MR.P" -> "MRP"
+    return "".join(character for character in name.upper() if character.isalnum())
+
+
+class BrawlerRegistry:
+    """
+    Args:
+    brawlers (list): (display name, class, API brawler id), in id order
+
+    Attributes:
+    names (list): battle log name of each id, the API's upper case name
+    display_names (list): display name of each id
+    class_ids (ndarray): index in CLASSES of each id's class, -1 without a class
+    """
+
+    def __init__(self, brawlers=BRAWLERS):
+        self.names = []
+        self.display_names = []
+        self.class_list = []
+        self.lookup = {}
+        self.api_ids = {}
+        self._class_ids = None
+        for display_name, class_name, api_id in brawlers:
+            self.add(display_name, class_name, api_id)
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, display_name, class_name=None, api_id=None):
+        brawler_id = len(self.names)
+        self.names.append(display_name.upper())
+        self.display_names.append(display_name)
+        self.class_list.append(CLASSES.index(class_name) if class_name else -1)
+        for variant in (
+            display_name,
+            display_name.upper(),
+            display_name.lower(),
+            compact_name(display_name),
+        ):
+            self.lookup.setdefault(variant, brawler_id)
+        if api_id is not None:
+            self.api_ids[api_id] = brawler_id
+        self._class_ids = None
+        return brawler_id
+
+    @property
+    def class_ids(self):
+        if self._class_ids is None:
+            self._class_ids = np.array(self.class_list, dtype=np.int8)
+        return self._class_ids
+
+    def id(self, name):
+        """
+        Returns:
+        int: id of the brawler, None for unknown names
+        """
+        brawler_id = self.lookup.get(name)
+        if brawler_id is None and isinstance(name, str):
+            brawler_id = self.lookup.get(compact_name(name))
+            if brawler_id is not None:
+                # Later lookups of the same spelling skip compact_name
+                self.lookup[name] = brawler_id
+        return brawler_id
+
+    def intern(self, name):
+        """
+        Returns:
+        int: id of the brawler, a new one for unknown names, -1 for missing values
+        """
+        if not isinstance(name, str) or name.strip() in MISSING_NAMES:
+            return -1
+        brawler_id = self.id(name)
+        if brawler_id is None:
+            brawler_id = self.add(name.strip())
+        return brawler_id
+
+    def id_for_api_id(self, api_id):
+        return self.api_ids.get(api_id)
+
+    def class_name(self, brawler_id):
+        class_id = self.class_list[brawler_id]
+        return CLASSES[class_id] if class_id >= 0 else None
+
+    def codes(self, column, intern=True):
+        """
+        Args:
+        column (Series): brawler names, categorical or not
+        intern (bool): give unknown names new ids instead of -1
+
+        Returns:
+        ndarray: int32 id of every row, -1 for missing values
+        """
+        if not isinstance(column.dtype, pd.CategoricalDtype):
+            column = column.astype("category")
+        # One lookup per category, the rows only index the resulting array
+        ids = []
+        for name in column.cat.categories:
+            brawler_id = self.intern(name) if intern else self.id(name)
+            ids.append(-1 if brawler_id is None else brawler_id)
+        lookup = np.array(ids + [-1], dtype=np.int32)
+        # Code -1 (missing) picks the trailing -1
+        return lookup[column.cat.codes.to_numpy()]
+
+
+REGISTRY = BrawlerRegistry()
@@ -12,6 +12,9 @@ HEADERS = {
     'Authorization': f'Bearer {API_KEY}'
 }
 
+# Base URL of the API, can point at a local mock server for testing
+API_URL = os.getenv('BRAWL_STARS_API_URL', 'https://api.brawlstars.com/v1')
+
 def get_player_name(player_tag):
     """
     Fetches the player's name given their player tag.
@@ -22,7 +25,7 @@ def get_player_name(player_tag):
     Returns:
         str: The name of the player.
     """
-    BASE_URL = f'https://api.brawlstars.com/v1/players/{player_tag.replace("#", "%23")}'
+    BASE_URL = f'{API_URL}/players/{player_tag.replace("#", "%23")}'
     response = requests.get(BASE_URL, headers=HEADERS)
     
     if response.status_code == 200:
@@ -0,0 +1,81 @@
+import os
+import json
+from datetime import datetime, timezone
+from shared.atomic_files import replace_atomically, write_json
+
+"""
+Versioned Index - numbered versions of a file, listed in order in an index.json
+    Model versions and count snapshots are both a file per version next to an
+    index.json. A version's file is written first and the index is replaced last, so a
+    run that stops halfway leaves the versions before it as they were.
+
+Layout, in the directory:
+    index.json: {"versions": [{version, file, created_at, ...}]}
+    one file per version, named by the file name format with its version
+"""
+
+
+class VersionedIndex:
+    """
+    Args:
+    directory (str): directory of index.json and the version files
+    file_name (str): format of a version's file name, e.g. "counts-{version:04d}.npz"
+    kind (str): what a version is, for error messages
+    """
+
+    def __init__(self, directory, file_name, kind):
+        self.directory = directory
+        self.file_name = file_name
+        self.kind = kind
+        self.index_path = os.path.join(directory, "index.json")
+
+    def versions(self):
+        if not os.path.exists(self.index_path):
+            return []
+        with open(self.index_path) as f:
+            return json.load(f)["versions"]
+
+    def get(self, version=None):
+        """
+        Returns:
+        dict: index entry of the version, the latest one by default, None if there is none
+        """
+        versions = self.versions()
+        if version is None:
+            return versions[-1] if versions else None
+        for entry in versions:
+            if entry["version"] == version:
+                return entry
+        raise KeyError(f"No {self.kind} {version} in {self.index_path}")
+
+    def path(self, entry):
+        return os.path.join(self.directory, entry["file"])
+
+    def add(self, write, info):
+        """
+        Stores the next version.
+
+        Args:
+        write (function): writes the version's file, given its index entry and the
+            temporary path to write to
+        info (dict): index fields of the version
+
+        Returns:
+        dict: index entry of the new version
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        versions = self.versions()
+        version = versions[-1]["version"] + 1 if versions else 1
+        entry = {
+            "version": version,
+            "file": self.file_name.format(version=version),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **info,
+        }
+        replace_atomically(lambda path: write(entry, path), self.path(entry))
+        # The index is written last, a version only exists once its file does
+        replace_atomically(
+            lambda path: write_json({"versions": versions + [entry]}, path),
+            self.index_path,
+        )
+        return entry